@@ -8,7 +8,81 @@ Slim entrypoint that:
 4. Starts the server
 """
 import os
+import sys
 import threading
+import importlib.util
+import itertools
+
+
+# =============================================================================
+# 0. COMMAND LINE (`python app.py`)
+# =============================================================================
+
+def _parse_args():
+    import argparse
+    parser = argparse.ArgumentParser(description='ID By Rivoli Audio Processor')
+    parser.add_argument(
+        '-p', '--port', type=int,
+        default=int(os.environ.get('PORT', 8888)),
+        help='Port to run the server on (default: 8888)',
+    )
+    parser.add_argument(
+        '--debug', action='store_true', default=False,
+        help='Enable debug mode (development only)',
+    )
+    parser.add_argument(
+        '--dev', action='store_true', default=False,
+        help='Run in development mode with Flask dev server',
+    )
+    return parser.parse_args()
+
+
+def kill_jupyter():
+    """Kill any running Jupyter processes to free up resources."""
+    try:
+        import signal
+        # Same match as `pgrep -f jupyter`, read straight from /proc (no fork/exec)
+        own_pid = os.getpid()
+        killed = 0
+        with os.scandir('/proc') as entries:
+            for entry in entries:
+                if not entry.name.isdigit() or int(entry.name) == own_pid:
+                    continue
+                try:
+                    with open(f'/proc/{entry.name}/cmdline', 'rb') as f:
+                        cmdline = f.read()
+                except OSError:
+                    continue  # Exited, or not ours to read
+                if b'jupyter' in cmdline:
+                    try:
+                        os.kill(int(entry.name), signal.SIGTERM)
+                        killed += 1
+                    except (ProcessLookupError, PermissionError):
+                        pass
+        if killed > 0:
+            print(f"🔪 Killed {killed} Jupyter process(es)")
+    except Exception as e:
+        print(f"⚠️ Could not kill Jupyter: {e}")
+
+
+if __name__ == '__main__':
+    _args = _parse_args()
+    kill_jupyter()
+    
+    if not (_args.dev or _args.debug) and importlib.util.find_spec('gunicorn'):
+        # Production: hand the process to gunicorn (gthread workers, sendfile for file
+        # responses) instead of Werkzeug's server. Exec before the imports below, which
+        # start the worker threads - gunicorn's worker process imports app:app itself.
+        print(f"🚀 Starting ID By Rivoli in PRODUCTION mode on port {_args.port} (gunicorn)")
+        sys.stdout.flush()
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        os.execvp(sys.executable, [
+            sys.executable, '-m', 'gunicorn',
+            '--chdir', base_dir,
+            '--config', os.path.join(base_dir, 'gunicorn_config.py'),
+            '--bind', f'0.0.0.0:{_args.port}',
+            'app:app',
+        ])
 
 # =============================================================================
 # 1. IMPORT CORE CONFIG (creates Flask app, loads env, patches torchaudio)
@@ -43,14 +117,29 @@ from utils.history import load_history_from_csv
 from utils.tracking import process_scheduled_deletions
 
 import config as cfg
-from services.track_service import get_demucs_device, get_optimal_workers
+from services.track_service import get_demucs_device, get_optimal_workers, get_git_info, load_tuned_worker_count
 from services.queue_service import log_message
 
+# Version string for the index page (computed once, off the request path)
+app.config['VERSION_INFO'] = get_git_info()
+print(f"🏷️  Version: {app.config['VERSION_INFO']}")
+
+# Pre-render the index page (its only dynamic value is the version string)
+from routes.main import prerender_index
+with app.app_context():
+    prerender_index()
+
 # Detect GPU/CPU device for Demucs
 cfg.DEMUCS_DEVICE = get_demucs_device()
 
 # Calculate optimal workers based on hardware
 cfg.NUM_WORKERS = get_optimal_workers()
+max_workers = cfg.NUM_WORKERS
+gpu_autoscale = cfg.GPU_AUTOSCALE_ENABLED and cfg.DEMUCS_DEVICE == 'cuda'
+if gpu_autoscale:
+    # The hardware estimate becomes the ceiling; start small (or where the last run converged)
+    cfg.NUM_WORKERS = min(max_workers, load_tuned_worker_count() or 2)
+    print(f"📊 GPU autoscaling: starting with {cfg.NUM_WORKERS} workers (max {max_workers})")
 print(f"🔧 Configuration: {cfg.CPU_COUNT} CPUs détectés → {cfg.NUM_WORKERS} workers parallèles")
 
 # Load persisted upload history from CSV
@@ -72,15 +161,34 @@ scheduled_deletion_thread.start()
 print("📥 Pending downloads system initialized (files stay until API confirms download)")
 
 # --- Worker threads ---
-from services.track_service import worker
+from services.track_service import worker, queue_reaper, gpu_worker_autoscaler
+
 
-cfg.worker_threads = []
-for i in range(cfg.NUM_WORKERS):
-    t = threading.Thread(target=worker, args=(i + 1,), daemon=True)
+def start_worker():
+    # Drop workers the autoscaler stopped and reuse the lowest free id (ids map to queue shards)
+    cfg.worker_threads[:] = [t for t in cfg.worker_threads if t.is_alive()]
+    used_ids = {t.worker_id for t in cfg.worker_threads}
+    worker_id = next(i for i in itertools.count(1) if i not in used_ids)
+    t = threading.Thread(target=worker, args=(worker_id,), daemon=True)
+    t.worker_id = worker_id
     t.start()
     cfg.worker_threads.append(t)
+
+
+cfg.track_queue.set_shards(max_workers)
+for _ in range(cfg.NUM_WORKERS):
+    start_worker()
 print(f"🚀 {cfg.NUM_WORKERS} workers démarrés")
 
+if gpu_autoscale:
+    autoscaler_thread = threading.Thread(
+        target=gpu_worker_autoscaler, args=(start_worker, max_workers), daemon=True
+    )
+    autoscaler_thread.start()
+
+reaper_thread = threading.Thread(target=queue_reaper, daemon=True)
+reaper_thread.start()
+
 # --- Memory watchdog ---
 from services.memory_service import memory_watchdog
 
@@ -92,10 +200,14 @@ print(
 )
 
 # --- Startup cleanup ---
-from services.cleanup_service import startup_cleanup, periodic_cleanup, disk_monitor_loop
+from services.cleanup_service import startup_cleanup, periodic_cleanup, disk_monitor_loop, trash_janitor
 
 startup_cleanup()
 
+# --- Trash janitor (deferred deletes from /cleanup) ---
+trash_janitor_thread = threading.Thread(target=trash_janitor, daemon=True)
+trash_janitor_thread.start()
+
 # --- Periodic cleanup thread ---
 cleanup_thread = threading.Thread(target=periodic_cleanup, daemon=True)
 cleanup_thread.start()
@@ -130,60 +242,18 @@ print(f"⏰ Delayed delete: {'ENABLED' if cfg.DELAYED_DELETE_ENABLED else 'DISAB
 # --- Auto-resume interrupted bulk import ---
 from routes.dropbox import auto_resume_bulk_import
 auto_resume_bulk_import()
-    
-    # =============================================================================
-# 5. HELPER (kill jupyter before start)
-    # =============================================================================
-
-def kill_jupyter():
-    """Kill any running Jupyter processes to free up resources."""
-    try:
-        import signal
-        import subprocess
-        result = subprocess.run(['pgrep', '-f', 'jupyter'], capture_output=True, text=True)
-        pids = result.stdout.strip().split('\n')
-        killed = 0
-        for pid in pids:
-            if pid:
-                try:
-                    os.kill(int(pid), signal.SIGTERM)
-                    killed += 1
-                except (ProcessLookupError, ValueError):
-                    pass
-        if killed > 0:
-            print(f"🔪 Killed {killed} Jupyter process(es)")
-    except Exception as e:
-        print(f"⚠️ Could not kill Jupyter: {e}")
 
 
 # =============================================================================
-# 6. MAIN
+# 5. MAIN
 # =============================================================================
 
 if __name__ == '__main__':
-    import argparse
-    parser = argparse.ArgumentParser(description='ID By Rivoli Audio Processor')
-    parser.add_argument(
-        '-p', '--port', type=int,
-        default=int(os.environ.get('PORT', 8888)),
-        help='Port to run the server on (default: 8888)',
-    )
-    parser.add_argument(
-        '--debug', action='store_true', default=False,
-        help='Enable debug mode (development only)',
-    )
-    parser.add_argument(
-        '--dev', action='store_true', default=False,
-        help='Run in development mode with Flask dev server',
-    )
-    args = parser.parse_args()
-    
-    kill_jupyter()
-    
-    if args.dev or args.debug:
-        print(f"🔧 Starting ID By Rivoli in DEVELOPMENT mode on port {args.port}")
-        app.run(host='0.0.0.0', port=args.port, debug=True)
+    if _args.dev or _args.debug:
+        print(f"🔧 Starting ID By Rivoli in DEVELOPMENT mode on port {_args.port}")
+        app.run(host='0.0.0.0', port=_args.port, debug=True)
     else:
-        print(f"🚀 Starting ID By Rivoli in PRODUCTION mode on port {args.port}")
-        print(f"💡 Tip: For better performance, use: gunicorn -c gunicorn_config.py app:app")
-        app.run(host='0.0.0.0', port=args.port, debug=False, threaded=True)
+        # Only reached when gunicorn is not installed (see section 0)
+        print(f"🚀 Starting ID By Rivoli in PRODUCTION mode on port {_args.port}")
+        print(f"⚠️ gunicorn not installed - using Flask's threaded server (no sendfile)")
+        app.run(host='0.0.0.0', port=_args.port, debug=False, threaded=True)
@@ -7,28 +7,58 @@ and shared mutable state (locks, queues, dictionaries) live here.
 import os
 import time
 import threading
-import queue
+import importlib.util
 import multiprocessing
 from threading import Lock
 
 from dotenv import load_dotenv
 load_dotenv()
 
+from utils.work_queue import WorkStealingQueue
+
 # =============================================================================
 # FIX TORCHAUDIO: Patch torchcodec ImportError at startup
 # =============================================================================
+def _file_signature(path):
+    st = os.stat(path)
+    return f'{st.st_mtime_ns}:{st.st_size}'
+
+
+def _write_patch_marker(marker_path, tc_path):
+    """Record that tc_path (as it is now on disk) needs no further patching."""
+    try:
+        with open(marker_path, 'w') as f:
+            f.write(_file_signature(tc_path))
+    except OSError:
+        pass
+
+
 def _patch_torchaudio_on_disk():
     """Patch torchaudio's _torchcodec.py to fall back to soundfile."""
     try:
-        import torchaudio
-        tc_path = os.path.join(os.path.dirname(torchaudio.__file__), '_torchcodec.py')
+        # Locate the package without importing it (torch import is slow)
+        spec = importlib.util.find_spec('torchaudio')
+        if spec is None or not spec.submodule_search_locations:
+            return
+        tc_path = os.path.join(spec.submodule_search_locations[0], '_torchcodec.py')
         if not os.path.exists(tc_path):
             return
+        
+        # Warm start: the marker holds the mtime/size of the file we already
+        # checked, so an unchanged file is skipped without reading it; a
+        # reinstalled torchaudio has a new signature and is checked again
+        marker_path = tc_path + '.idbyrivoli_patched'
+        try:
+            with open(marker_path) as f:
+                if f.read() == _file_signature(tc_path):
+                    return
+        except OSError:
+            pass
+        
         with open(tc_path, 'r') as f:
             content = f.read()
-        if 'PATCHED_BY_IDBYRIVOLI' in content:
-            return
-        if 'raise ImportError' not in content:
+        if 'PATCHED_BY_IDBYRIVOLI' in content or 'raise ImportError' not in content:
+            _write_patch_marker(marker_path, tc_path)
             return
         lines = content.split('\n')
         new_lines = []
@@ -59,6 +89,7 @@ def _patch_torchaudio_on_disk():
         if patched:
             with open(tc_path, 'w') as f:
                 f.write('\n'.join(new_lines))
+            _write_patch_marker(marker_path, tc_path)
             print(f"✅ Auto-patched torchaudio: {tc_path}")
         else:
             print(f"⚠️ Could not auto-patch torchaudio. Run: pip install torchcodec")
@@ -80,6 +111,9 @@ app = Flask(__name__, template_folder='templates', static_folder='static')
 app.secret_key = os.environ.get('SECRET_KEY', 'idbyrivoli-secret-key-2024')
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024
 app.config['MAX_FORM_MEMORY_SIZE'] = 100 * 1024 * 1024
+# Only behind a proxy that serves X-Sendfile (nginx X-Accel / Apache mod_xsendfile);
+# otherwise send_file streams through wsgi.file_wrapper (sendfile(2) under gunicorn)
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', 'false').lower() == 'true'
 
 # =============================================================================
 # PATHS
@@ -89,10 +123,13 @@ UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
 OUTPUT_FOLDER = os.path.join(BASE_DIR, 'output')
 PROCESSED_FOLDER = os.path.join(BASE_DIR, 'processed')
 DROPBOX_FOLDER = os.path.join(BASE_DIR, 'dropbox_downloads')
+COVERS_FOLDER = os.path.join(BASE_DIR, 'static', 'covers')
+# Staging dir for deferred deletes (same filesystem as the folders above, so moves are renames)
+TRASH_FOLDER = os.path.join(BASE_DIR, '.trash')
 HISTORY_FILE = os.path.join(BASE_DIR, 'upload_history.csv')
 BULK_IMPORT_STATE_FILE = os.path.join(BASE_DIR, 'bulk_import_pending.json')
 
-for folder in [UPLOAD_FOLDER, OUTPUT_FOLDER, PROCESSED_FOLDER, DROPBOX_FOLDER]:
+for folder in [UPLOAD_FOLDER, OUTPUT_FOLDER, PROCESSED_FOLDER, DROPBOX_FOLDER, COVERS_FOLDER, TRASH_FOLDER]:
     os.makedirs(folder, exist_ok=True)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
@@ -227,9 +264,20 @@ def load_bulk_import_pending():
 # =============================================================================
 API_ENDPOINT = os.environ.get('API_ENDPOINT', 'https://track.idbyrivoli.com/upload')
 API_KEY = os.environ.get('API_KEY', '5X#JP5ifkSm?oE6@haMriYG$j!87BEfX@zg3CxcE')
+# Precomputed forms for the per-request auth checks and outgoing API calls
+API_KEY_BYTES = API_KEY.encode('utf-8')
+AUTH_BEARER_PREFIX = 'Bearer '
+AUTH_BEARER_HEADER = f'{AUTH_BEARER_PREFIX}{API_KEY}'
 USE_DATABASE_MODE = os.environ.get('USE_DATABASE_MODE', 'true').lower() in ('true', '1', 'yes')
 CURRENT_HOST_URL = os.environ.get('PUBLIC_URL', '')
 
+# API mode: one POST per track payload. Set API_BATCH_ENABLED=true only when
+# API_ENDPOINT accepts {"tracks": [...]}; payloads are then coalesced.
+API_BATCH_ENABLED = os.environ.get('API_BATCH_ENABLED', 'false').lower() == 'true'
+API_BATCH_MAX_ITEMS = int(os.environ.get('API_BATCH_MAX_ITEMS', 32))
+API_BATCH_WINDOW_MS = int(os.environ.get('API_BATCH_WINDOW_MS', 200))
+API_BATCH_DRAIN_TIMEOUT_SECONDS = int(os.environ.get('API_BATCH_DRAIN_TIMEOUT_SECONDS', 60))
+
 # Initialize database service if in database mode
 _database_service = None
 if USE_DATABASE_MODE:
@@ -256,20 +304,64 @@ if not USE_DATABASE_MODE:
 # =============================================================================
 FORCE_DEVICE = os.environ.get('DEMUCS_FORCE_DEVICE', '').strip().lower()
 DEMUCS_DEVICE = 'cpu'  # Will be set properly during startup
+# Mixed-precision for in-process Demucs on CUDA: 'bf16', 'fp16' or 'off'
+DEMUCS_AUTOCAST = os.environ.get('DEMUCS_AUTOCAST', 'bf16').strip().lower()
+DEMUCS_AUTOCAST_MAX_DRIFT_DB = float(os.environ.get('DEMUCS_AUTOCAST_MAX_DRIFT_DB', 0.5))
+# Activation memory one worker needs on top of the shared resident model
+DEMUCS_VRAM_PER_WORKER_GB = float(os.environ.get('DEMUCS_VRAM_PER_WORKER_GB', 3))
+# Concurrent in-process separations on CUDA are stacked into one forward pass
+DEMUCS_MAX_BATCH = int(os.environ.get('DEMUCS_MAX_BATCH', 4))
+DEMUCS_BATCH_WINDOW_MS = int(os.environ.get('DEMUCS_BATCH_WINDOW_MS', 250))
 
 # =============================================================================
 # WORKER CONFIGURATION
 # =============================================================================
-CPU_COUNT = multiprocessing.cpu_count()
+def _detect_cpu_count():
+    """CPUs actually usable by this process: cpuset affinity capped by the cgroup CPU quota."""
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = multiprocessing.cpu_count()
+    
+    # cgroup v2 ("max 100000" or "200000 100000"), then cgroup v1
+    quota = period = None
+    try:
+        with open('/sys/fs/cgroup/cpu.max', 'r') as f:
+            quota_str, period_str = f.read().split()
+        if quota_str != 'max':
+            quota, period = int(quota_str), int(period_str)
+    except (OSError, ValueError):
+        try:
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us', 'r') as f:
+                quota = int(f.read())
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us', 'r') as f:
+                period = int(f.read())
+        except (OSError, ValueError):
+            quota = period = None
+    if quota and period and quota > 0:
+        count = min(count, max(1, -(-quota // period)))
+    
+    return count
+
+
+CPU_COUNT = _detect_cpu_count()
 NUM_WORKERS = 1  # Will be set properly during startup
 
+# GPU worker autoscaling: grow the worker pool while the GPU is under-used
+GPU_AUTOSCALE_ENABLED = os.environ.get('GPU_AUTOSCALE_ENABLED', 'true').lower() == 'true'
+GPU_AUTOSCALE_WINDOW_SECONDS = int(os.environ.get('GPU_AUTOSCALE_WINDOW_SECONDS', 30))
+GPU_AUTOSCALE_TARGET_UTIL = int(os.environ.get('GPU_AUTOSCALE_TARGET_UTIL', 85))
+GPU_AUTOSCALE_MIN_FREE_GB = float(os.environ.get('GPU_AUTOSCALE_MIN_FREE_GB', 8))
+WORKER_TUNING_FILE = os.path.join(BASE_DIR, '.worker_tuning.json')
+
 # =============================================================================
 # QUEUE
 # =============================================================================
-track_queue = queue.Queue()
+track_queue = WorkStealingQueue()  # One deque per worker once NUM_WORKERS is known (app.py)
 queue_items = {}
 queue_items_lock = Lock()
 MAX_PROCESSING_TIME = 30 * 60
+UPLOAD_WAIT_TIMEOUT_SECONDS = 5  # How long a worker waits for an upload still being saved
 
 # =============================================================================
 # BATCH
@@ -8,6 +8,7 @@ This configuration maximizes throughput for the above hardware specs.
 """
 
 import os
+import sys
 import multiprocessing
 import psutil
 
@@ -144,41 +145,61 @@ LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 # PRINT CONFIGURATION
 # =============================================================================
 
+_SEP = "=" * 60
+
+
+def _compute_throughput_msg(gpu_config, track_workers):
+    """Throughput estimate text for print_config (its inputs are fixed at import)."""
+    # H100 processes a 3-4 minute track in ~20-30 seconds
+    if gpu_config['gpu_memory_gb'] >= 70 and gpu_config.get('ram_gb', 0) >= 200:
+        tracks_per_min = track_workers * 2.5
+        return (f"   🔥 ~{tracks_per_min:.0f} tracks/minute (H100 + 240GB RAM MAXIMUM)\n"
+                f"   🔥 ~{tracks_per_min * 60:.0f} tracks/hour")
+    elif gpu_config['gpu_memory_gb'] >= 70:
+        return f"   ~{track_workers * 2} tracks/minute (H100)"
+    elif gpu_config['gpu_memory_gb'] >= 40:
+        return f"   ~{track_workers * 1.5:.0f} tracks/minute"
+    else:
+        return f"   ~{track_workers} tracks/minute"
+
+
+_THROUGHPUT_MSG = _compute_throughput_msg(GPU_CONFIG, TRACK_WORKERS)
+_GPU_NAME_STR = GPU_CONFIG['gpu_name'] or 'N/A'
+_GPU_MEM_STR = f"{GPU_CONFIG['gpu_memory_gb']:.1f}GB"
+
+
 def print_config():
-    """Print current configuration for debugging."""
-    print("\n" + "="*60)
-    print("ID BY RIVOLI - PRODUCTION CONFIGURATION")
-    print("="*60)
-    print(f"\n🖥️  SERVER:")
-    print(f"   Port: {PORT}")
-    print(f"   Gunicorn Workers: {GUNICORN_WORKERS}")
-    print(f"   Timeout: {GUNICORN_TIMEOUT}s")
+    """Print current configuration for debugging (one write for the whole report)."""
+    device = GPU_CONFIG['device']
+    lines = []
+    append = lines.append
+    append("\n" + _SEP)
+    append("ID BY RIVOLI - PRODUCTION CONFIGURATION")
+    append(_SEP)
+    append(f"\n🖥️  SERVER:")
+    append(f"   Port: {PORT}")
+    append(f"   Gunicorn Workers: {GUNICORN_WORKERS}")
+    append(f"   Timeout: {GUNICORN_TIMEOUT}s")
     
-    print(f"\n🎮 GPU:")
-    print(f"   Device: {GPU_CONFIG['device']}")
-    print(f"   GPU Name: {GPU_CONFIG['gpu_name'] or 'N/A'}")
-    print(f"   GPU Memory: {GPU_CONFIG['gpu_memory_gb']:.1f}GB")
+    append(f"\n🎮 GPU:")
+    append(f"   Device: {device}")
+    append(f"   GPU Name: {_GPU_NAME_STR}")
+    append(f"   GPU Memory: {_GPU_MEM_STR}")
     
-    print(f"\n⚡ PROCESSING:")
-    print(f"   Track Workers: {TRACK_WORKERS}")
-    print(f"   Demucs Jobs: {DEMUCS_JOBS}")
-    print(f"   Demucs Segment: {DEMUCS_SEGMENT}")
-    print(f"   Edit Workers: {EDIT_WORKERS}")
+    append(f"\n⚡ PROCESSING:")
+    append(f"   Track Workers: {TRACK_WORKERS}")
+    append(f"   Demucs Jobs: {DEMUCS_JOBS}")
+    append(f"   Demucs Segment: {DEMUCS_SEGMENT}")
+    append(f"   Edit Workers: {EDIT_WORKERS}")
     
-    print(f"\n📦 THROUGHPUT ESTIMATE:")
-    # H100 processes a 3-4 minute track in ~20-30 seconds
-    if GPU_CONFIG['gpu_memory_gb'] >= 70 and GPU_CONFIG.get('ram_gb', 0) >= 200:
-        tracks_per_min = TRACK_WORKERS * 2.5
-        print(f"   🔥 ~{tracks_per_min:.0f} tracks/minute (H100 + 240GB RAM MAXIMUM)")
-        print(f"   🔥 ~{tracks_per_min * 60:.0f} tracks/hour")
-    elif GPU_CONFIG['gpu_memory_gb'] >= 70:
-        print(f"   ~{TRACK_WORKERS * 2} tracks/minute (H100)")
-    elif GPU_CONFIG['gpu_memory_gb'] >= 40:
-        print(f"   ~{TRACK_WORKERS * 1.5:.0f} tracks/minute")
-    else:
-        print(f"   ~{TRACK_WORKERS} tracks/minute")
+    append(f"\n📦 THROUGHPUT ESTIMATE:")
+    append(_THROUGHPUT_MSG)
     
-    print("="*60 + "\n")
+    append(_SEP + "\n")
+    # A single write() stays a single syscall whether stdout is block-buffered,
+    # line-buffered (TTY) or write-through (PYTHONUNBUFFERED=1 / gunicorn --capture-output)
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
 
 if __name__ == '__main__':
     print_config()
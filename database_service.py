@@ -12,12 +12,29 @@ Setup:
 
 import os
 import re
+import sys
+import atexit
 import json
+import time
 import uuid
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 import threading
 import traceback
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_futures
+from functools import lru_cache
+
+# Per-track progress goes through this logger (message-only on stdout, like the
+# demucs logger). DB_LOG_LEVEL=DEBUG adds the field-mapping traces; WARNING quiets it.
+logger = logging.getLogger('database_service')
+if not logger.handlers:
+    _log_handler = logging.StreamHandler(sys.stdout)
+    _log_handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_log_handler)
+    logger.setLevel(os.environ.get('DB_LOG_LEVEL', 'INFO').upper())
+    logger.propagate = False
 
 # Try to import Prisma client
 PRISMA_AVAILABLE = False
@@ -45,6 +62,14 @@ try:
 except ImportError as e:
     print(f"⚠️ S3 service not available: {e}")
 
+# CUID v1 IDs (Keystone format) for rows we create with an explicit id;
+# falls back to a 'c' + 24 hex chars look-alike when the cuid package is missing
+try:
+    from cuid import cuid as _new_cuid
+except ImportError:
+    def _new_cuid() -> str:
+        return 'c' + uuid.uuid4().hex[:24]
+
 # Try to import waveform generator
 WAVEFORM_AVAILABLE = False
 try:
@@ -54,6 +79,38 @@ try:
 except ImportError as e:
     print(f"⚠️ Waveform generator not available: {e}")
 
+# Prisma query-engine pool (appended to DATABASE_URL unless it already sets them).
+# Worker threads share one client; the engine default (num_cpus*2+1) is too small
+# for concurrent uploads. Keep the pool below the database's max_connections.
+PRISMA_POOL_SIZE = int(os.environ.get('PRISMA_POOL_SIZE', 20))
+PRISMA_POOL_TIMEOUT = int(os.environ.get('PRISMA_POOL_TIMEOUT', 30))
+
+# Artist/ReferenceArtist lookup caches: entries per cache, how long a hit is
+# trusted (renames made elsewhere show up after that) and how long a miss is
+# remembered; plus how many fuzzy candidates one find_artist_by_name query fetches
+ARTIST_CACHE_SIZE = int(os.environ.get('ARTIST_CACHE_SIZE', 5000))
+ARTIST_CACHE_TTL_SECONDS = int(os.environ.get('ARTIST_CACHE_TTL_SECONDS', 3600))
+ARTIST_MISS_TTL_SECONDS = int(os.environ.get('ARTIST_MISS_TTL_SECONDS', 600))
+_ARTIST_FUZZY_TAKE = 25
+
+# Concurrent S3 work: cover uploads overlap the audio upload, and
+# create_or_update_tracks_batch runs this many tracks at once
+S3_CONCURRENCY = int(os.environ.get('S3_CONCURRENCY', 4))
+_COVER_UPLOAD_POOL = ThreadPoolExecutor(max_workers=S3_CONCURRENCY, thread_name_prefix='s3-cover')
+
+# Waveforms (download + ffmpeg decode) run beside the S3/DB work of their track
+WAVEFORM_WORKERS = int(os.environ.get('WAVEFORM_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+_WAVEFORM_POOL = ThreadPoolExecutor(max_workers=WAVEFORM_WORKERS, thread_name_prefix='waveform')
+
+# New tracks are inserted without waiting for their waveform; these futures,
+# keyed by (track id, waveform field), resolve once the follow-up update has
+# been written (see wait_waveforms). Drained at exit for up to this long.
+WAVEFORM_DRAIN_TIMEOUT_SECONDS = int(os.environ.get('WAVEFORM_DRAIN_TIMEOUT_SECONDS', 120))
+_pending_waveform_patches: Dict[tuple, Future] = {}
+_pending_waveform_patches_lock = threading.Lock()
+
+_LOG_SEP = '=' * 60
+
 # Type to file field mapping (matching NestJS create-track.dto.ts)
 TYPE_TO_FILE_FIELD_MAP = {
     # Main versions
@@ -151,6 +208,22 @@ FIELDS_WITH_WAV_VARIANTS = [
 # (Currently none — all fields have WAV variants in the schema)
 MP3_ONLY_FIELDS = []
 
+# Case-insensitive type lookup and set views for get_file_field_from_type
+TYPE_TO_FILE_FIELD_MAP_LOWER = {k.lower(): v for k, v in TYPE_TO_FILE_FIELD_MAP.items()}
+MP3_ONLY_SET = frozenset(MP3_ONLY_FIELDS)
+WAV_VARIANT_SET = frozenset(FIELDS_WITH_WAV_VARIANTS)
+
+# Fields whose upload goes to tracks/wav/ (vs tracks/mp3/)
+_WAV_FIELDS = frozenset([
+    'trackWav', 'originalTrackWave', 'originalTrackWaveClean',
+    'originalTrackWaveDirty', 'extendedTrackWave', 'extendedTrackWaveClean',
+    'extendedTrackWaveDirty', 'clapInMainWav', 'shortMainWav',
+    'shortAcapInWav', 'shortClapInWav', 'acapInAcapOutMainWav',
+    'slamDirtyMainWav', 'shortAcapOutWav', 'clapInShortAcapOutWav',
+    'slamIntroShortAcapOutWav', 'acapInWav', 'acapOutWav',
+    'introWav', 'shortWav', 'acapellaWav', 'instruWav', 'superShortWav',
+])
+
 # Known styles for parsing
 KNOWN_STYLES = [
     'drum and bass', 'hip hop', 'r&b', 'r & b',
@@ -161,58 +234,162 @@ KNOWN_STYLES = [
     'disco', 'edm', 'trap', 'drill', 'afrobeat', 'dancehall'
 ]
 
+# Styles longest first, so multi-word styles ('drum and bass', 'hip hop') are
+# taken before the shorter ones inside them. _STYLE_NAMES[i] is the normalized
+# name for _STYLE_SOURCES[i]; _ALL_STYLES_RE joins them, group i matching style i.
+_SORTED_STYLES = sorted(KNOWN_STYLES, key=len, reverse=True)
+_STYLE_NAMES = [s.replace(' & ', '&').replace(' ', '_').lower() for s in _SORTED_STYLES]
+_STYLE_SOURCES = [s.replace(' ', r'\s*').replace('&', r'\s*&\s*') for s in _SORTED_STYLES]
+_STYLE_RES = [re.compile(src, re.IGNORECASE) for src in _STYLE_SOURCES]
+_ALL_STYLES_RE = re.compile('|'.join(f'({src})' for src in _STYLE_SOURCES), re.IGNORECASE)
+_MULTI_VALUE_SPLIT_RE = re.compile(r'[\/,\|;]+')
 
-class PrismaDatabaseService:
-    """Service for direct database operations using Prisma."""
+# Artist separators: "feat."/"ft."/"featuring" (absorbing a ", " or " & " right
+# before it), " & " (not "R&B"), " x " (not "Lil Nas X & ..."), ", "
+_ARTIST_SPLIT_RE = re.compile(
+    r'(?:\s*,|\s+&)?\s+(?:feat\.?|ft\.?|featuring)\s+'
+    r'|\s+&\s+'
+    r'|\s+x\s+(?!(?:&|feat\.?|ft\.?|featuring)\s)'
+    r'|\s*,\s+',
+    re.IGNORECASE
+)
+
+# Trailing separators left after stripping a type suffix
+_TRAILING_SEP_RE = re.compile(r'[\s\-]+$')
+
+
+def split_artist_names(artist_name: str) -> List[str]:
+    """Split compound artist string into individual names.
+    
+    'Akon Ft. John Mamann & Dawty Music' → ['Akon', 'John Mamann', 'Dawty Music']
+    'A Boogie Wit Da Hoodie & Pnb Rock' → ['A Boogie Wit Da Hoodie', 'Pnb Rock']
+    'A, feat. B' → ['A', 'B']
+    """
+    if not artist_name:
+        return []
+    
+    return [p.strip() for p in _ARTIST_SPLIT_RE.split(artist_name) if p.strip()]
+
+
+def parse_styles(value: str) -> List[str]:
+    """Normalized known styles in a style string, in style order per part.
+    
+    'Hip Hop / R&B' → ['hip_hop', 'r&b']
+    'Reggaeton, Dancehall' → ['reggaeton', 'dancehall']
+    """
+    if not value:
+        return []
     
-    _instance = None
-    _lock = threading.Lock()
+    result = []
+    for part in _MULTI_VALUE_SPLIT_RE.split(value.lower()):
+        part = part.strip()
+        if not part:
+            continue
+        # Usual case: the whole part is one style, a single scan decides it
+        m = _ALL_STYLES_RE.fullmatch(part)
+        if m:
+            found = [_STYLE_NAMES[m.lastindex - 1]]
+        elif not _ALL_STYLES_RE.search(part):
+            continue
+        else:
+            # Several or run-together styles ('pop rock', 'popunk'): remove the
+            # longest first, so overlapping tokens resolve the same way as always
+            found = []
+            for name, regex in zip(_STYLE_NAMES, _STYLE_RES):
+                if regex.search(part):
+                    found.append(name)
+                    part = regex.sub(' ', part).strip()
+        for name in found:
+            if name not in result:
+                result.append(name)
+    return result
+
+
+@lru_cache(maxsize=128)
+def _dash_type_re(track_type: str) -> re.Pattern:
+    """Matches a trailing ' - <track_type>' suffix (one compile per type)."""
+    return re.compile(rf'\s*-\s*{re.escape(track_type)}\s*$', re.IGNORECASE)
+
+
+class _LRUCache:
+    """Thread-safe LRU map with a fixed size and a per-entry lifetime."""
     
-    def __new__(cls):
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super().__new__(cls)
-                    cls._instance._initialized = False
-        return cls._instance
+    def __init__(self, maxsize: int, ttl: float):
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            if entry[1] <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return entry[0]
+    
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self._ttl)
+            self._data.move_to_end(key)
+            if len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+
+
+class PrismaDatabaseService:
+    """Service for direct database operations using Prisma (use get_database_service())."""
     
     def __init__(self):
-        if self._initialized:
-            return
-        
-        self._initialized = True
         self._db: Optional[Prisma] = None
         self._connected = False
+        # Lookups keyed by lowercased name (repeat artists skip the DB)
+        self._artist_cache = _LRUCache(ARTIST_CACHE_SIZE, ARTIST_CACHE_TTL_SECONDS)
+        self._artist_misses = _LRUCache(ARTIST_CACHE_SIZE, ARTIST_MISS_TTL_SECONDS)
+        self._ref_artist_cache = _LRUCache(ARTIST_CACHE_SIZE, ARTIST_CACHE_TTL_SECONDS)
         
-        print(f"🔌 Prisma Database Service initialized")
+        logger.info("🔌 Prisma Database Service initialized")
         database_url = os.environ.get('DATABASE_URL', '')
         if database_url:
             masked_url = re.sub(r':([^:@]+)@', ':****@', database_url)
-            print(f"   DATABASE_URL: {masked_url}")
+            logger.info("   DATABASE_URL: %s", masked_url)
         else:
-            print("   ⚠️ DATABASE_URL not set!")
+            logger.warning("   ⚠️ DATABASE_URL not set!")
     
     def connect(self) -> bool:
         """Connect to the database."""
         if not PRISMA_AVAILABLE:
-            print("❌ Prisma client not available. Run setup commands first.")
+            logger.error("❌ Prisma client not available. Run setup commands first.")
             return False
         
         if self._connected and self._db:
             return True
         
         try:
-            self._db = Prisma()
+            database_url = self._pooled_database_url()
+            self._db = Prisma(datasource={'url': database_url}) if database_url else Prisma()
             self._db.connect()
             self._connected = True
-            print("✅ Prisma connected to database")
+            logger.info("✅ Prisma connected to database")
             return True
         except Exception as e:
-            print(f"❌ Prisma connection failed: {e}")
+            logger.error("❌ Prisma connection failed: %s", e)
             traceback.print_exc()
             self._connected = False
             return False
     
+    def _pooled_database_url(self) -> str:
+        """DATABASE_URL with connection_limit/pool_timeout added if missing."""
+        database_url = os.environ.get('DATABASE_URL', '')
+        if not database_url or 'connection_limit=' in database_url:
+            return database_url
+        params = f'connection_limit={PRISMA_POOL_SIZE}'
+        if 'pool_timeout=' not in database_url:
+            params += f'&pool_timeout={PRISMA_POOL_TIMEOUT}'
+        return database_url + ('&' if '?' in database_url else '?') + params
+    
     def disconnect(self):
         """Disconnect from the database."""
         if self._db and self._connected:
@@ -275,15 +452,16 @@ class PrismaDatabaseService:
         
         # Remove dash-based type suffix: " - Instrumental", " - Main", etc.
         if track_type:
-            dash_pattern = re.compile(rf'\s*-\s*{re.escape(track_type)}\s*$', re.IGNORECASE)
+            dash_pattern = _dash_type_re(track_type)
             result = dash_pattern.sub('', result)
-            type_suffix = ' ' + track_type
-            if result.lower().endswith(type_suffix.lower()):
+            # Compare only the tail (no lowercased copy of the whole string)
+            type_suffix = ' ' + track_type.lower()
+            if result[-len(type_suffix):].lower() == type_suffix:
                 result = result[:-len(type_suffix)]
         
         # Clean up and convert back to underscore format
         result = result.strip()
-        result = re.sub(r'[\s\-]+$', '', result)
+        result = _TRAILING_SEP_RE.sub('', result)
         result = result.replace(' ', '_')
         result = re.sub(r'_+', '_', result)
         result = re.sub(r'_$', '', result)
@@ -329,45 +507,21 @@ class PrismaDatabaseService:
         
         # Also remove dash-based type suffix: "- Instrumental", "- Main", etc.
         if track_type:
-            dash_pattern = re.compile(rf'\s*-\s*{re.escape(track_type)}\s*$', re.IGNORECASE)
-            if dash_pattern.search(result):
-                result = dash_pattern.sub('', result).strip()
+            dash_pattern = _dash_type_re(track_type)
+            stripped, n_subs = dash_pattern.subn('', result)
+            if n_subs:
+                result = stripped.strip()
             else:
-                type_suffix = ' ' + track_type
-                if result.lower().endswith(type_suffix.lower()):
+                type_suffix = ' ' + track_type.lower()
+                if result[-len(type_suffix):].lower() == type_suffix:
                     result = result[:-len(type_suffix)].strip()
         
-        result = re.sub(r'[\s\-]+$', '', result).strip()
+        result = _TRAILING_SEP_RE.sub('', result).strip()
         return result
     
     def parse_multi_value_field(self, value: Optional[str]) -> List[str]:
         """Parse style/mood/univers string."""
-        if not value:
-            return []
-        
-        normalized_known = [s.replace(' & ', '&').replace(' ', '_').lower() for s in KNOWN_STYLES]
-        result = []
-        remaining = value.lower().strip()
-        
-        if re.search(r'[\/,\|;]+', remaining):
-            parts = [p.strip() for p in re.split(r'[\/,\|;]+', remaining) if p.strip()]
-        else:
-            parts = [remaining]
-        
-        sorted_styles = sorted(KNOWN_STYLES, key=len, reverse=True)
-        
-        for part in parts:
-            for style in sorted_styles:
-                regex = re.compile(style.replace(' ', r'\s*').replace('&', r'\s*&\s*'), re.IGNORECASE)
-                match = regex.search(part)
-                
-                if match:
-                    normalized = style.replace(' & ', '&').replace(' ', '_').lower()
-                    if normalized not in result:
-                        result.append(normalized)
-                    part = regex.sub(' ', part).strip()
-        
-        return [v for v in result if v in normalized_known]
+        return parse_styles(value)
     
     def get_file_field_from_type(self, track_type: Optional[str], format: Optional[str] = None) -> Optional[str]:
         """Map track type to database field name."""
@@ -375,93 +529,95 @@ class PrismaDatabaseService:
             return None
         
         is_wav = format and format.upper() in ('WAV', 'WAVE')
-        print(f"   🔍 get_file_field_from_type: type='{track_type}', format='{format}', is_wav={is_wav}")
+        logger.debug("   🔍 get_file_field_from_type: type='%s', format='%s', is_wav=%s", track_type, format, is_wav)
         
-        if track_type.lower() == 'main':
+        type_lower = track_type.lower()
+        if type_lower == 'main':
             field = 'trackWav' if is_wav else 'trackFile'
-            print(f"   🔍 Main type → {field}")
+            logger.debug("   🔍 Main type → %s", field)
             return field
         
-        if track_type.lower() == 'extended':
+        if type_lower == 'extended':
             field = 'extendedTrackWave' if is_wav else 'extendedTrackMp3'
-            print(f"   🔍 Extended type → {field}")
+            logger.debug("   🔍 Extended type → %s", field)
             return field
         
-        base_field = TYPE_TO_FILE_FIELD_MAP.get(track_type)
-        if not base_field:
-            for key, value in TYPE_TO_FILE_FIELD_MAP.items():
-                if key.lower() == track_type.lower():
-                    base_field = value
-                    break
+        base_field = TYPE_TO_FILE_FIELD_MAP_LOWER.get(type_lower)
         
         if not base_field:
-            print(f"   🔍 No base_field found for type '{track_type}'")
+            logger.debug("   🔍 No base_field found for type '%s'", track_type)
             return None
         
         # MP3-only types — skip WAV
-        if is_wav and base_field in MP3_ONLY_FIELDS:
-            print(f"   ⏭️ {base_field} is MP3-only — WAV skipped")
+        if is_wav and base_field in MP3_ONLY_SET:
+            logger.debug("   ⏭️ %s is MP3-only — WAV skipped", base_field)
             return None
         
         # Original/Extended Mp3 fields → their Wave equivalents when format is WAV
         # e.g. originalTrackMp3Clean → originalTrackWaveClean
         if is_wav and 'Mp3' in base_field:
             field = base_field.replace('Mp3', 'Wave')
-            print(f"   🔍 WAV variant (Mp3→Wave): {base_field} → {field}")
+            logger.debug("   🔍 WAV variant (Mp3→Wave): %s → %s", base_field, field)
             return field
         
-        if is_wav and base_field in FIELDS_WITH_WAV_VARIANTS:
+        if is_wav and base_field in WAV_VARIANT_SET:
             field = f"{base_field}Wav"
-            print(f"   🔍 WAV variant: {base_field} → {field}")
+            logger.debug("   🔍 WAV variant: %s → %s", base_field, field)
             return field
         
-        print(f"   🔍 Using base field: {base_field}")
+        logger.debug("   🔍 Using base field: %s", base_field)
         return base_field
     
     def find_artist_by_name(self, artist_name: str):
-        """Find artist by name."""
+        """Find artist by name: exact (case-insensitive) match first, then a 'contains' match."""
         if not artist_name:
             return None
         
+        cache_key = artist_name.lower()
+        artist = self._artist_cache.get(cache_key)
+        if artist:
+            return artist
+        if self._artist_misses.get(cache_key):
+            return None
+        
         try:
-            # Exact match first
-            artist = self.db.artist.find_first(
-                where={'name': {'equals': artist_name, 'mode': 'insensitive'}}
+            # One query: exact matches are a subset of 'contains' matches
+            candidates = self.db.artist.find_many(
+                where={'name': {'contains': artist_name, 'mode': 'insensitive'}},
+                take=_ARTIST_FUZZY_TAKE
             )
-            if artist:
-                return artist
+            artist = next((a for a in candidates if a.name.lower() == cache_key), None)
+            if not artist and len(candidates) == _ARTIST_FUZZY_TAKE:
+                # Many partial matches: the exact one may be past the first page
+                artist = self.db.artist.find_first(
+                    where={'name': {'equals': artist_name, 'mode': 'insensitive'}}
+                )
+            if not artist and candidates:
+                artist = candidates[0]
             
-            # Contains match
-            artist = self.db.artist.find_first(
-                where={'name': {'contains': artist_name, 'mode': 'insensitive'}}
-            )
+            if artist:
+                self._artist_cache.set(cache_key, artist)
+            else:
+                self._artist_misses.set(cache_key, True)
             return artist
         except Exception as e:
-            print(f"   ⚠️ Artist lookup failed: {e}")
+            logger.warning("   ⚠️ Artist lookup failed: %s", e)
             return None
     
     def _split_artist_string(self, artist_name: str) -> List[str]:
-        """Split compound artist string into individual names.
-        
-        'Akon Ft. John Mamann & Dawty Music' → ['Akon', 'John Mamann', 'Dawty Music']
-        'A Boogie Wit Da Hoodie & Pnb Rock' → ['A Boogie Wit Da Hoodie', 'Pnb Rock']
-        """
-        if not artist_name:
-            return []
-        
-        # Normalize separators to |
-        s = artist_name
-        # "Ft.", "Feat.", "feat.", "ft." "featuring" → separator
-        s = re.sub(r'\s+(?:feat\.?|ft\.?|featuring)\s+', '|', s, flags=re.IGNORECASE)
-        # " & " → separator (but not inside a name like "R&B")
-        s = re.sub(r'\s+&\s+', '|', s)
-        # " x " (collab marker) → separator
-        s = re.sub(r'\s+x\s+', '|', s, flags=re.IGNORECASE)
-        # ", " between artists
-        s = re.sub(r'\s*,\s+', '|', s)
-        
-        parts = [p.strip() for p in s.split('|') if p.strip()]
-        return parts
+        """Split compound artist string into individual names (see split_artist_names)."""
+        return split_artist_names(artist_name)
+    
+    def _create_reference_artist(self, name: str):
+        """Create a reference artist with a CUID v1 ID (matching Keystone format)."""
+        new_id = _new_cuid()
+        new_artist = self.db.referenceartist.create(data={
+            'id': new_id,
+            'name': name,
+        })
+        logger.info("   ➕ Created new ReferenceArtist: '%s' (id=%s)", name, new_id)
+        self._ref_artist_cache.set(name.lower(), new_artist)
+        return new_artist
     
     def find_or_create_reference_artist(self, name: str):
         """Find a reference artist by exact name (case-insensitive), or create one."""
@@ -469,38 +625,30 @@ class PrismaDatabaseService:
             return None
         
         name = name.strip()
+        cache_key = name.lower()
+        cached = self._ref_artist_cache.get(cache_key)
+        if cached:
+            return cached
         
         try:
             # Exact match (case-insensitive)
-            existing = self.db.referenceartist.find_first(
+            artist = self.db.referenceartist.find_first(
                 where={'name': {'equals': name, 'mode': 'insensitive'}}
             )
-            if existing:
-                return existing
-            
-            # Create new reference artist with CUID v1 ID (matching Keystone format)
-            try:
-                import cuid as _cuid
-                new_id = _cuid.cuid()
-            except ImportError:
-                import uuid
-                new_id = 'c' + str(uuid.uuid4()).replace('-', '')[:24]
-            
-            new_artist = self.db.referenceartist.create(data={
-                'id': new_id,
-                'name': name,
-            })
-            print(f"   ➕ Created new ReferenceArtist: '{name}' (id={new_id})")
-            return new_artist
+            if not artist:
+                return self._create_reference_artist(name)
+            self._ref_artist_cache.set(cache_key, artist)
+            return artist
         except Exception as e:
-            print(f"   ⚠️ ReferenceArtist upsert failed for '{name}': {e}")
+            logger.warning("   ⚠️ ReferenceArtist upsert failed for '%s': %s", name, e)
             return None
     
     def find_reference_artists(self, artist_name: str) -> List:
         """Find or create reference artists from a compound artist string.
         
         Splits 'Akon Ft. John Mamann & Dawty Music' into individual names,
-        then finds or creates each one as a ReferenceArtist.
+        then finds or creates each one as a ReferenceArtist. Names not yet
+        cached are looked up with a single query; only true misses are created.
         """
         if not artist_name:
             return []
@@ -510,17 +658,45 @@ class PrismaDatabaseService:
             if not individual_names:
                 return []
             
-            print(f"   🔍 Parsed artists: {individual_names}")
+            logger.debug("   🔍 Parsed artists: %s", individual_names)
             
-            results = []
+            # Dedupe case-insensitively, keeping order (same length rule as find_or_create)
+            names = {}
             for name in individual_names:
-                artist = self.find_or_create_reference_artist(name)
-                if artist:
-                    results.append(artist)
+                name = name.strip()
+                if len(name) >= 2:
+                    names.setdefault(name.lower(), name)
             
-            return results
+            found = {}
+            for key in names:
+                cached = self._ref_artist_cache.get(key)
+                if cached:
+                    found[key] = cached
+            
+            missing = [key for key in names if key not in found]
+            if missing:
+                existing = self.db.referenceartist.find_many(
+                    where={'OR': [
+                        {'name': {'equals': names[key], 'mode': 'insensitive'}}
+                        for key in missing
+                    ]}
+                )
+                for artist in existing:
+                    key = artist.name.lower()
+                    if key in names and key not in found:
+                        found[key] = artist
+                        self._ref_artist_cache.set(key, artist)
+                
+                for key in missing:
+                    if key not in found:
+                        try:
+                            found[key] = self._create_reference_artist(names[key])
+                        except Exception as e:
+                            logger.warning("   ⚠️ ReferenceArtist upsert failed for '%s': %s", names[key], e)
+            
+            return [found[key] for key in names if key in found]
         except Exception as e:
-            print(f"   ⚠️ Reference artists upsert failed: {e}")
+            logger.warning("   ⚠️ Reference artists upsert failed: %s", e)
             return []
     
     def find_or_create_album(self, album_name: str, release_date: str, 
@@ -544,7 +720,7 @@ class PrismaDatabaseService:
                 if new_artist_ids and existing_artist_ids:
                     if new_artist_ids & existing_artist_ids:
                         album = candidate
-                        print(f"   📀 Album matched by name + artist overlap: '{album_name}'")
+                        logger.info("   📀 Album matched by name + artist overlap: '%s'", album_name)
                         break
                 elif not new_artist_ids and not existing_artist_ids:
                     album = candidate
@@ -561,28 +737,26 @@ class PrismaDatabaseService:
                 if not album.releaseDate and release_date:
                     update_data['releaseDate'] = release_date
                 
-                if update_data:
-                    album = self.db.album.update(
-                        where={'id': album.id},
-                        data=update_data
-                    )
-                
-                # Connect reference artists
+                # Connect reference artists in the same update
                 if reference_artists:
-                    for artist in reference_artists:
-                        try:
-                            self.db.album.update(
-                                where={'id': album.id},
-                                data={'ReferenceArtist': {'connect': [{'id': artist.id}]}}
-                            )
-                        except:
-                            pass
+                    update_data['ReferenceArtist'] = {
+                        'connect': [{'id': a.id} for a in reference_artists]
+                    }
+                
+                if update_data:
+                    try:
+                        album = self.db.album.update(
+                            where={'id': album.id},
+                            data=update_data
+                        ) or album
+                    except Exception as e:
+                        logger.warning("   ⚠️ Album update failed: %s", e)
                 
                 return album
             
             # No matching album (or name matched but artists differ) → create new
             if candidates:
-                print(f"   📀 Album name '{album_name}' exists but artists differ → creating separate album")
+                logger.info("   📀 Album name '%s' exists but artists differ → creating separate album", album_name)
             
             create_data = {
                 'nomAlbum': album_name,
@@ -600,9 +774,31 @@ class PrismaDatabaseService:
             return album
             
         except Exception as e:
-            print(f"   ⚠️ Album lookup/create failed: {e}")
+            logger.warning("   ⚠️ Album lookup/create failed: %s", e)
             return None
     
+    def _unique_track_id(self, client, base_track_id: str, artist_name: str) -> str:
+        """Ensure a new trackId doesn't collide with a different track.
+        
+        Tries base_track_id, then base_track_id_<artist>, then adds a timestamp;
+        both candidates are checked with a single query.
+        """
+        artist_suffix = re.sub(r'[^\w]', '_', artist_name) if artist_name else ''
+        artist_suffix = re.sub(r'_+', '_', artist_suffix).strip('_')
+        with_artist = f"{base_track_id}_{artist_suffix}" if artist_suffix else base_track_id
+        
+        taken = {t.trackId for t in client.track.find_many(
+            where={'trackId': {'in': list({base_track_id, with_artist})}}
+        )}
+        if base_track_id not in taken:
+            return base_track_id
+        
+        track_id = with_artist
+        if track_id in taken:
+            track_id = f"{track_id}_{int(time.time())}"
+        logger.info("   📝 trackId collision → using: %s", track_id)
+        return track_id
+    
     def create_or_update_track(self, track_data: Dict[str, Any], skip_waveform: bool = False) -> Dict[str, Any]:
         """Create or update a track using Prisma.
         
@@ -615,22 +811,22 @@ class PrismaDatabaseService:
                 return {'error': 'Database connection failed'}
             
             # Sanitize all string values
-            sanitized_data = {k: self.sanitize_string(v) for k, v in track_data.items()}
+            # (inlined sanitize_string: only str values need work)
+            sanitized_data = {
+                k: v.replace('\x00', '').strip() if type(v) is str else v
+                for k, v in track_data.items()
+            }
             
             track_type = sanitized_data.get('Type', '')
             format_type = sanitized_data.get('Format', 'MP3')
             
-            print(f"\n{'='*60}")
-            print(f"📀 PRISMA: Processing track")
-            print(f"   Type: {track_type}")
-            print(f"   Format: {format_type}")
-            print(f"   Titre: {sanitized_data.get('Titre', 'N/A')}")
-            print(f"{'='*60}")
+            logger.info("\n%s\n📀 PRISMA: Processing track\n   Type: %s\n   Format: %s\n   Titre: %s\n%s",
+                        _LOG_SEP, track_type, format_type, sanitized_data.get('Titre', 'N/A'), _LOG_SEP)
             
             # Get file field from type
             file_field = self.get_file_field_from_type(track_type, format_type)
             if not file_field:
-                print(f"   ❌ No valid field for type '{track_type}' + format '{format_type}' — skipping")
+                logger.error("   ❌ No valid field for type '%s' + format '%s' — skipping", track_type, format_type)
                 return {'error': f"No valid field for type '{track_type}' + format '{format_type}'"}
             
             # Extract base track ID and title
@@ -642,9 +838,9 @@ class PrismaDatabaseService:
             base_track_id = self.extract_base_track_id(raw_track_id, track_type)
             base_title = self.extract_base_title(sanitized_data.get('Titre', ''), track_type)
             
-            print(f"   Base Track ID: {base_track_id}")
-            print(f"   Base Title: {base_title}")
-            print(f"   File Field: {file_field}")
+            logger.info("   Base Track ID: %s", base_track_id)
+            logger.info("   Base Title: %s", base_title)
+            logger.info("   File Field: %s", file_field)
             
             # Parse release date
             date_sortie = sanitized_data.get('Date de sortie', 0)
@@ -664,9 +860,9 @@ class PrismaDatabaseService:
             matched_ref_artists = self.find_reference_artists(artist_name)
             
             if matched_artist:
-                print(f"   Matched Artist: {matched_artist.name}")
+                logger.info("   Matched Artist: %s", matched_artist.name)
             if matched_ref_artists:
-                print(f"   Matched Ref Artists: {[a.name for a in matched_ref_artists]}")
+                logger.info("   Matched Ref Artists: %s", [a.name for a in matched_ref_artists])
             
             # Find or create album
             album_name = sanitized_data.get('Album', '')
@@ -675,34 +871,100 @@ class PrismaDatabaseService:
                 sanitized_data.get('Label'), sanitized_data.get('Sous-label')
             )
             if matched_album:
-                print(f"   Matched Album: {matched_album.nomAlbum}")
+                logger.info("   Matched Album: %s", matched_album.nomAlbum)
+            
+            # === UPSERT LOGIC: Match by ISRC + ReferenceArtist + Title ===
+            # All three must match to consider it the same track; otherwise create new.
+            # Looked up before the uploads: it decides whether a waveform is needed.
+            isrc_value = sanitized_data.get('ISRC', '').strip()
+            existing_track = None
+            
+            new_ref_names = set()
+            if matched_ref_artists:
+                new_ref_names = {a.name.lower() for a in matched_ref_artists}
+            if artist_name:
+                for part in self._split_artist_string(artist_name):
+                    new_ref_names.add(part.strip().lower())
+            
+            can_upsert = bool(isrc_value) and bool(base_title) and bool(new_ref_names)
+            
+            if can_upsert:
+                isrc_candidates = self.db.track.find_many(
+                    where={'ISRC': {'equals': isrc_value, 'mode': 'insensitive'}},
+                    include={'Artist': True, 'ReferenceArtist': True, 'Album': True}
+                )
+                
+                base_title_key = base_title.strip().lower()
+                for candidate in isrc_candidates:
+                    # Check title match (case-insensitive)
+                    candidate_title = (candidate.title or '').strip().lower()
+                    if candidate_title != base_title_key:
+                        continue
+                    
+                    # Check reference artist overlap
+                    candidate_ref_names = set()
+                    if candidate.ReferenceArtist:
+                        candidate_ref_names = {a.name.lower() for a in candidate.ReferenceArtist}
+                    if candidate.originalArtist:
+                        for part in self._split_artist_string(candidate.originalArtist):
+                            candidate_ref_names.add(part.strip().lower())
+                    
+                    if candidate_ref_names & new_ref_names:
+                        existing_track = candidate
+                        logger.info("   🔗 UPSERT MATCH (ISRC + Artist + Title): ISRC='%s', title='%s', artists=%s → trackId=%s", isrc_value, base_title, list(candidate_ref_names & new_ref_names), candidate.trackId)
+                        break
+                
+                if not existing_track:
+                    logger.info("   🆕 No 3-field match (ISRC='%s', title='%s', artists=%s) → will create new track", isrc_value, base_title, list(new_ref_names))
+            else:
+                missing = []
+                if not isrc_value: missing.append('ISRC')
+                if not base_title: missing.append('title')
+                if not new_ref_names: missing.append('ReferenceArtist')
+                logger.info("   🆕 Cannot upsert — missing: %s → will create new track", ', '.join(missing))
             
             # File URL and S3 upload
             file_url = sanitized_data.get('Fichiers', '')
             file_filename = ''
             file_filesize = 0
             
+            # Start the cover upload now so it runs while the audio file uploads
+            cover_future = None
+            cover_url = sanitized_data.get('Url', '')
+            if S3_AVAILABLE and file_url and cover_url and 'idbyrivoli' not in cover_url.lower():
+                logger.info("   📤 Uploading cover image...")
+                cover_future = _COVER_UPLOAD_POOL.submit(get_s3_service().upload_image, cover_url)
+            
+            # Start the waveform now too (only if the field still lacks one); it is
+            # collected when update/create data is built.
+            # trackFile and trackWav both use 'jsonData' (no separate trackWavJson in schema)
+            waveform_json_field = 'jsonData' if file_field in ('trackFile', 'trackWav') else f'{file_field}Json'
+            needs_waveform = not skip_waveform and WAVEFORM_AVAILABLE and bool(file_url)
+            if needs_waveform and existing_track:
+                if (existing_track.id, waveform_json_field) in _pending_waveform_patches:
+                    # Another variant (e.g. the WAV of Main) created the row and its waveform is on the way
+                    needs_waveform = False
+                elif file_field in ('trackFile', 'trackWav'):
+                    needs_waveform = not existing_track.jsonData or not existing_track.duration
+                else:
+                    needs_waveform = not getattr(existing_track, waveform_json_field, None)
+            waveform_future = None
+            if needs_waveform:
+                logger.info("   📊 Generating waveform for %s...", file_field)
+                waveform_future = _WAVEFORM_POOL.submit(generate_waveform_from_url, file_url)
+            
             # Upload file to S3 if configured (matching Keystone's storage pattern)
             if S3_AVAILABLE and file_url:
                 try:
                     s3 = get_s3_service()
                     
                     # Check if this is a WAV field
-                    wav_fields = [
-                        'trackWav', 'originalTrackWave', 'originalTrackWaveClean',
-                        'originalTrackWaveDirty', 'extendedTrackWave', 'extendedTrackWaveClean',
-                        'extendedTrackWaveDirty', 'clapInMainWav', 'shortMainWav',
-                        'shortAcapInWav', 'shortClapInWav', 'acapInAcapOutMainWav',
-                        'slamDirtyMainWav', 'shortAcapOutWav', 'clapInShortAcapOutWav',
-                        'slamIntroShortAcapOutWav', 'acapInWav', 'acapOutWav',
-                        'introWav', 'shortWav', 'acapellaWav', 'instruWav', 'superShortWav',
-                    ]
-                    is_wav = file_field in wav_fields
+                    is_wav = file_field in _WAV_FIELDS
                     
                     # Generate filename from title (Keystone stores just the filename)
                     # The Titre field already contains the variant (e.g., "Track Name - Main")
                     full_title = sanitized_data.get('Titre', '')
-                    print(f"   📝 Title for filename: '{full_title}'")
+                    logger.info("   📝 Title for filename: '%s'", full_title)
 
                     audio_filename = s3.generate_audio_filename(
                         full_title,
@@ -719,13 +981,13 @@ class PrismaDatabaseService:
                     else:
                         # Unique prefix: no ISRC → avoid title-only folder (e.g. "Hello" for 2 artists)
                         s3_folder = 'unk_' + uuid.uuid4().hex[:12]
-                        print(f"   ⚠️  No ISRC — using unique folder prefix to avoid homonym overwrite")
+                        logger.warning("   ⚠️  No ISRC — using unique folder prefix to avoid homonym overwrite")
                     # Sanitize: strip characters that are invalid in S3 key segments
                     s3_folder = re.sub(r'[^\w.\-]', '_', s3_folder).strip('_') or s3_folder
-                    print(f"   📁 S3 folder prefix: '{s3_folder}'")
+                    logger.info("   📁 S3 folder prefix: '%s'", s3_folder)
 
                     # Upload to S3 (stored in tracks/mp3/{s3_folder}/ or tracks/wav/{s3_folder}/)
-                    print(f"   📤 Uploading to S3 ({'WAV' if is_wav else 'MP3'} folder)...")
+                    logger.info("   📤 Uploading to S3 (%s folder)...", 'WAV' if is_wav else 'MP3')
                     result = s3.upload_audio_file(
                         source_url=file_url,
                         filename=audio_filename,
@@ -736,28 +998,29 @@ class PrismaDatabaseService:
                     # Store just the filename (like Keystone does)
                     file_filename = result.filename
                     file_filesize = result.filesize
-                    print(f"   ✅ S3 Upload complete: {file_filename} ({file_filesize} bytes)")
+                    logger.info("   ✅ S3 Upload complete: %s (%s bytes)", file_filename, file_filesize)
                     
                 except Exception as e:
-                    print(f"   ❌ S3 upload failed: {e}")
+                    logger.error("   ❌ S3 upload failed: %s", e)
                     traceback.print_exc()
+                    if waveform_future:
+                        waveform_future.cancel()
                     return {'error': f'S3 upload failed: {e}'}
             else:
                 if not S3_AVAILABLE:
-                    print(f"   ❌ S3 not configured - cannot upload file")
+                    logger.error("   ❌ S3 not configured - cannot upload file")
+                    if waveform_future:
+                        waveform_future.cancel()
                     return {'error': 'S3 not configured'}
                 if not file_url:
-                    print(f"   ❌ No file URL provided")
+                    logger.error("   ❌ No file URL provided")
                     return {'error': 'No file URL provided'}
             
             # Upload cover image to S3 if provided (matching Keystone's image storage)
             cover_image_data = {}
-            cover_url = sanitized_data.get('Url', '')
-            if S3_AVAILABLE and cover_url and 'idbyrivoli' not in cover_url.lower():
+            if cover_future:
                 try:
-                    s3 = get_s3_service()
-                    print(f"   📤 Uploading cover image...")
-                    img_result = s3.upload_image(cover_url)
+                    img_result = cover_future.result()
                     # Keystone stores: {field}_id, {field}_filesize, {field}_width, {field}_height, {field}_extension
                     cover_image_data = {
                         'coverImage_id': img_result.id,
@@ -766,76 +1029,27 @@ class PrismaDatabaseService:
                         'coverImage_height': img_result.height,
                         'coverImage_extension': img_result.extension,
                     }
-                    print(f"   ✅ Cover uploaded: {img_result.id}.{img_result.extension}")
+                    logger.info("   ✅ Cover uploaded: %s.%s", img_result.id, img_result.extension)
                 except Exception as e:
-                    print(f"   ⚠️ Cover upload failed: {e}")
-            
-            # === UPSERT LOGIC: Match by ISRC + ReferenceArtist + Title ===
-            # All three must match to consider it the same track; otherwise create new.
-            isrc_value = sanitized_data.get('ISRC', '').strip()
-            existing_track = None
-            
-            new_ref_names = set()
-            if matched_ref_artists:
-                new_ref_names = {a.name.lower() for a in matched_ref_artists}
-            if artist_name:
-                for part in self._split_artist_string(artist_name):
-                    new_ref_names.add(part.strip().lower())
+                    logger.warning("   ⚠️ Cover upload failed: %s", e)
             
-            can_upsert = bool(isrc_value) and bool(base_title) and bool(new_ref_names)
-            
-            if can_upsert:
-                isrc_candidates = self.db.track.find_many(
-                    where={'ISRC': {'equals': isrc_value, 'mode': 'insensitive'}},
-                    include={'Artist': True, 'ReferenceArtist': True, 'Album': True}
-                )
-                
-                for candidate in isrc_candidates:
-                    # Check title match (case-insensitive)
-                    candidate_title = (candidate.title or '').strip().lower()
-                    if candidate_title != base_title.strip().lower():
-                        continue
-                    
-                    # Check reference artist overlap
-                    candidate_ref_names = set()
-                    if candidate.ReferenceArtist:
-                        candidate_ref_names = {a.name.lower() for a in candidate.ReferenceArtist}
-                    if candidate.originalArtist:
-                        for part in self._split_artist_string(candidate.originalArtist):
-                            candidate_ref_names.add(part.strip().lower())
-                    
-                    if candidate_ref_names & new_ref_names:
-                        existing_track = candidate
-                        print(f"   🔗 UPSERT MATCH (ISRC + Artist + Title): ISRC='{isrc_value}', title='{base_title}', artists={list(candidate_ref_names & new_ref_names)} → trackId={candidate.trackId}")
-                        break
-                
-                if not existing_track:
-                    print(f"   🆕 No 3-field match (ISRC='{isrc_value}', title='{base_title}', artists={list(new_ref_names)}) → will create new track")
-            else:
-                missing = []
-                if not isrc_value: missing.append('ISRC')
-                if not base_title: missing.append('title')
-                if not new_ref_names: missing.append('ReferenceArtist')
-                print(f"   🆕 Cannot upsert — missing: {', '.join(missing)} → will create new track")
-            
-            # When creating new, ensure trackId doesn't collide with a different track
-            if not existing_track:
-                collision = self.db.track.find_first(where={'trackId': base_track_id})
-                if collision:
-                    artist_suffix = re.sub(r'[^\w]', '_', artist_name) if artist_name else ''
-                    artist_suffix = re.sub(r'_+', '_', artist_suffix).strip('_')
-                    if artist_suffix:
-                        base_track_id = f"{base_track_id}_{artist_suffix}"
-                    collision2 = self.db.track.find_first(where={'trackId': base_track_id})
-                    if collision2:
-                        import time
-                        base_track_id = f"{base_track_id}_{int(time.time())}"
-                    print(f"   📝 trackId collision → using: {base_track_id}")
+            # Metadata columns: set on create, filled only where empty on update
+            metadata_fields = {
+                'title': base_title,
+                'originalArtist': sanitized_data.get('Artiste original', ''),
+                'album': album_name,
+                'format': format_type,
+                'bpm': sanitized_data.get('BPM', 0) or 0,
+                'label': sanitized_data.get('Label'),
+                'SousLabel': sanitized_data.get('Sous-label', ''),
+                'releaseDate': release_date,
+                'ISRC': sanitized_data.get('ISRC', ''),
+            }
             
             if existing_track:
-                print(f"   📝 Updating existing track: {existing_track.id}")
-                print(f"   📁 Adding file field: {file_field}_filename = '{file_filename}'")
-                print(f"   📁 Adding file size: {file_field}_filesize = {file_filesize}")
+                logger.info("   📝 Updating existing track: %s", existing_track.id)
+                logger.info("   📁 Adding file field: %s_filename = '%s'", file_field, file_filename)
+                logger.info("   📁 Adding file size: %s_filesize = %s", file_field, file_filesize)
                 
                 # Build update data
                 update_data = {
@@ -850,56 +1064,28 @@ class PrismaDatabaseService:
                 if cover_image_data and (force_cover or not existing_track.coverImage_id):
                     update_data.update(cover_image_data)
                     if force_cover and existing_track.coverImage_id:
-                        print(f"   🖼️ Replacing existing cover (mandatory Deezer cover replacement)")
-                
-                # Generate waveform for audio fields (Main, Acapella, Intro, Instru, etc.)
-                # Map file_field → JSON waveform field name
-                # trackFile and trackWav both use 'jsonData' (no separate trackWavJson in schema)
-                waveform_json_field = 'jsonData' if file_field in ('trackFile', 'trackWav') else f'{file_field}Json' if file_field else None
-                needs_waveform = (
-                    not skip_waveform and WAVEFORM_AVAILABLE and file_url and waveform_json_field
-                )
-                if file_field in ('trackFile', 'trackWav'):
-                    needs_waveform = needs_waveform and (not existing_track.jsonData or not existing_track.duration)
-                # For non-main fields, always generate (check if json field is empty via getattr)
-                elif waveform_json_field:
-                    existing_json = getattr(existing_track, waveform_json_field, None) if hasattr(existing_track, waveform_json_field) else None
-                    needs_waveform = needs_waveform and not existing_json
+                        logger.info("   🖼️ Replacing existing cover (mandatory Deezer cover replacement)")
                 
-                if needs_waveform:
+                # Waveform for audio fields (Main, Acapella, Intro, Instru, etc.),
+                # submitted above only when the field is still empty
+                if waveform_future:
                     try:
-                        print(f"   📊 Generating waveform for {file_field}...")
-                        waveform_data = generate_waveform_from_url(file_url)
+                        waveform_data = waveform_future.result()
                         if waveform_data:
                             update_data[waveform_json_field] = PrismaJson(waveform_data['waveform'])
                             # Only set duration on main track fields
                             if file_field in ('trackFile', 'trackWav'):
                                 update_data['duration'] = waveform_data['duration']
-                            print(f"   ✅ Waveform added to {waveform_json_field}: {len(waveform_data['waveform'])} peaks, {waveform_data['duration']:.2f}s")
+                            logger.info("   ✅ Waveform added to %s: %s peaks, %.2fs", waveform_json_field, len(waveform_data['waveform']), waveform_data['duration'])
                     except Exception as e:
-                        print(f"   ⚠️ Waveform generation failed for {file_field}: {e}")
+                        logger.warning("   ⚠️ Waveform generation failed for %s: %s", file_field, e)
                 elif skip_waveform:
-                    print(f"   ⏭️ Waveform generation skipped (fast mode)")
+                    logger.info("   ⏭️ Waveform generation skipped (fast mode)")
                 
                 # Only update empty fields
-                if not existing_track.title:
-                    update_data['title'] = base_title
-                if not existing_track.originalArtist:
-                    update_data['originalArtist'] = sanitized_data.get('Artiste original', '')
-                if not existing_track.album:
-                    update_data['album'] = album_name
-                if not existing_track.format:
-                    update_data['format'] = format_type
-                if not existing_track.bpm:
-                    update_data['bpm'] = sanitized_data.get('BPM', 0) or 0
-                if not existing_track.label:
-                    update_data['label'] = sanitized_data.get('Label')
-                if not existing_track.SousLabel:
-                    update_data['SousLabel'] = sanitized_data.get('Sous-label', '')
-                if not existing_track.releaseDate:
-                    update_data['releaseDate'] = release_date
-                if not existing_track.ISRC:
-                    update_data['ISRC'] = sanitized_data.get('ISRC', '')
+                for field, value in metadata_fields.items():
+                    if not getattr(existing_track, field):
+                        update_data[field] = value
                 
                 # Connect artist
                 if matched_artist:
@@ -929,7 +1115,7 @@ class PrismaDatabaseService:
                     err_str = str(prisma_err)
                     # If waveform JSON field doesn't exist in generated client, retry without it
                     if 'Could not find field' in err_str and waveform_json_field and waveform_json_field in update_data:
-                        print(f"   ⚠️ Field '{waveform_json_field}' not in Prisma client — retrying without waveform (run 'prisma generate' to fix)")
+                        logger.warning("   ⚠️ Field '%s' not in Prisma client — retrying without waveform (run 'prisma generate' to fix)", waveform_json_field)
                         update_data.pop(waveform_json_field, None)
                         update_data.pop('duration', None)  # Also remove duration if it was added for waveform
                         updated_track = self.db.track.update(
@@ -939,29 +1125,20 @@ class PrismaDatabaseService:
                     else:
                         raise
                 
-                print(f"   ✅ Track updated: {updated_track.id}")
+                logger.info("   ✅ Track updated: %s", updated_track.id)
                 effective_track_id = existing_track.trackId
                 action = 'updated'
                 return {'trackId': effective_track_id, 'id': updated_track.id, 'action': action}
             
             else:
-                print(f"   ➕ Creating new track with trackId: {base_track_id}")
-                print(f"   📁 File field: {file_field}_filename = '{file_filename}'")
-                print(f"   📁 File size: {file_field}_filesize = {file_filesize}")
+                logger.info("   📁 File field: %s_filename = '%s'", file_field, file_filename)
+                logger.info("   📁 File size: %s_filesize = %s", file_field, file_filesize)
                 
                 # Build create data
                 create_data = {
                     'trackId': base_track_id,
-                    'title': base_title,
+                    **metadata_fields,
                     'editTitle': sanitized_data.get('Artiste original', ''),
-                    'originalArtist': sanitized_data.get('Artiste original', ''),
-                    'album': album_name,
-                    'format': format_type,
-                    'bpm': sanitized_data.get('BPM', 0) or 0,
-                    'label': sanitized_data.get('Label'),
-                    'SousLabel': sanitized_data.get('Sous-label', ''),
-                    'ISRC': sanitized_data.get('ISRC', ''),
-                    'releaseDate': release_date,
                     'style': PrismaJson(style) if style else PrismaJson([]),
                     'mood': PrismaJson(mood) if mood else PrismaJson([]),
                     'univers': PrismaJson(univers) if univers else PrismaJson([]),
@@ -975,22 +1152,23 @@ class PrismaDatabaseService:
                 if cover_image_data:
                     create_data.update(cover_image_data)
                 
-                # Generate waveform for audio fields (Main, Acapella, Intro, Instru, etc.)
-                # trackFile and trackWav both use 'jsonData' (no separate trackWavJson in schema)
-                waveform_json_field = 'jsonData' if file_field in ('trackFile', 'trackWav') else f'{file_field}Json' if file_field else None
-                if not skip_waveform and WAVEFORM_AVAILABLE and file_url and waveform_json_field:
+                # Waveform for audio fields (Main, Acapella, Intro, Instru, etc.);
+                # if it is still running, insert now and write it in a follow-up update
+                deferred_waveform = None
+                if waveform_future and not waveform_future.done():
+                    deferred_waveform = waveform_future
+                elif waveform_future:
                     try:
-                        print(f"   📊 Generating waveform for {file_field}...")
-                        waveform_data = generate_waveform_from_url(file_url)
+                        waveform_data = waveform_future.result()
                         if waveform_data:
                             create_data[waveform_json_field] = PrismaJson(waveform_data['waveform'])
                             if file_field in ('trackFile', 'trackWav'):
                                 create_data['duration'] = waveform_data['duration']
-                            print(f"   ✅ Waveform added to {waveform_json_field}: {len(waveform_data['waveform'])} peaks, {waveform_data['duration']:.2f}s")
+                            logger.info("   ✅ Waveform added to %s: %s peaks, %.2fs", waveform_json_field, len(waveform_data['waveform']), waveform_data['duration'])
                     except Exception as e:
-                        print(f"   ⚠️ Waveform generation failed for {file_field}: {e}")
+                        logger.warning("   ⚠️ Waveform generation failed for %s: %s", file_field, e)
                 elif skip_waveform:
-                    print(f"   ⏭️ Waveform generation skipped (fast mode)")
+                    logger.info("   ⏭️ Waveform generation skipped (fast mode)")
                 
                 # Connect artist
                 if matched_artist:
@@ -1004,27 +1182,110 @@ class PrismaDatabaseService:
                 if matched_album:
                     create_data['Album'] = {'connect': [{'id': matched_album.id}]}
                 
-                try:
-                    created_track = self.db.track.create(data=create_data)
-                except Exception as prisma_err:
-                    err_str = str(prisma_err)
-                    # If waveform JSON field doesn't exist in generated client, retry without it
-                    if 'Could not find field' in err_str and waveform_json_field and waveform_json_field in create_data:
-                        print(f"   ⚠️ Field '{waveform_json_field}' not in Prisma client — retrying without waveform (run 'prisma generate' to fix)")
-                        create_data.pop(waveform_json_field, None)
-                        create_data.pop('duration', None)
-                        created_track = self.db.track.create(data=create_data)
-                    else:
-                        raise
+                # trackId has no unique constraint, so a plain transaction (READ COMMITTED)
+                # wouldn't stop two workers picking the same id: serialize the check and
+                # insert per base trackId with a transaction-scoped advisory lock
+                # (waveform/S3 work is done above, so the lock is held briefly)
+                with self.db.tx() as tx:
+                    tx.execute_raw('SELECT pg_advisory_xact_lock(hashtext($1))', base_track_id)
+                    base_track_id = self._unique_track_id(tx, base_track_id, artist_name)
+                    create_data['trackId'] = base_track_id
+                    logger.info("   ➕ Creating new track with trackId: %s", base_track_id)
+                    try:
+                        created_track = tx.track.create(data=create_data)
+                    except Exception as prisma_err:
+                        err_str = str(prisma_err)
+                        # If waveform JSON field doesn't exist in generated client, retry without it
+                        if 'Could not find field' in err_str and waveform_json_field and waveform_json_field in create_data:
+                            logger.warning("   ⚠️ Field '%s' not in Prisma client — retrying without waveform (run 'prisma generate' to fix)", waveform_json_field)
+                            create_data.pop(waveform_json_field, None)
+                            create_data.pop('duration', None)
+                            created_track = tx.track.create(data=create_data)
+                        else:
+                            raise
                 
-                print(f"   ✅ Track created: {created_track.id}")
+                logger.info("   ✅ Track created: %s", created_track.id)
+                if deferred_waveform:
+                    self._patch_waveform_when_ready(
+                        created_track.id, deferred_waveform, waveform_json_field,
+                        with_duration=file_field in ('trackFile', 'trackWav')
+                    )
                 return {'trackId': base_track_id, 'id': created_track.id, 'action': 'created'}
         
         except Exception as e:
-            print(f"❌ Prisma error: {e}")
+            logger.error("❌ Prisma error: %s", e)
             traceback.print_exc()
             return {'error': str(e)}
     
+    def _patch_waveform_when_ready(self, track_id: str, waveform_future: Future,
+                                   json_field: str, with_duration: bool):
+        """Write a waveform to an already-created track once it has been generated."""
+        patched = Future()
+        key = (track_id, json_field)
+        with _pending_waveform_patches_lock:
+            _pending_waveform_patches[key] = patched
+        
+        def write_waveform(fut):
+            try:
+                waveform_data = None if fut.cancelled() else fut.result()
+                if waveform_data:
+                    data = {json_field: PrismaJson(waveform_data['waveform'])}
+                    if with_duration:
+                        data['duration'] = waveform_data['duration']
+                    self.db.track.update(where={'id': track_id}, data=data)
+                    logger.info("   ✅ Waveform added to %s of %s: %s peaks, %.2fs", json_field, track_id,
+                                len(waveform_data['waveform']), waveform_data['duration'])
+            except Exception as e:
+                logger.warning("   ⚠️ Waveform update failed for %s (%s): %s", track_id, json_field, e)
+            finally:
+                with _pending_waveform_patches_lock:
+                    if _pending_waveform_patches.get(key) is patched:
+                        del _pending_waveform_patches[key]
+                patched.set_result(None)
+        
+        # Runs on the waveform thread when generation finishes
+        waveform_future.add_done_callback(write_waveform)
+    
+    def _batch_group_key(self, track_data: Dict[str, Any], idx: int):
+        """Tracks with the same key may merge into one Track row (variants of a song).
+        
+        Merging needs a matching ISRC (see create_or_update_track), so tracks
+        without one never merge and each gets a group of its own.
+        """
+        isrc = self.sanitize_string(track_data.get('ISRC') or '').strip()
+        if isrc:
+            return ('isrc', isrc.lower())
+        return ('single', idx)
+    
+    def create_or_update_tracks_batch(self, track_list: List[Dict[str, Any]],
+                                      skip_waveform: bool = False,
+                                      concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Run create_or_update_track for several tracks, `concurrency` (default
+        S3_CONCURRENCY) at a time.
+        
+        Variants of the same song (same ISRC) run in order on one worker, so a
+        later variant sees the row the first one created instead of racing it
+        into a duplicate. Results are returned in the same order as track_list.
+        """
+        if not track_list:
+            return []
+        
+        groups: Dict[Any, List[int]] = {}
+        for idx, track_data in enumerate(track_list):
+            groups.setdefault(self._batch_group_key(track_data, idx), []).append(idx)
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * len(track_list)
+        
+        def run_group(indices):
+            for idx in indices:
+                results[idx] = self.create_or_update_track(track_list[idx], skip_waveform=skip_waveform)
+        
+        max_workers = max(1, min(concurrency or S3_CONCURRENCY, len(groups)))
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for future in [pool.submit(run_group, indices) for indices in groups.values()]:
+                future.result()
+        return results
+    
     def check_connection(self) -> bool:
         """Test database connectivity."""
         try:
@@ -1034,19 +1295,22 @@ class PrismaDatabaseService:
             self.db.track.count()
             return True
         except Exception as e:
-            print(f"❌ Connection check failed: {e}")
+            logger.error("❌ Connection check failed: %s", e)
             return False
 
 
 # Global instance
 _db_service: Optional[PrismaDatabaseService] = None
+_db_service_lock = threading.Lock()
 
 
 def get_database_service() -> PrismaDatabaseService:
     """Get the singleton database service instance."""
     global _db_service
     if _db_service is None:
-        _db_service = PrismaDatabaseService()
+        with _db_service_lock:
+            if _db_service is None:
+                _db_service = PrismaDatabaseService()
     return _db_service
 
 
@@ -1061,6 +1325,28 @@ def save_track_to_database(track_data: Dict[str, Any], skip_waveform: bool = Fal
     return db.create_or_update_track(track_data, skip_waveform=skip_waveform)
 
 
+def save_tracks_to_database(track_list: List[Dict[str, Any]], skip_waveform: bool = False,
+                            concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Save several tracks concurrently (see create_or_update_tracks_batch)."""
+    db = get_database_service()
+    return db.create_or_update_tracks_batch(track_list, skip_waveform=skip_waveform,
+                                            concurrency=concurrency)
+
+
+def wait_waveforms(timeout: Optional[float] = None) -> bool:
+    """Block until deferred waveform updates are written (also runs at process exit).
+    
+    Returns False if some were still pending after `timeout` seconds.
+    """
+    with _pending_waveform_patches_lock:
+        pending = list(_pending_waveform_patches.values())
+    return not wait_futures(pending, timeout=timeout).not_done
+
+
+# Upload routes never call wait_waveforms themselves: let a worker/process exit finish the patches
+atexit.register(wait_waveforms, WAVEFORM_DRAIN_TIMEOUT_SECONDS)
+
+
 def check_database_connection() -> bool:
     """Check if database is accessible."""
     db = get_database_service()
@@ -5,6 +5,7 @@ Fixes: ImportError: TorchCodec is required for load_with_torchcodec
 This wrapper sets the torchaudio backend to 'soundfile' before running Demucs,
 which avoids the torchcodec dependency in newer torchaudio versions (2.5+).
 """
+import os
 import sys
 
 # Fix torchaudio backend BEFORE importing demucs
@@ -40,4 +41,18 @@ except ImportError:
 
 # Now run demucs normally
 from demucs.separate import main
+
+# Mixed precision requested by the app (only set once it validated the dtype in-process)
+_autocast_dtype = os.environ.get('DEMUCS_RUNNER_AUTOCAST', '').strip().lower()
+if _autocast_dtype in ('bf16', 'fp16') and 'cuda' in sys.argv:
+    import torch
+    dtype = torch.bfloat16 if _autocast_dtype == 'bf16' else torch.float16
+    try:
+        with torch.autocast('cuda', dtype=dtype):
+            main()
+        sys.exit(0)
+    except RuntimeError as e:
+        # Some op without a half-precision kernel: redo the whole run in FP32
+        print(f"Autocast {_autocast_dtype} failed ({e}) - retrying in FP32", flush=True)
+
 sys.exit(main())
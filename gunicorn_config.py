@@ -24,6 +24,9 @@ timeout = 1800  # 30 minutes for very large batches (1000+ tracks)
 graceful_timeout = 120
 keepalive = 30
 
+# Serve send_file responses (stems, zips) with sendfile(2) instead of read/write loops
+sendfile = True
+
 # Request limits - DISABLED for single-worker GPU setup
 # With only 1 worker, max_requests kills ALL background threads (bulk import, 
 # GPU workers, etc.) when recycling. Memory management is handled by the 
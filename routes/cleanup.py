@@ -5,7 +5,6 @@ Handles batch cleanup, oldest track deletion, batch counter reset,
 scheduled deletions, and full file cleanup.
 """
 import os
-import shutil
 import time
 
 from flask import Blueprint, request, jsonify
@@ -36,10 +35,13 @@ from config import (
 from services.queue_service import (
     log_message,
     job_status,
+    reset_job_status,
+    console,
 )
 from services.cleanup_service import (
     get_disk_usage_percent,
     delete_oldest_tracks,
+    move_to_trash,
 )
 from utils.tracking import get_pending_tracks_count
 
@@ -133,43 +135,31 @@ def cleanup_files():
     Also clears all in-memory state to start fresh.
     """
     try:
-        # Clear directories
+        # Move every top-level entry into the trash (one rename each) and let the
+        # janitor thread do the actual deletes after the request has returned
+        targets = []
         for folder in [UPLOAD_FOLDER, OUTPUT_FOLDER, PROCESSED_FOLDER]:
-            for filename in os.listdir(folder):
-                file_path = os.path.join(folder, filename)
-                try:
-                    if os.path.isfile(file_path) or os.path.islink(file_path):
-                        os.unlink(file_path)
-                    elif os.path.isdir(file_path):
-                        shutil.rmtree(file_path)
-                except Exception as e:
-                    print(f'Failed to delete {file_path}. Reason: {e}')
+            with os.scandir(folder) as entries:
+                targets.extend(entry.path for entry in entries)
         
         # Also clear covers folder (extracted covers)
         covers_folder = os.path.join(BASE_DIR, 'static', 'covers')
-        for filename in os.listdir(covers_folder):
-            if filename.startswith('cover_'):  # Only delete extracted covers, not the main one
-                file_path = os.path.join(covers_folder, filename)
-                try:
-                    os.unlink(file_path)
-                except:
-                    pass
+        with os.scandir(covers_folder) as entries:
+            for entry in entries:
+                if entry.name.startswith('cover_'):  # Only delete extracted covers, not the main one
+                    targets.append(entry.path)
+        
+        for path in targets:
+            try:
+                move_to_trash(path)
+            except Exception as e:
+                console(f'Failed to delete {path}. Reason: {e}')
 
-        # Reset Job Status COMPLETELY
-        job_status['state'] = 'idle'
-        job_status['progress'] = 0
-        job_status['total_files'] = 0
-        job_status['current_file_idx'] = 0
-        job_status['current_filename'] = ''
-        job_status['current_step'] = ''
-        job_status['results'] = []  # IMPORTANT: Clear results
-        job_status['error'] = None
-        job_status['logs'] = []
-        job_status['queue_size'] = 0
+        # Reset Job Status COMPLETELY (including results)
+        reset_job_status(job_status, queue_size=0)
         
         # Clear Queue (drain it)
-        with track_queue.mutex:
-            track_queue.queue.clear()
+        track_queue.clear()
         
         # Clear queue tracker
         with queue_items_lock:
@@ -183,7 +173,7 @@ def cleanup_files():
         with scheduled_deletions_lock:
             scheduled_deletions.clear()
             
-        print("🧹 FULL RESET: All files, queues, and pending downloads cleared")
+        console("🧹 FULL RESET: All files, queues, and pending downloads cleared")
         return jsonify({'message': 'Cleanup successful', 'results_cleared': True})
         
     except Exception as e:
@@ -4,21 +4,20 @@ Download routes blueprint for IDByRivoli.
 Handles file downloads, ZIP downloads, download confirmation, and file listing.
 """
 import os
+import json
 import io
 import time
 import shutil
+import tarfile
 import zipfile
-import urllib.parse
-from io import BytesIO
 
-from flask import Blueprint, request, jsonify, send_file, abort
+from flask import Blueprint, request, jsonify, send_file, send_from_directory, abort, Response, stream_with_context
 
 import config
 from config import (
     PROCESSED_FOLDER,
     OUTPUT_FOLDER,
     UPLOAD_FOLDER,
-    API_KEY,
     DELETION_DELAY_MINUTES,
     MAX_PENDING_TRACKS,
     PENDING_WARNING_THRESHOLD,
@@ -35,6 +34,7 @@ from services.queue_service import (
     log_message,
     job_status,
     log_file_download,
+    console,
 )
 from utils.tracking import (
     mark_file_downloaded,
@@ -47,10 +47,41 @@ from utils.tracking import (
     get_pending_tracks_list,
     check_pending_tracks_warning,
 )
-from utils.file_utils import get_already_processed_tracks
+from utils.auth import is_authenticated_request
+from utils.file_utils import (
+    get_already_processed_tracks,
+    find_processed_dir,
+    get_processed_dir_index,
+    is_being_deleted,
+    name_key,
+    quick_quote,
+    quick_unquote,
+)
 
 download_bp = Blueprint('download', __name__)
 
+_MIME = {'.mp3': 'audio/mpeg', '.wav': 'audio/wav', '.flac': 'audio/flac'}
+
+
+def _open_file_response(f, download_name, mimetype):
+    """
+    send_file for an already-open file, with the validators send_file only adds for
+    paths: ETag/Last-Modified from fstat, so retries get a 304 (or a Range slice)
+    instead of the whole file again.
+    """
+    st = os.fstat(f.fileno())
+    response = send_file(
+        f,
+        as_attachment=True,
+        download_name=download_name,
+        mimetype=mimetype,
+        etag=f"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}",
+        last_modified=st.st_mtime,
+        conditional=False,
+    )
+    response.content_length = st.st_size
+    return response.make_conditional(request, accept_ranges=True, complete_length=st.st_size)
+
 
 @download_bp.route('/download_all_zip')
 def download_all_zip():
@@ -61,7 +92,6 @@ def download_all_zip():
     # Refresh results from disk if needed
     if not job_status['results']:
         # ... (logic to populate from disk, similar to status route)
-        processed_dirs = [d for d in os.listdir(PROCESSED_FOLDER) if os.path.isdir(os.path.join(PROCESSED_FOLDER, d))]
         # We need to rebuild job_status['results'] or just iterate dirs directly
         pass 
 
@@ -72,6 +102,7 @@ def download_all_zip():
     has_files = False
     with zipfile.ZipFile(memory_file, 'w', zipfile.ZIP_DEFLATED) as zf:
         for root, dirs, files in os.walk(PROCESSED_FOLDER):
+             dirs[:] = [d for d in dirs if not is_being_deleted(d)]
              for file in files:
                 if file.lower().endswith(('.mp3', '.wav')): 
                     file_path = os.path.join(root, file)
@@ -103,33 +134,33 @@ def download_file():
     """
     relative_path = request.args.get('path')
     
-    print(f"📥 DOWNLOAD REQUEST")
-    print(f"   Raw path param: {relative_path}")
+    console(f"📥 DOWNLOAD REQUEST")
+    console(f"   Raw path param: {relative_path}")
     
     if not relative_path:
-        print("   ❌ No path provided")
+        console("   ❌ No path provided")
         abort(400)
     
     # Security: prevent directory traversal
     if '..' in relative_path:
-        print("   ❌ Directory traversal attempt")
+        console("   ❌ Directory traversal attempt")
         abort(403)
     
     # URL decode the path (in case it's double-encoded)
-    decoded_path = urllib.parse.unquote(relative_path)
-    print(f"   Decoded path: {decoded_path}")
+    decoded_path = quick_unquote(relative_path)
+    console(f"   Decoded path: {decoded_path}")
         
     # Construct full path
     filepath = os.path.join(PROCESSED_FOLDER, decoded_path)
     
-    print(f"   Looking for: {filepath}")
-    print(f"   File exists: {os.path.exists(filepath)}")
+    console(f"   Looking for: {filepath}")
     
     # Extract track name from path (first directory component)
     track_name = decoded_path.split('/')[0] if '/' in decoded_path else None
     
     # If not found, try to find a matching file (handle encoding issues)
-    if not os.path.exists(filepath):
+    found = os.path.isfile(filepath)
+    if not found:
         # Try to find file with similar name
         parts = decoded_path.split('/')
         if len(parts) >= 2:
@@ -137,55 +168,55 @@ def download_file():
             file_name = parts[1]
             
             # Look for matching subdirectory
-            for existing_dir in os.listdir(PROCESSED_FOLDER):
-                if existing_dir.lower() == subdir_name.lower() or existing_dir == subdir_name:
-                    subdir_path = os.path.join(PROCESSED_FOLDER, existing_dir)
-                    track_name = existing_dir  # Update track name to actual folder name
-                    if os.path.isdir(subdir_path):
-                        # Look for matching file
-                        for existing_file in os.listdir(subdir_path):
-                            if existing_file.lower() == file_name.lower() or existing_file == file_name:
-                                filepath = os.path.join(subdir_path, existing_file)
-                                print(f"   🔄 Found matching file: {filepath}")
-                                break
-                    break
-    
-    if not os.path.exists(filepath):
-        # Debug: list what's actually in the processed folder
-        print(f"   ❌ FILE NOT FOUND!")
-        print(f"   Contents of PROCESSED_FOLDER:")
-        for item in os.listdir(PROCESSED_FOLDER):
-            item_path = os.path.join(PROCESSED_FOLDER, item)
-            if os.path.isdir(item_path):
-                print(f"      📁 {item}/")
-                for subitem in os.listdir(item_path)[:5]:
-                    print(f"         - {subitem}")
-            else:
-                print(f"      📄 {item}")
+            existing_dir = find_processed_dir(subdir_name)
+            if existing_dir:
+                subdir_path = os.path.join(PROCESSED_FOLDER, existing_dir)
+                track_name = existing_dir  # Update track name to actual folder name
+                # Look for matching file
+                file_key = name_key(file_name)
+                try:
+                    for existing_file in os.listdir(subdir_path):
+                        if name_key(existing_file) == file_key:
+                            filepath = os.path.join(subdir_path, existing_file)
+                            found = True
+                            console(f"   🔄 Found matching file: {filepath}")
+                            break
+                except OSError:
+                    pass  # Folder removed since the index was built
+    
+    if not found:
+        console(f"   ❌ FILE NOT FOUND! ({len(get_processed_dir_index())} track folders in PROCESSED_FOLDER)")
         abort(404)
     
     # Use send_file with absolute path (most reliable)
-    print(f"   ✅ Sending file: {filepath}")
+    console(f"   ✅ Sending file: {filepath}")
     
     # Get clean filename for download
     download_filename = os.path.basename(filepath)
     
-    # Read file into memory first so we can delete it after
-    with open(filepath, 'rb') as f:
-        file_data = f.read()
-    
-    # Create response from memory
-    response = send_file(
-        BytesIO(file_data),
-        as_attachment=True,
-        download_name=download_filename,
-        mimetype='audio/mpeg' if filepath.endswith('.mp3') else 'audio/wav'
+    # Open before anything else: a deletion racing with this request then only
+    # unlinks the name, and the open descriptor keeps the data readable until the
+    # response has been sent (streamed with sendfile where the server supports it)
+    try:
+        f = open(filepath, 'rb')
+    except FileNotFoundError:
+        console(f"   ❌ Deleted before it could be sent: {filepath}")
+        abort(404)
+    response = _open_file_response(
+        f,
+        download_filename,
+        _MIME.get(os.path.splitext(filepath)[1].lower(), 'application/octet-stream')
     )
     
     # Add CORS headers for cross-origin downloads
     response.headers['Access-Control-Allow-Origin'] = '*'
     response.headers['Access-Control-Expose-Headers'] = 'Content-Disposition'
     
+    # A 304 revalidation or a 206 Range slice is not a completed download:
+    # don't count it, and don't delete a file the client may still be resuming
+    if response.status_code != 200:
+        return response
+    
     # Log the download
     if track_name:
         log_file_download(track_name, filepath)
@@ -201,9 +232,9 @@ def download_file():
     # Delete track ONLY after ALL versions (MP3 + WAV) have been downloaded
     # ==========================================================================
     if SEQUENTIAL_MODE and track_name:
-        print(f"   📊 SEQUENTIAL MODE: Tracking download")
-        print(f"      Track name: '{track_name}'")
-        print(f"      File downloaded: '{download_filename}'")
+        console(f"   📊 SEQUENTIAL MODE: Tracking download")
+        console(f"      Track name: '{track_name}'")
+        console(f"      File downloaded: '{download_filename}'")
         all_done = mark_file_downloaded(track_name, download_filename)
         
         # Add download status to response headers for frontend tracking
@@ -214,35 +245,35 @@ def download_file():
         
         if all_done:
             # ALL files for this track have been downloaded - cleanup now!
-            print(f"   🎉 ALL FILES DOWNLOADED for '{track_name}' - cleaning up...")
+            console(f"   🎉 ALL FILES DOWNLOADED for '{track_name}' - cleaning up...")
             try:
                 # Delete the entire track folder
                 track_folder = os.path.join(PROCESSED_FOLDER, track_name)
                 if os.path.exists(track_folder):
                     shutil.rmtree(track_folder)
-                    print(f"   🗑️ Deleted track folder: {track_folder}")
+                    console(f"   🗑️ Deleted track folder: {track_folder}")
                 
                 # Clean up htdemucs intermediate files
                 htdemucs_folder = os.path.join(OUTPUT_FOLDER, 'htdemucs', track_name)
                 if os.path.exists(htdemucs_folder):
                     shutil.rmtree(htdemucs_folder)
-                    print(f"   🗑️ Deleted htdemucs folder: {htdemucs_folder}")
+                    console(f"   🗑️ Deleted htdemucs folder: {htdemucs_folder}")
                 
                 # Remove from pending downloads tracker
                 cleanup_track_after_downloads(track_name)
                 
                 log_message(f"✅ Track fully downloaded and cleaned: {track_name}")
             except Exception as e:
-                print(f"   ⚠️ Cleanup error: {e}")
+                console(f"   ⚠️ Cleanup error: {e}")
         else:
-            print(f"   📥 {len(remaining)} files still pending for '{track_name}'")
+            console(f"   📥 {len(remaining)} files still pending for '{track_name}'")
     
     # Legacy DELETE_AFTER_DOWNLOAD mode (individual file deletion)
     elif DELETE_AFTER_DOWNLOAD and not SEQUENTIAL_MODE:
         try:
             # Delete the specific file that was downloaded
             os.unlink(filepath)
-            print(f"   🗑️ Deleted after download: {filepath}")
+            console(f"   🗑️ Deleted after download: {filepath}")
             
             # Check if the track folder is now empty, if so delete it too
             if track_name:
@@ -251,18 +282,18 @@ def download_file():
                     remaining_files = os.listdir(track_folder)
                     if len(remaining_files) == 0:
                         shutil.rmtree(track_folder)
-                        print(f"   🗑️ Deleted empty folder: {track_folder}")
+                        console(f"   🗑️ Deleted empty folder: {track_folder}")
                         
                         # Also clean up htdemucs intermediate files
                         htdemucs_folder = os.path.join(OUTPUT_FOLDER, 'htdemucs', track_name)
                         if os.path.exists(htdemucs_folder):
                             shutil.rmtree(htdemucs_folder)
-                            print(f"   🗑️ Deleted htdemucs folder: {htdemucs_folder}")
+                            console(f"   🗑️ Deleted htdemucs folder: {htdemucs_folder}")
                         
                         # Remove from pending downloads
                         confirm_track_download(track_name)
         except Exception as e:
-            print(f"   ⚠️ Could not delete after download: {e}")
+            console(f"   ⚠️ Could not delete after download: {e}")
     
     return response
 
@@ -289,12 +320,9 @@ def confirm_download():
     track_name = None
     
     # Debug: log the request details
-    print(f"")
-    print(f"🔔 CONFIRM_DOWNLOAD REQUEST RECEIVED:")
-    print(f"   Method: {request.method}")
-    print(f"   Content-Type: {request.content_type}")
-    print(f"   Query params: {dict(request.args)}")
-    print(f"   Is JSON: {request.is_json}")
+    console("\n🔔 CONFIRM_DOWNLOAD REQUEST RECEIVED:\n"
+            "   Method: %s\n   Content-Type: %s\n   Query params: %r\n   Is JSON: %s",
+            request.method, request.content_type, request.args, request.is_json)
     
     # Try to get track_name from multiple sources (most flexible)
     
@@ -307,28 +335,29 @@ def confirm_download():
             data = request.get_json(force=False, silent=True)
             if data:
                 track_name = data.get('track_name') or data.get('trackName')
-                print(f"   JSON body: {data}")
+                console("   JSON body: %s", data)
         except Exception as e:
-            print(f"   JSON parse error: {e}")
+            console("   JSON parse error: %s", e)
     
     # 3. Check form data
     if not track_name and request.form:
         track_name = request.form.get('track_name') or request.form.get('trackName')
-        print(f"   Form data: {dict(request.form)}")
+        console("   Form data: %r", request.form)
     
-    # 4. Try to parse raw body as JSON (for cases where Content-Type is wrong)
-    if not track_name and request.data:
+    # 4. Try to parse raw body as JSON (for cases where Content-Type is wrong;
+    #    a JSON Content-Type body was already parsed in step 2)
+    if not track_name and not request.is_json and request.data:
         try:
             data = json_module.loads(request.data.decode('utf-8'))
             track_name = data.get('track_name') or data.get('trackName')
-            print(f"   Parsed raw body as JSON: {data}")
+            console("   Parsed raw body as JSON: %s", data)
         except:
-            print(f"   Raw body (not JSON): {request.data[:200] if request.data else 'empty'}")
+            console("   Raw body (not JSON): %s", request.data[:200] or 'empty')
     
-    print(f"   Extracted track_name: '{track_name}'")
+    console("   Extracted track_name: '%s'", track_name)
     
     if not track_name:
-        print(f"   ❌ ERROR: track_name is missing!")
+        console("   ❌ ERROR: track_name is missing!")
         return jsonify({
             'error': 'track_name is required',
             'hint': 'Send as JSON body {"track_name": "..."} or query param ?track_name=...',
@@ -340,20 +369,19 @@ def confirm_download():
         }), 400
     
     # URL decode track name (in case it's encoded)
-    track_name = urllib.parse.unquote(track_name)
+    track_name = quick_unquote(track_name)
     
-    print(f"")
-    print(f"🔔 ════════════════════════════════════════════════")
-    print(f"🔔 CONFIRM DOWNLOAD REQUEST: '{track_name}'")
-    print(f"🔔 From: {request.remote_addr}")
-    print(f"🔔 ════════════════════════════════════════════════")
+    console("\n🔔 ════════════════════════════════════════════════\n"
+            "🔔 CONFIRM DOWNLOAD REQUEST: '%s'\n🔔 From: %s\n"
+            "🔔 ════════════════════════════════════════════════",
+            track_name, request.remote_addr)
     
     # Check both tracking systems
     in_pending_downloads = track_name in pending_downloads
     in_sequential_tracking = track_name in track_download_status
     
-    print(f"   In pending_downloads: {in_pending_downloads}")
-    print(f"   In track_download_status (sequential): {in_sequential_tracking}")
+    console("   In pending_downloads: %s\n   In track_download_status (sequential): %s",
+            in_pending_downloads, in_sequential_tracking)
     
     # SEQUENTIAL MODE: If track is in sequential tracking, trigger cleanup
     if SEQUENTIAL_MODE and in_sequential_tracking:
@@ -388,13 +416,15 @@ def confirm_download():
     # Track not found in either system - try to find similar names
     similar_tracks = []
     with track_download_status_lock:
-        for name in track_download_status.keys():
-            if track_name.lower() in name.lower() or name.lower() in track_name.lower():
-                similar_tracks.append(f"sequential: {name}")
+        sequential_names = list(track_download_status)
     with pending_downloads_lock:
-        for name in pending_downloads.keys():
-            if track_name.lower() in name.lower() or name.lower() in track_name.lower():
-                similar_tracks.append(f"pending: {name}")
+        pending_names = list(pending_downloads)
+    wanted = track_name.lower()
+    for prefix, names in (('sequential', sequential_names), ('pending', pending_names)):
+        for name in names:
+            name_lower = name.lower()
+            if wanted in name_lower or name_lower in wanted:
+                similar_tracks.append(f"{prefix}: {name}")
     
     log_message(f"⚠️ Confirmation échouée: {track_name} (non trouvé)")
     return jsonify({
@@ -434,7 +464,7 @@ def get_track_download_status_endpoint():
             })
     
     # URL decode track name
-    track_name = urllib.parse.unquote(track_name)
+    track_name = quick_unquote(track_name)
     status = get_track_download_status(track_name)
     
     if not status:
@@ -467,8 +497,11 @@ def list_already_processed():
     for track_name in processed_tracks:
         track_folder = os.path.join(PROCESSED_FOLDER, track_name)
         files = []
-        if os.path.exists(track_folder):
-            files = [f for f in os.listdir(track_folder) if f.endswith(('.mp3', '.wav'))]
+        try:
+            with os.scandir(track_folder) as entries:
+                files = [e.name for e in entries if e.name.endswith(('.mp3', '.wav'))]
+        except OSError:
+            pass
         
         tracks_info.append({
             'track_name': track_name,
@@ -489,13 +522,7 @@ def list_pending_downloads():
     Useful for monitoring and debugging.
     """
     # Check for API key (optional - can be public for monitoring)
-    auth_header = request.headers.get('Authorization', '')
-    api_key_param = request.args.get('api_key', 'idbyrivoli-secret-key-2024')
-    
-    is_authenticated = (
-        auth_header == f'Bearer {API_KEY}' or 
-        api_key_param == API_KEY
-    )
+    is_authenticated = is_authenticated_request()
     
     pending = get_pending_tracks_list()
     warning = check_pending_tracks_warning()
@@ -513,24 +540,93 @@ def list_pending_downloads():
 @download_bp.route('/processed/<path:filepath>')
 def serve_processed_file(filepath):
     """Alternative route: serve files directly from processed folder."""
-    full_path = os.path.join(PROCESSED_FOLDER, filepath)
-    print(f"📥 SERVE PROCESSED: {filepath}")
-    print(f"   Full path: {full_path}")
-    print(f"   Exists: {os.path.exists(full_path)}")
-    
-    if not os.path.exists(full_path):
+    console(f"📥 SERVE PROCESSED: {filepath}")
+    
+    # Safe-joins the path (404 on traversal or missing file) and streams it through
+    # wsgi.file_wrapper, which gunicorn turns into sendfile(2). Conditional by default:
+    # ETag/Last-Modified are set and a matching If-None-Match gets a bodiless 304.
+    try:
+        return send_from_directory(PROCESSED_FOLDER, filepath, as_attachment=True)
+    except FileNotFoundError:
+        # Deleted between send_from_directory's existence check and its open()
+        abort(404)
+
+
+_ARCHIVE_CHUNK = 1024 * 1024
+
+
+@download_bp.route('/processed_archive/<path:track_name>')
+def processed_archive(track_name):
+    """
+    Stream all files of one processed track as an uncompressed tar, so a client
+    fetches a whole track in one request instead of one per version.
+    Does not count as a download: deletion still goes through /confirm_download.
+    """
+    folder = find_processed_dir(quick_unquote(track_name))
+    if not folder:
+        abort(404)
+    track_dir = os.path.join(PROCESSED_FOLDER, folder)
+    try:
+        with os.scandir(track_dir) as entries:
+            names = sorted(e.name for e in entries if e.is_file())
+    except OSError:
         abort(404)
     
-    return send_file(full_path, as_attachment=True)
+    def generate():
+        for name in names:
+            try:
+                f = open(os.path.join(track_dir, name), 'rb')
+            except FileNotFoundError:
+                continue  # Deleted since the listing
+            with f:
+                st = os.fstat(f.fileno())
+                info = tarfile.TarInfo(f"{folder}/{name}")
+                info.size = st.st_size
+                info.mtime = int(st.st_mtime)
+                yield info.tobuf(format=tarfile.PAX_FORMAT, encoding='utf-8')
+                
+                remaining = st.st_size
+                while remaining > 0:
+                    chunk = f.read(min(_ARCHIVE_CHUNK, remaining))
+                    if not chunk:
+                        # Truncated while streaming: zero-fill so the archive stays well-formed
+                        yield b'\0' * remaining
+                        break
+                    remaining -= len(chunk)
+                    yield chunk
+                yield b'\0' * (-st.st_size % tarfile.BLOCKSIZE)
+        # End-of-archive marker
+        yield b'\0' * (2 * tarfile.BLOCKSIZE)
+    
+    response = Response(stream_with_context(generate()), mimetype='application/x-tar')
+    response.headers['Content-Disposition'] = f"attachment; filename*=UTF-8''{quick_quote(folder + '.tar')}"
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Expose-Headers'] = 'Content-Disposition'
+    return response
 
 
 # Debug route to list all processed files
 @download_bp.route('/list_files')
 def list_files():
     """Debug route to see what files are available."""
-    result = {}
-    for subdir in os.listdir(PROCESSED_FOLDER):
-        subdir_path = os.path.join(PROCESSED_FOLDER, subdir)
-        if os.path.isdir(subdir_path):
-            result[subdir] = os.listdir(subdir_path)
-    return jsonify(result)
+    def generate():
+        # Streamed one folder at a time so large trees never sit in memory as one JSON blob.
+        # The 200 is already sent, so filesystem errors must still end in valid JSON.
+        yield '{'
+        sep = ''
+        try:
+            with os.scandir(PROCESSED_FOLDER) as entries:
+                for entry in entries:
+                    try:
+                        if not entry.is_dir(follow_symlinks=False) or is_being_deleted(entry.name):
+                            continue
+                        names = os.listdir(entry.path)
+                    except OSError:
+                        continue  # Removed while we were listing
+                    yield f"{sep}{json.dumps(entry.name)}:{json.dumps(names)}"
+                    sep = ','
+        except OSError as e:
+            console(f"⚠️ list_files stopped early: {e}")
+        yield '}'
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
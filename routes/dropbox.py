@@ -42,7 +42,7 @@ from services.queue_service import (
 )
 from services.memory_service import get_memory_percent, force_garbage_collect
 from services.metadata_service import process_track_title_for_import, delete_from_dropbox_if_skipped, detect_acap_type_from_filename
-from utils.file_utils import is_track_already_processed
+from utils.file_utils import is_track_already_processed, ensure_dir
 
 dropbox_bp = Blueprint('dropbox', __name__)
 
@@ -1483,8 +1483,7 @@ def dropbox_download_and_process_thread(import_id, files_to_import, session_id,
     print(f"   Workers: {config.NUM_WORKERS}")
     
     # Create session-specific upload folder
-    session_upload_folder = os.path.join(UPLOAD_FOLDER, session_id)
-    os.makedirs(session_upload_folder, exist_ok=True)
+    session_upload_folder = ensure_dir(os.path.join(UPLOAD_FOLDER, session_id))
     
     # Pipeline settings - download what workers can handle + small buffer
     BUFFER_SIZE = config.NUM_WORKERS * 2  # Keep 2x workers worth of tracks ready
@@ -3,7 +3,9 @@ Main routes blueprint for IDByRivoli.
 
 Handles the index page and public URL detection.
 """
-from flask import Blueprint, render_template, request
+from urllib.parse import urlparse
+
+from flask import Blueprint, Response, current_app, render_template, request
 
 import config
 
@@ -13,22 +15,19 @@ main_bp = Blueprint('main', __name__)
 @main_bp.before_app_request
 def set_public_url():
     """Captures the current public URL from the request headers to support dynamic Pod URLs (RunPod, etc.)."""
-    # Always try to get the best URL from headers on each request
-    # Priority: X-Forwarded-Host > Host header > existing value
-    forwarded_host = request.headers.get('X-Forwarded-Host')
-    original_host = request.headers.get('Host')
-    # Default to http since this server typically runs without SSL
-    scheme = request.headers.get('X-Forwarded-Proto', 'http')
+    # Once a public (non-localhost) URL is known, skip header parsing entirely
+    current_url = config.CURRENT_HOST_URL
+    if current_url and 'localhost' not in current_url:
+        return
     
-    # Debug: log all relevant headers on first request
-    if not config.CURRENT_HOST_URL or 'localhost' in config.CURRENT_HOST_URL:
-        print(f"🔍 Headers debug:")
-        print(f"   X-Forwarded-Host: {forwarded_host}")
-        print(f"   X-Forwarded-Proto: {scheme}")
-        print(f"   Host: {original_host}")
-        print(f"   X-Real-IP: {request.headers.get('X-Real-IP')}")
-        print(f"   Origin: {request.headers.get('Origin')}")
-        print(f"   Referer: {request.headers.get('Referer')}")
+    # Priority: X-Forwarded-Host > Origin > Referer > Host header
+    headers = request.headers
+    forwarded_host = headers.get('X-Forwarded-Host')
+    original_host = headers.get('Host')
+    # Default to http since this server typically runs without SSL
+    scheme = headers.get('X-Forwarded-Proto', 'http')
+    origin = headers.get('Origin')
+    referer = headers.get('Referer')
     
     new_url = None
     
@@ -36,13 +35,11 @@ def set_public_url():
     if forwarded_host and 'localhost' not in forwarded_host:
         new_url = f"{scheme}://{forwarded_host}"
     # Try Origin header (set by browser on CORS requests)
-    elif request.headers.get('Origin') and 'localhost' not in request.headers.get('Origin', ''):
-        new_url = request.headers.get('Origin')
+    elif origin and 'localhost' not in origin:
+        new_url = origin
     # Try Referer header
-    elif request.headers.get('Referer') and 'localhost' not in request.headers.get('Referer', ''):
+    elif referer and 'localhost' not in referer:
         # Extract base URL from referer
-        referer = request.headers.get('Referer')
-        from urllib.parse import urlparse
         parsed = urlparse(referer)
         if parsed.netloc and 'localhost' not in parsed.netloc:
             new_url = f"{parsed.scheme}://{parsed.netloc}"
@@ -51,13 +48,30 @@ def set_public_url():
         new_url = f"{scheme}://{original_host}"
     
     # Update if we found a valid public URL (not localhost)
-    if new_url and 'localhost' not in new_url and new_url != config.CURRENT_HOST_URL:
+    if new_url and 'localhost' not in new_url and new_url != current_url:
         config.CURRENT_HOST_URL = new_url
+        print(f"🔍 Headers: X-Forwarded-Host={forwarded_host} X-Forwarded-Proto={scheme} "
+              f"Host={original_host} Origin={origin} Referer={referer}")
         print(f"📍 Public URL détectée: {config.CURRENT_HOST_URL}")
 
 
+# index.html only depends on the version string, fixed at startup → render it once
+_index_html = None
+
+
+def prerender_index():
+    """Render index.html to bytes (call inside an app context)."""
+    global _index_html
+    _index_html = render_template(
+        'index.html', version_info=current_app.config.get('VERSION_INFO', 'Dev Version')
+    ).encode('utf-8')
+    return _index_html
+
+
 @main_bp.route('/')
 def index():
-    from services.track_service import get_git_info
-    version_info = get_git_info()
-    return render_template('index.html', version_info=version_info)
+    # Debug mode re-renders so template edits show up on reload
+    if current_app.debug:
+        return render_template('index.html', version_info=current_app.config.get('VERSION_INFO', 'Dev Version'))
+    html = _index_html if _index_html is not None else prerender_index()
+    return Response(html, mimetype='text/html')
@@ -5,8 +5,8 @@ Handles system status, live logs, queue debug, database status, and debug routes
 """
 import os
 import subprocess
+import threading
 import time
-import urllib.parse
 
 import psutil
 from flask import Blueprint, request, jsonify
@@ -47,6 +47,8 @@ from services.queue_service import (
     remove_failed_file,
 )
 from services.memory_service import get_memory_percent
+from services.track_service import TORCH_AVAILABLE, torch
+from utils.file_utils import get_processed_dir_index, is_being_deleted, quick_quote, quick_unquote
 from utils.tracking import (
     get_pending_tracks_count,
     check_pending_tracks_warning,
@@ -241,6 +243,7 @@ def reset_stuck_items():
     session_id = get_session_id()
     reset_count = 0
     reset_files = []
+    requeue = []
     
     with queue_items_lock:
         for filename, info in queue_items.items():
@@ -253,14 +256,13 @@ def reset_stuck_items():
                 info['processing_started_at'] = None
                 reset_count += 1
                 reset_files.append(filename)
+                requeue.append((filename, info.get('session_id', session_id)))
     
     if reset_count > 0:
         log_message(f"🔄 [{session_id}] Reset {reset_count} stuck processing item(s)", session_id)
         
         # Re-queue the items so workers can pick them up again
-        for filename in reset_files:
-            with queue_items_lock:
-                file_session_id = queue_items.get(filename, {}).get('session_id', session_id)
+        for filename, file_session_id in requeue:
             track_queue.put({'filename': filename, 'session_id': file_session_id, 'is_retry': True})
     
     return jsonify({
@@ -277,21 +279,23 @@ def queue_debug():
     Debug endpoint to inspect the current state of the queue and workers.
     """
     with queue_items_lock:
-        items_by_status = {}
-        for filename, info in queue_items.items():
-            _status = info['status']
-            if _status not in items_by_status:
-                items_by_status[_status] = []
-            items_by_status[_status].append({
-                'filename': filename,
-                'worker': info.get('worker'),
-                'progress': info.get('progress'),
-                'processing_started_at': info.get('processing_started_at'),
-                'time_processing': round(time.time() - info.get('processing_started_at', time.time())) if info.get('processing_started_at') else None
-            })
+        snapshot = list(queue_items.items())
+    
+    items_by_status = {}
+    for filename, info in snapshot:
+        _status = info['status']
+        if _status not in items_by_status:
+            items_by_status[_status] = []
+        items_by_status[_status].append({
+            'filename': filename,
+            'worker': info.get('worker'),
+            'progress': info.get('progress'),
+            'processing_started_at': info.get('processing_started_at'),
+            'time_processing': round(time.time() - info.get('processing_started_at', time.time())) if info.get('processing_started_at') else None
+        })
     
     return jsonify({
-        'total_items': len(queue_items),
+        'total_items': len(snapshot),
         'queue_size': track_queue.qsize(),
         'num_workers': config.NUM_WORKERS,
         'active_workers': sum(1 for t in worker_threads if t.is_alive()),
@@ -300,6 +304,22 @@ def queue_debug():
     })
 
 
+# Values that don't change for the life of the process
+_MEM_TOTAL_GB = round(psutil.virtual_memory().total / (1024**3), 1)
+psutil.cpu_percent(interval=None)  # Prime the non-blocking CPU counter
+_gpu_static = None  # (name, total MB) from nvidia-smi, filled on first use
+
+
+def _load_gpu_static():
+    global _gpu_static
+    result = subprocess.run(
+        ['nvidia-smi', '--query-gpu=name,memory.total', '--format=csv,noheader,nounits', '-i', '0'],
+        capture_output=True, text=True, timeout=5
+    )
+    name, total_mb = [p.strip() for p in result.stdout.strip().split(',')]
+    _gpu_static = (name, float(total_mb))
+
+
 @status_bp.route('/system_stats')
 def system_stats():
     """Returns real-time system statistics for the UI."""
@@ -334,9 +354,10 @@ def system_stats():
     
     # CPU/Memory stats
     try:
-        stats['cpu']['percent'] = psutil.cpu_percent(interval=0.1)
+        # Non-blocking: utilization since the previous call (primed at import)
+        stats['cpu']['percent'] = psutil.cpu_percent(interval=None)
         mem = psutil.virtual_memory()
-        stats['memory']['total_gb'] = round(mem.total / (1024**3), 1)
+        stats['memory']['total_gb'] = _MEM_TOTAL_GB
         stats['memory']['used_percent'] = mem.percent
         stats['memory']['available_gb'] = round(mem.available / (1024**3), 1)
         
@@ -349,31 +370,31 @@ def system_stats():
     
     # GPU stats - use nvidia-smi for real utilization (subprocess GPU usage)
     try:
-        import subprocess as _sp
-        nvidia_result = _sp.run(
-            ['nvidia-smi', '--query-gpu=name,memory.total,memory.used,utilization.gpu',
-             '--format=csv,noheader,nounits'],
+        if _gpu_static is None:
+            _load_gpu_static()
+        nvidia_result = subprocess.run(
+            ['nvidia-smi', '--query-gpu=memory.used,utilization.gpu',
+             '--format=csv,noheader,nounits', '-i', '0'],
             capture_output=True, text=True, timeout=5
         )
         if nvidia_result.returncode == 0:
             parts = [p.strip() for p in nvidia_result.stdout.strip().split(',')]
-            if len(parts) >= 4:
+            if len(parts) >= 2:
+                name, total_mb = _gpu_static
+                used_mb = float(parts[0])
                 stats['gpu']['available'] = True
-                stats['gpu']['name'] = parts[0]
-                total_mb = float(parts[1])
-                used_mb = float(parts[2])
+                stats['gpu']['name'] = name
                 stats['gpu']['memory_gb'] = round(total_mb / 1024, 1)
                 stats['gpu']['memory_used_gb'] = round(used_mb / 1024, 2)
                 stats['gpu']['memory_used_percent'] = round(used_mb / total_mb * 100, 1) if total_mb > 0 else 0
-                stats['gpu']['utilization_percent'] = int(parts[3])
+                stats['gpu']['utilization_percent'] = int(parts[1])
     except Exception:
         # Fallback to PyTorch stats (only sees parent process allocations)
         try:
-            import torch
-            if torch.cuda.is_available():
-                stats['gpu']['available'] = True
-                stats['gpu']['name'] = torch.cuda.get_device_name(0)
+            if TORCH_AVAILABLE and torch.cuda.is_available():
                 props = torch.cuda.get_device_properties(0)
+                stats['gpu']['available'] = True
+                stats['gpu']['name'] = props.name
                 stats['gpu']['memory_gb'] = round(props.total_memory / (1024**3), 1)
                 
                 allocated = torch.cuda.memory_allocated(0)
@@ -455,8 +476,7 @@ def get_batch_status():
     # Count total tracks in processed folder
     total_tracks = 0
     try:
-        if os.path.exists(PROCESSED_FOLDER):
-            total_tracks = len([d for d in os.listdir(PROCESSED_FOLDER) if os.path.isdir(os.path.join(PROCESSED_FOLDER, d))])
+        total_tracks = len(get_processed_dir_index())
     except:
         pass
     
@@ -540,14 +560,84 @@ def debug_cleanup():
         'current_time': time.strftime("%Y-%m-%d %H:%M:%S"),
         'endpoints': {
             'confirm_download': f'POST /confirm_download with track_name and api_key (triggers {DELETION_DELAY_MINUTES}min deletion delay)',
-            'list_pending': 'GET /pending_downloads'
+            'list_pending': 'GET /pending_downloads',
+            'track_archive': 'GET /processed_archive/<track_name> (all files of a track as one tar)'
         }
     })
 
 
+# /debug_gpu snapshot: dashboards poll it, and each build runs nvidia-smi and
+# takes the CUDA caching-allocator lock the workers are using. A sampler thread
+# refreshes it while the route is being polled, so requests only read it.
+_DEBUG_GPU_SAMPLE_SECONDS = 2
+_DEBUG_GPU_IDLE_SECONDS = 60  # Sampler exits when nobody has polled for this long
+_debug_gpu_snapshot = None
+_debug_gpu_last_request = 0.0
+_debug_gpu_sampler = None
+_debug_gpu_lock = threading.Lock()
+_debug_gpu_cpu_times = None  # Sampler's own CPU baseline, see _debug_gpu_cpu_percent
+
+
+def _debug_gpu_cpu_percent():
+    """System CPU % since this function's previous call.
+    
+    psutil.cpu_percent(interval=None) keeps one baseline that every caller resets,
+    so /system_stats and the sampler would skew each other's readings.
+    """
+    global _debug_gpu_cpu_times
+    now = psutil.cpu_times()
+    last, _debug_gpu_cpu_times = _debug_gpu_cpu_times, now
+    if last is None:
+        return 0.0
+    
+    def busy_and_total(t):
+        # guest time is already counted in user/nice on Linux
+        total = sum(t) - getattr(t, 'guest', 0) - getattr(t, 'guest_nice', 0)
+        return total - t.idle - getattr(t, 'iowait', 0), total
+    
+    busy_now, total_now = busy_and_total(now)
+    busy_last, total_last = busy_and_total(last)
+    elapsed = total_now - total_last
+    if elapsed <= 0:
+        return 0.0
+    return round(max(0.0, min(100.0, 100.0 * (busy_now - busy_last) / elapsed)), 1)
+
+
+def _debug_gpu_sampler_loop():
+    global _debug_gpu_snapshot, _debug_gpu_sampler, _debug_gpu_cpu_times
+    try:
+        while True:
+            time.sleep(_DEBUG_GPU_SAMPLE_SECONDS)
+            with _debug_gpu_lock:
+                if time.monotonic() - _debug_gpu_last_request > _DEBUG_GPU_IDLE_SECONDS:
+                    return
+            _debug_gpu_snapshot = _collect_gpu_debug_info()
+    finally:
+        # Drop the stale snapshot; the next request collects one and restarts the sampler
+        with _debug_gpu_lock:
+            _debug_gpu_snapshot = None
+            _debug_gpu_sampler = None
+            _debug_gpu_cpu_times = None
+
+
 @status_bp.route('/debug_gpu')
 def debug_gpu():
     """Debug route to check GPU/CUDA status."""
+    global _debug_gpu_snapshot, _debug_gpu_last_request, _debug_gpu_sampler
+    _debug_gpu_last_request = time.monotonic()
+    snapshot = _debug_gpu_snapshot
+    if snapshot is None:
+        with _debug_gpu_lock:
+            if _debug_gpu_snapshot is None:
+                _debug_gpu_snapshot = _collect_gpu_debug_info()
+            snapshot = _debug_gpu_snapshot
+            if _debug_gpu_sampler is None:
+                _debug_gpu_sampler = threading.Thread(target=_debug_gpu_sampler_loop, daemon=True)
+                _debug_gpu_sampler.start()
+    return jsonify(snapshot)
+
+
+def _collect_gpu_debug_info():
     info = {
         'demucs_device': config.DEMUCS_DEVICE,
         'force_device_env': config.FORCE_DEVICE or 'auto',
@@ -559,9 +649,9 @@ def debug_gpu():
         'gpu_name': None,
         'gpu_memory_gb': None,
         'gpu_count': 0,
-        'ram_gb': round(psutil.virtual_memory().total / (1024**3), 1),
+        'ram_gb': _MEM_TOTAL_GB,
         'ram_used_percent': psutil.virtual_memory().percent,
-        'cpu_percent': psutil.cpu_percent(interval=0.5),
+        'cpu_percent': _debug_gpu_cpu_percent(),
         'nvidia_smi': None,
         'fix_suggestions': [],
         'error': None
@@ -575,7 +665,8 @@ def debug_gpu():
         info['nvidia_smi'] = f"NOT FOUND: {e}"
     
     try:
-        import torch
+        if not TORCH_AVAILABLE:
+            raise ImportError('torch')
         info['pytorch_version'] = torch.__version__
         info['cuda_available'] = torch.cuda.is_available()
         info['cuda_compiled_version'] = torch.version.cuda or 'NO CUDA IN THIS BUILD'
@@ -610,33 +701,40 @@ def debug_gpu():
     if config.DEMUCS_DEVICE == 'cpu':
         info['fix_suggestions'].append('Workaround: Add DEMUCS_FORCE_DEVICE=cuda to your .env file and restart')
     
-    return jsonify(info)
+    return info
 
 
 @status_bp.route('/test_download')
 def test_download():
     """Test route that lists all files with their download URLs and tests them."""
+    # Built before responding (the entries are small), so a folder removed
+    # mid-walk can't cut off a response that already went out as a 200
     results = []
-    
-    for subdir in os.listdir(PROCESSED_FOLDER):
-        subdir_path = os.path.join(PROCESSED_FOLDER, subdir)
-        if os.path.isdir(subdir_path):
-            for filename in os.listdir(subdir_path):
-                file_path = os.path.join(subdir_path, filename)
-                rel_path = f"{subdir}/{filename}"
-                url = f"/download_file?path={urllib.parse.quote(rel_path, safe='/')}"
+    with os.scandir(PROCESSED_FOLDER) as subdirs:
+        for subdir in subdirs:
+            try:
+                if not subdir.is_dir(follow_symlinks=False) or is_being_deleted(subdir.name):
+                    continue
+                with os.scandir(subdir.path) as files:
+                    entries = list(files)
+            except OSError:
+                continue  # Removed while we were listing
+            for f in entries:
+                rel_path = f"{subdir.name}/{f.name}"
+                quoted = quick_quote(rel_path)
+                url = f"/download_file?path={quoted}"
                 
-                # Test if the path would work
-                test_path = os.path.join(PROCESSED_FOLDER, rel_path)
+                # Path the download route would build from this URL
+                test_path = os.path.join(PROCESSED_FOLDER, quick_unquote(quoted))
                 
                 results.append({
-                    'subdir': subdir,
-                    'filename': filename,
+                    'subdir': subdir.name,
+                    'filename': f.name,
                     'rel_path': rel_path,
                     'url': url,
-                    'file_exists_at_original': os.path.exists(file_path),
+                    'file_exists_at_original': f.is_file() or f.is_dir(),
                     'file_exists_at_test_path': os.path.exists(test_path),
-                    'paths_match': file_path == test_path
+                    'paths_match': os.path.normpath(f.path) == os.path.normpath(test_path)
                 })
     
     return jsonify({
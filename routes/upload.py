@@ -5,11 +5,9 @@ Handles file uploads, chunked uploads, direct uploads, and batch uploads.
 """
 import os
 import re
-import time
 import shutil
 import uuid
 import threading
-import urllib.parse
 from datetime import datetime
 
 from flask import Blueprint, request, jsonify
@@ -30,7 +28,10 @@ from services.queue_service import (
     get_job_status,
     log_message,
     job_status,
+    reset_job_status,
     add_to_queue_tracker,
+    notify_upload_saved,
+    wait_for_upload,
 )
 from services.track_service import run_demucs_thread
 from utils.file_utils import (
@@ -38,10 +39,13 @@ from utils.file_utils import (
     is_track_already_processed,
     format_artists,
     get_parent_label,
+    ensure_dir,
+    forget_dirs,
+    save_upload,
+    quick_quote,
 )
 from utils.tracking import (
     check_pending_tracks_warning,
-    get_pending_tracks_count,
 )
 from utils.history import (
     add_to_upload_history,
@@ -109,27 +113,14 @@ def enqueue_file():
                     'track_name': clean_name,
                     'processed_dir': processed_dir,
                     'session_id': session_id,
-                    'pending_downloads': get_pending_tracks_count()
+                    'pending_downloads': pending_warning['count']
                 })
         # Verify file exists before queueing (with brief retry for race condition)
         session_upload_folder = os.path.join(UPLOAD_FOLDER, session_id)
         filepath = os.path.join(session_upload_folder, filename)
         
-        # Check if file exists, retry a few times if not (upload might still be completing)
-        file_exists = os.path.exists(filepath)
-        if not file_exists:
-            # Also check global folder
-            filepath_global = os.path.join(UPLOAD_FOLDER, filename)
-            file_exists = os.path.exists(filepath_global)
-        
-        if not file_exists:
-            # Brief retry (max 3 seconds) for slow uploads
-            for retry in range(3):
-                time.sleep(1)
-                if os.path.exists(filepath) or os.path.exists(os.path.join(UPLOAD_FOLDER, filename)):
-                    file_exists = True
-                    print(f"   ✅ File confirmed after {retry + 1}s wait: {filename}")
-                    break
+        # Check if file exists, wait briefly if not (upload might still be completing)
+        file_exists = wait_for_upload(filename, (filepath, os.path.join(UPLOAD_FOLDER, filename)), 3) is not None
         
         if not file_exists:
             log_message(f"⚠️ [{session_id}] Fichier non trouvé, impossible d'ajouter à la file : {filename}", session_id)
@@ -151,7 +142,7 @@ def enqueue_file():
             'message': 'Queued', 
             'queue_size': q_size, 
             'session_id': session_id,
-            'pending_downloads': get_pending_tracks_count()
+            'pending_downloads': pending_warning['count']
         }
         if pending_warning.get('warning'):
             response['pending_warning'] = pending_warning
@@ -214,13 +205,19 @@ def upload_chunk():
             print(f"📤 Upload: '{original_filename}' → '{safe_filename}'" + (" [AUTO-ENQUEUE]" if auto_enqueue else ""))
             
             # Use session-specific upload folder
-            session_upload_folder = os.path.join(app.config['UPLOAD_FOLDER'], session_id)
-            os.makedirs(session_upload_folder, exist_ok=True)
+            session_upload_folder = ensure_dir(os.path.join(app.config['UPLOAD_FOLDER'], session_id))
             filepath = os.path.join(session_upload_folder, safe_filename)
             
             # Save file with explicit error handling
             try:
-                file.save(filepath)
+                try:
+                    save_upload(file, filepath)
+                except FileNotFoundError:
+                    # Session folder was removed by a cleanup since we cached it
+                    forget_dirs(session_upload_folder)
+                    ensure_dir(session_upload_folder)
+                    save_upload(file, filepath)
+                notify_upload_saved(safe_filename)
                 print(f"✅ Saved: {safe_filename} ({os.path.getsize(filepath)} bytes)")
                 
                 # Add to upload history
@@ -276,7 +273,7 @@ def upload_chunk():
                         response_data['skipped'] = True
                         response_data['track_name'] = clean_name
                         response_data['processed_dir'] = processed_dir
-                        response_data['pending_downloads'] = get_pending_tracks_count()
+                        response_data['pending_downloads'] = pending_warning['count']
                         return jsonify(response_data)
                 
                 # Add to queue tracker for UI display
@@ -292,7 +289,7 @@ def upload_chunk():
                 
                 response_data['auto_enqueued'] = True
                 response_data['queue_size'] = q_size
-                response_data['pending_downloads'] = get_pending_tracks_count()
+                response_data['pending_downloads'] = pending_warning['count']
                 
                 if pending_warning.get('warning'):
                     response_data['pending_warning'] = pending_warning
@@ -320,7 +317,8 @@ def start_processing():
         return jsonify({'error': 'Un traitement est déjà en cours. Veuillez patienter.'}), 409
 
     # Scan upload folder for MP3s
-    files = [f for f in os.listdir(app.config['UPLOAD_FOLDER']) if f.lower().endswith('.mp3')]
+    with os.scandir(app.config['UPLOAD_FOLDER']) as entries:
+        files = [e.name for e in entries if e.name.lower().endswith('.mp3') and e.is_file()]
     
     if not files:
         return jsonify({'error': 'Aucun fichier trouvé dans le dossier uploads'}), 400
@@ -328,15 +326,7 @@ def start_processing():
     saved_filepaths = [os.path.join(app.config['UPLOAD_FOLDER'], f) for f in files]
     original_filenames = files  # filenames are just the basenames
     
-    job_status['state'] = 'starting'
-    job_status['progress'] = 0
-    job_status['total_files'] = len(files)
-    job_status['current_file_idx'] = 0
-    job_status['current_filename'] = ''
-    job_status['current_step'] = 'Initialisation...'
-    job_status['results'] = []
-    job_status['error'] = None
-    job_status['logs'] = []
+    reset_job_status(job_status, state='starting', total_files=len(files), current_step='Initialisation...')
     
     log_message(f"Traitement démarré pour {len(files)} fichier(s) (Mode Batch)")
     
@@ -416,7 +406,7 @@ def upload_direct():
         safe_filename = safe_filename.strip() or 'track.mp3'
         temp_path = os.path.join(temp_dir, safe_filename)
         
-        file.save(temp_path)
+        save_upload(file, temp_path)
         log_message(f"📁 [{session_id}] Direct upload saved: {safe_filename}")
         
         # Extract metadata from the file
@@ -649,7 +639,7 @@ def upload_direct():
         
         # Create relative URL for the file (will be uploaded to S3 by database_service)
         rel_path = f"direct_upload/{safe_filename}"
-        file_url = f"/download_file?path={urllib.parse.quote(rel_path, safe='/')}"
+        file_url = f"/download_file?path={quick_quote(rel_path)}"
         base_url = config.CURRENT_HOST_URL if config.CURRENT_HOST_URL else ""
         absolute_url = f"{base_url}{file_url}"
         
@@ -758,6 +748,8 @@ def upload_direct_batch():
     - files: Multiple MP3/WAV files
     - track_type: Optional fallback type if auto-detection fails (default: 'Main')
     - skip_waveform: If 'true', skip waveform generation for faster uploads
+    - concurrency: Optional number of tracks saved to S3/database at once
+      (default: S3_CONCURRENCY)
     """
     if not config.USE_DATABASE_MODE:
         return jsonify({'error': 'Direct upload requires database mode to be enabled'}), 400
@@ -774,10 +766,16 @@ def upload_direct_batch():
     fallback_track_type = request.form.get('track_type', 'Main')
     skip_waveform = request.form.get('skip_waveform', 'false').lower() == 'true'
     source_folder = request.form.get('source', '')
+    try:
+        concurrency = int(request.form['concurrency']) if request.form.get('concurrency') else None
+    except ValueError:
+        return jsonify({'error': 'concurrency must be an integer'}), 400
     
     results = []
     success_count = 0
     error_count = 0
+    # Files ready for the database: (index in results, filename, track type, track_id, track_data)
+    pending_saves = []
     
     for file in files:
         if not file.filename:
@@ -793,7 +791,7 @@ def upload_direct_batch():
             safe_filename = safe_filename.strip() or f'track_{len(results)}.mp3'
             temp_path = os.path.join(temp_dir, safe_filename)
             
-            file.save(temp_path)
+            save_upload(file, temp_path)
             
             # Detect format
             file_ext = os.path.splitext(file.filename)[1].lower()
@@ -949,7 +947,7 @@ def upload_direct_batch():
             
             # Build URL
             rel_path = f"direct_upload/{safe_filename}"
-            file_url = f"/download_file?path={urllib.parse.quote(rel_path, safe='/')}"
+            file_url = f"/download_file?path={quick_quote(rel_path)}"
             base_url = config.CURRENT_HOST_URL if config.CURRENT_HOST_URL else ""
             absolute_url = f"{base_url}{file_url}"
             
@@ -961,7 +959,6 @@ def upload_direct_batch():
             track_id = f"{isrc}_{filename_clean}" if isrc else filename_clean
             
             # Prepare track data
-            from database_service import save_track_to_database
             track_data = {
                 'Type': track_type,
                 'Format': format_type,
@@ -983,35 +980,48 @@ def upload_direct_batch():
                 '_force_cover_replace': bool(deezer_meta.get('cover_url')),
             }
             
-            # Save to database
-            result = save_track_to_database(track_data, skip_waveform=skip_waveform)
-            
+            # Saved to the database together with the rest of the batch below
+            pending_saves.append((len(results), safe_filename, track_type, track_id, track_data))
+            results.append(None)
+                
+        except Exception as e:
+            results.append({
+                'filename': file.filename,
+                'success': False,
+                'error': str(e)
+            })
+            error_count += 1
+    
+    # One batch save: S3 uploads and DB writes run concurrently, and variants of the
+    # same song are written in order so they land on the same track
+    if pending_saves:
+        from database_service import save_tracks_to_database
+        try:
+            saved = save_tracks_to_database([p[4] for p in pending_saves],
+                                            skip_waveform=skip_waveform, concurrency=concurrency)
+        except Exception as e:
+            log_message(f"❌ [{session_id}] Batch database save failed: {e}")
+            saved = [{'error': str(e)}] * len(pending_saves)
+        
+        for (idx, safe_filename, track_type, track_id, _), result in zip(pending_saves, saved):
             if 'error' in result:
-                results.append({
+                results[idx] = {
                     'filename': safe_filename,
                     'success': False,
                     'error': result['error']
-                })
+                }
                 error_count += 1
             else:
-                results.append({
+                results[idx] = {
                     'filename': safe_filename,
                     'success': True,
                     'track_id': result.get('trackId', track_id),
                     'database_id': result.get('id'),
                     'action': result.get('action', 'created'),
                     'skip_waveform': skip_waveform
-                })
+                }
                 success_count += 1
                 add_to_upload_history(safe_filename, session_id, 'completed', track_type)
-                
-        except Exception as e:
-            results.append({
-                'filename': file.filename,
-                'success': False,
-                'error': str(e)
-            })
-            error_count += 1
     
     # Cleanup temp directory
     try:
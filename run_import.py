@@ -6,6 +6,7 @@ uploads to S3, writes to DB, and prints created IDs.
 Usage:
     python3 run_import.py "/ID 2026/DJ CITY/2022/DECEMBRE" --limit 10
     python3 run_import.py "/ID 2026/DJ CITY/2022/DECEMBRE" --limit 10 --skip-waveform
+    python3 run_import.py "/ID 2026/DJ CITY/2022/DECEMBRE" --limit 50 --concurrency 8
 """
 
 import re
@@ -270,6 +271,7 @@ def main():
     folder_path = '/ID 2026/DJ CITY/2022/DECEMBRE'
     limit = 10
     skip_waveform = False
+    concurrency = None  # Tracks saved at once (default: S3_CONCURRENCY)
 
     args = sys.argv[1:]
     i = 0
@@ -278,6 +280,8 @@ def main():
             limit = int(args[i + 1]); i += 2
         elif args[i] == '--skip-waveform':
             skip_waveform = True; i += 1
+        elif args[i] == '--concurrency' and i + 1 < len(args):
+            concurrency = int(args[i + 1]); i += 2
         elif args[i] in ('-h', '--help'):
             print(__doc__); sys.exit(0)
         else:
@@ -341,7 +345,7 @@ def main():
     print(f"\n{C.BOLD}5. Importing to database...{C.END}")
 
     # Import the database service (Prisma + S3)
-    from database_service import save_track_to_database, check_database_connection
+    from database_service import save_tracks_to_database, check_database_connection, wait_waveforms
 
     if not check_database_connection():
         print(f"{C.RED}Database connection failed!{C.END}")
@@ -349,6 +353,7 @@ def main():
     print(f"  {C.GREEN}Database connected{C.END}")
 
     results = []
+    pending = []  # (file, track_data, summary fields) saved together below
     for idx, f in enumerate(to_import, 1):
         print(f"\n{'─' * 60}")
         print(f"{C.BOLD}[{idx}/{len(to_import)}] {f['name']}{C.END}")
@@ -431,31 +436,44 @@ def main():
         print(f"  BPM: {bpm}  ISRC: {isrc}")
         print(f"  Cover: {cover_url[:60]}..." if cover_url else "  Cover: (none)")
 
-        # Save to database (handles S3 upload, cover upload, Prisma write)
-        print(f"  💾 Saving to database...")
-        try:
-            result = save_track_to_database(track_data, skip_waveform=skip_waveform)
-            if 'error' in result:
-                print(f"  {C.RED}ERROR: {result['error']}{C.END}")
-                results.append({'filename': f['name'], 'error': result['error']})
-            else:
-                db_id = result.get('id', '???')
-                action = result.get('action', 'unknown')
-                print(f"  {C.GREEN}✅ {action.upper()}: ID = {db_id}{C.END}")
-                results.append({
-                    'filename': f['name'],
-                    'id': db_id,
-                    'trackId': result.get('trackId', track_id),
-                    'action': action,
-                    'type': track_type,
-                    'artist': artist,
-                    'title': ct,
-                    'isrc': isrc,
-                })
-        except Exception as e:
-            print(f"  {C.RED}EXCEPTION: {e}{C.END}")
-            import traceback; traceback.print_exc()
-            results.append({'filename': f['name'], 'error': str(e)})
+        pending.append((f, track_data, {
+            'trackId': track_id,
+            'type': track_type,
+            'artist': artist,
+            'title': ct,
+            'isrc': isrc,
+        }))
+
+    # Save all tracks in one batch (S3 upload, cover upload, Prisma write run
+    # concurrently; variants of the same song are saved in order)
+    print(f"\n{'─' * 60}")
+    print(f"  💾 Saving {len(pending)} tracks to database...")
+    try:
+        saved = save_tracks_to_database([track_data for _, track_data, _ in pending],
+                                        skip_waveform=skip_waveform, concurrency=concurrency)
+    except Exception as e:
+        print(f"  {C.RED}EXCEPTION: {e}{C.END}")
+        import traceback; traceback.print_exc()
+        saved = [{'error': str(e)}] * len(pending)
+
+    for (f, _, summary), result in zip(pending, saved):
+        if 'error' in result:
+            print(f"  {C.RED}ERROR: {f['name']}: {result['error']}{C.END}")
+            results.append({'filename': f['name'], 'error': result['error']})
+        else:
+            db_id = result.get('id', '???')
+            action = result.get('action', 'unknown')
+            print(f"  {C.GREEN}✅ {action.upper()}: {f['name']} → ID = {db_id}{C.END}")
+            results.append({
+                'filename': f['name'],
+                'id': db_id,
+                **summary,
+                'trackId': result.get('trackId', summary['trackId']),
+                'action': action,
+            })
+
+    # New tracks get their waveform in a follow-up update; let those land before exiting
+    wait_waveforms()
 
     # ═══ Summary ═══
     print(f"\n{'=' * 60}")
@@ -11,6 +11,7 @@ Keystone stores files as:
 
 import os
 import re
+import sys
 import uuid
 import requests
 from typing import Optional, Dict, Any
@@ -20,6 +21,7 @@ from io import BytesIO
 # Try to import boto3 for S3
 try:
     import boto3
+    from boto3.s3.transfer import TransferConfig
     from botocore.config import Config
     S3_AVAILABLE = True
 except ImportError:
@@ -34,12 +36,61 @@ S3_SECRET_KEY = os.environ.get('S3_SECRET_KEY', os.environ.get('AWS_SECRET_ACCES
 # Optional: Only needed for S3-compatible services like DigitalOcean Spaces
 S3_ENDPOINT = os.environ.get('S3_ENDPOINT', '')
 
+# Multipart uploads: large files (WAVs) go up as 8 MB parts on several threads;
+# files under SMALL_UPLOAD_BYTES skip multipart and use a single PUT
+S3_PART_CONCURRENCY = int(os.environ.get('S3_PART_CONCURRENCY', 10))
+MULTIPART_CHUNK_BYTES = 8 * 1024 * 1024
+SMALL_UPLOAD_BYTES = 5 * 1024 * 1024
+
+if S3_AVAILABLE:
+    _MULTIPART_CONFIG = TransferConfig(
+        multipart_threshold=MULTIPART_CHUNK_BYTES,
+        multipart_chunksize=MULTIPART_CHUNK_BYTES,
+        max_concurrency=S3_PART_CONCURRENCY,
+        use_threads=True,
+    )
+    _SINGLE_PUT_CONFIG = TransferConfig(multipart_threshold=sys.maxsize, use_threads=False)
+
+
+def _transfer_config(size: int):
+    """TransferConfig for an upload of `size` bytes."""
+    return _SINGLE_PUT_CONFIG if size < SMALL_UPLOAD_BYTES else _MULTIPART_CONFIG
+
+
 # S3 base paths (matching Keystone configuration)
 AUDIO_MP3_PATH = 'tracks/mp3'
 AUDIO_WAV_PATH = 'tracks/wav'
 IMAGE_PATH = 'tracks/cover'
 
 
+class _CountingReader:
+    """File-like wrapper over a streamed HTTP body that counts the bytes read.
+    
+    read(n) returns exactly n bytes until EOF: multipart parts read short from
+    the socket would be rejected by S3 (every part but the last must be >= 5 MB).
+    """
+    
+    def __init__(self, raw):
+        self._raw = raw
+        self.bytes_read = 0
+    
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data = self._raw.read()
+        else:
+            chunks = []
+            remaining = size
+            while remaining > 0:
+                chunk = self._raw.read(remaining)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                remaining -= len(chunk)
+            data = b''.join(chunks)
+        self.bytes_read += len(data)
+        return data
+
+
 @dataclass
 class AudioUploadResult:
     """Result of audio file upload - matches Keystone's file storage pattern."""
@@ -228,7 +279,7 @@ class S3Service:
         folder_prefix: str = '',
     ) -> AudioUploadResult:
         """
-        Download audio file from URL and upload to S3.
+        Stream audio file from URL to S3.
 
         Args:
             source_url: URL to download the file from
@@ -249,9 +300,6 @@ class S3Service:
         if not self._configured:
             raise Exception("S3 not configured")
 
-        # Download the file
-        content, filesize = self.download_file(source_url)
-
         # Determine S3 path based on file type
         base_path = AUDIO_WAV_PATH if is_wav else AUDIO_MP3_PATH
 
@@ -276,18 +324,26 @@ class S3Service:
         }
         content_type = content_types.get(extension, 'audio/mpeg')
 
+        print(f"   📥 Streaming: {source_url[:100]}...")
         print(f"   📤 Uploading to S3: {s3_key}")
 
-        # Upload to S3
-        self._client.upload_fileobj(
-            BytesIO(content),
-            S3_BUCKET,
-            s3_key,
-            ExtraArgs={
-                'ContentType': content_type,
-                'ACL': 'public-read',
-            },
-        )
+        # Pipe the HTTP body straight into S3 (no full in-memory copy)
+        with requests.get(source_url, timeout=300, stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            body = _CountingReader(response.raw)
+            declared_size = int(response.headers.get('Content-Length') or 0)
+            self._client.upload_fileobj(
+                body,
+                S3_BUCKET,
+                s3_key,
+                ExtraArgs={
+                    'ContentType': content_type,
+                    'ACL': 'public-read',
+                },
+                Config=_transfer_config(declared_size) if declared_size else _MULTIPART_CONFIG,
+            )
+        filesize = body.bytes_read
 
         print(f"   ✅ Uploaded: {stored_filename} ({filesize / 1024:.1f} KB)")
 
@@ -3,10 +3,12 @@ Cleanup service for IDByRivoli.
 
 Disk monitoring, oldest-track deletion, delayed deletion, startup/periodic cleanup.
 """
+import errno
 import os
 import shutil
 import time
 import threading
+import uuid
 import psutil
 
 from config import (
@@ -14,6 +16,8 @@ from config import (
     OUTPUT_FOLDER,
     UPLOAD_FOLDER,
     BASE_DIR,
+    TRASH_FOLDER,
+    memory_throttle_event,
     pending_downloads,
     pending_downloads_lock,
     track_download_status,
@@ -32,6 +36,7 @@ from config import (
     CLEANUP_INTERVAL_MINUTES,
 )
 import config
+from utils.file_utils import forget_dirs, is_being_deleted
 
 
 # ---------------------------------------------------------------------------
@@ -69,6 +74,24 @@ def get_disk_usage_percent():
         return 0
 
 
+def _tree_size(path):
+    """Total size of the regular files under path (scandir: entry types come from getdents)."""
+    total = 0
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        total += _tree_size(entry.path)
+                    elif entry.is_file():
+                        total += entry.stat().st_size
+                except OSError:
+                    pass
+    except OSError:
+        pass
+    return total
+
+
 def get_oldest_tracks(limit):
     """
     Get list of oldest track folders in PROCESSED_FOLDER sorted by modification time.
@@ -80,14 +103,13 @@ def get_oldest_tracks(limit):
         if not os.path.exists(PROCESSED_FOLDER):
             return []
         
-        for item in os.listdir(PROCESSED_FOLDER):
-            item_path = os.path.join(PROCESSED_FOLDER, item)
-            if os.path.isdir(item_path):
-                try:
-                    mtime = os.path.getmtime(item_path)
-                    tracks.append((item, item_path, mtime))
-                except Exception as e:
-                    print(f"   ⚠️ Could not get mtime for {item}: {e}")
+        with os.scandir(PROCESSED_FOLDER) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    try:
+                        tracks.append((entry.name, entry.path, entry.stat().st_mtime))
+                    except Exception as e:
+                        print(f"   ⚠️ Could not get mtime for {entry.name}: {e}")
         
         # Sort by modification time (oldest first)
         tracks.sort(key=lambda x: x[2])
@@ -215,37 +237,33 @@ def cleanup_all_folders():
     for folder, name in folders_to_clean:
         if not os.path.exists(folder):
             continue
-        for item in os.listdir(folder):
-            item_path = os.path.join(folder, item)
-            try:
-                if os.path.isfile(item_path) or os.path.islink(item_path):
-                    freed_bytes += os.path.getsize(item_path)
-                    os.unlink(item_path)
-                    deleted_count += 1
-                elif os.path.isdir(item_path):
-                    for dirpath, _dirnames, filenames in os.walk(item_path):
-                        for f in filenames:
-                            try:
-                                freed_bytes += os.path.getsize(os.path.join(dirpath, f))
-                            except Exception:
-                                pass
-                    shutil.rmtree(item_path)
-                    deleted_count += 1
-            except Exception as e:
-                print(f"   ⚠️ Could not delete {item_path}: {e}")
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() or entry.is_symlink():
+                        freed_bytes += entry.stat().st_size
+                        os.unlink(entry.path)
+                        deleted_count += 1
+                    elif entry.is_dir():
+                        freed_bytes += _tree_size(entry.path)
+                        shutil.rmtree(entry.path)
+                        forget_dirs(entry.path)
+                        deleted_count += 1
+                except Exception as e:
+                    print(f"   ⚠️ Could not delete {entry.path}: {e}")
 
     # Also clean covers folder
     covers_folder = os.path.join(BASE_DIR, 'static', 'covers')
     if os.path.exists(covers_folder):
-        for filename in os.listdir(covers_folder):
-            if filename.startswith('cover_'):
-                try:
-                    fp = os.path.join(covers_folder, filename)
-                    freed_bytes += os.path.getsize(fp)
-                    os.unlink(fp)
-                    deleted_count += 1
-                except Exception:
-                    pass
+        with os.scandir(covers_folder) as entries:
+            for entry in entries:
+                if entry.name.startswith('cover_'):
+                    try:
+                        freed_bytes += entry.stat().st_size
+                        os.unlink(entry.path)
+                        deleted_count += 1
+                    except Exception:
+                        pass
 
     return freed_bytes, deleted_count
 
@@ -403,6 +421,74 @@ def delayed_delete_track(track_name, delay_minutes):
                 del scheduled_deletions[track_name]
 
 
+# =============================================================================
+# TRASH (DEFERRED DELETES)
+# =============================================================================
+
+_trash_wakeup = threading.Event()
+
+
+def move_to_trash(path):
+    """
+    Atomically move a file or folder into TRASH_FOLDER; trash_janitor deletes it later.
+    Falls back to deleting in place if the rename crosses filesystems.
+    """
+    dst = os.path.join(TRASH_FOLDER, f'{os.path.basename(path)}.{uuid.uuid4().hex}')
+    try:
+        os.replace(path, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.unlink(path)
+    forget_dirs(path)
+    _trash_wakeup.set()
+
+
+def sweep_deleting_leftovers():
+    """Delete '<track>.deleting.<id>' folders left when a _remove_tree delete failed."""
+    for folder in (PROCESSED_FOLDER, os.path.join(OUTPUT_FOLDER, 'htdemucs')):
+        try:
+            with os.scandir(folder) as entries:
+                leftovers = [entry.path for entry in entries if is_being_deleted(entry.name)]
+        except FileNotFoundError:
+            continue
+        for path in leftovers:
+            try:
+                shutil.rmtree(path)
+                print(f"🗑️ Removed leftover {os.path.basename(path)}")
+            except Exception as e:
+                print(f"⚠️ Could not remove leftover {os.path.basename(path)}: {e}")
+
+
+def trash_janitor():
+    """Background thread that empties TRASH_FOLDER (also clears leftovers from a previous run)."""
+    # Only at startup: while running, a leftover may still be an rmtree in progress
+    sweep_deleting_leftovers()
+    while True:
+        try:
+            with os.scandir(TRASH_FOLDER) as entries:
+                for entry in entries:
+                    # Yield to the workers while memory is critical
+                    memory_throttle_event.wait()
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            shutil.rmtree(entry.path)
+                        else:
+                            os.unlink(entry.path)
+                    except Exception as e:
+                        print(f"⚠️ Trash janitor could not delete {entry.name}: {e}")
+        except FileNotFoundError:
+            os.makedirs(TRASH_FOLDER, exist_ok=True)
+        except Exception as e:
+            print(f"⚠️ Trash janitor error: {e}")
+
+        _trash_wakeup.wait()
+        _trash_wakeup.clear()
+
+
 # =============================================================================
 # STARTUP CLEANUP
 # =============================================================================
@@ -436,26 +522,21 @@ def startup_cleanup():
         folder_size = 0
         file_count = 0
         
-        for item in os.listdir(folder):
-            item_path = os.path.join(folder, item)
-            try:
-                if os.path.isfile(item_path) or os.path.islink(item_path):
-                    folder_size += os.path.getsize(item_path)
-                    os.unlink(item_path)
-                    file_count += 1
-                elif os.path.isdir(item_path):
-                    # Calculate dir size first
-                    for dirpath, dirnames, filenames in os.walk(item_path):
-                        for f in filenames:
-                            fp = os.path.join(dirpath, f)
-                            try:
-                                folder_size += os.path.getsize(fp)
-                            except:
-                                pass
-                    shutil.rmtree(item_path)
-                    file_count += 1
-            except Exception as e:
-                print(f"   ⚠️ Could not delete {item_path}: {e}")
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() or entry.is_symlink():
+                        folder_size += entry.stat().st_size
+                        os.unlink(entry.path)
+                        file_count += 1
+                    elif entry.is_dir():
+                        # Calculate dir size first
+                        folder_size += _tree_size(entry.path)
+                        shutil.rmtree(entry.path)
+                        forget_dirs(entry.path)
+                        file_count += 1
+                except Exception as e:
+                    print(f"   ⚠️ Could not delete {entry.path}: {e}")
         
         total_deleted += file_count
         total_size_freed += folder_size
@@ -468,15 +549,15 @@ def startup_cleanup():
     covers_folder = os.path.join(BASE_DIR, 'static', 'covers')
     if os.path.exists(covers_folder):
         cover_count = 0
-        for filename in os.listdir(covers_folder):
-            if filename.startswith('cover_'):  # Only delete extracted covers
-                try:
-                    file_path = os.path.join(covers_folder, filename)
-                    total_size_freed += os.path.getsize(file_path)
-                    os.unlink(file_path)
-                    cover_count += 1
-                except:
-                    pass
+        with os.scandir(covers_folder) as entries:
+            for entry in entries:
+                if entry.name.startswith('cover_'):  # Only delete extracted covers
+                    try:
+                        total_size_freed += entry.stat().st_size
+                        os.unlink(entry.path)
+                        cover_count += 1
+                    except:
+                        pass
         if cover_count > 0:
             _log_message(f"   🗑️ covers: {cover_count} items deleted")
     
@@ -515,78 +596,65 @@ def periodic_cleanup():
             
             # Clean old files in processed folder
             if os.path.exists(PROCESSED_FOLDER):
-                for item in os.listdir(PROCESSED_FOLDER):
-                    item_path = os.path.join(PROCESSED_FOLDER, item)
-                    try:
-                        # Get modification time of folder
-                        mtime = os.path.getmtime(item_path)
-                        age = now - mtime
-                        
-                        if age > max_age_seconds:
-                            if os.path.isdir(item_path):
-                                # Calculate size before deleting
-                                for dirpath, dirnames, filenames in os.walk(item_path):
-                                    for f in filenames:
-                                        try:
-                                            cleaned_size += os.path.getsize(os.path.join(dirpath, f))
-                                        except:
-                                            pass
-                                shutil.rmtree(item_path)
-                            else:
-                                cleaned_size += os.path.getsize(item_path)
-                                os.unlink(item_path)
-                            cleaned_count += 1
-                    except Exception as e:
-                        pass
+                with os.scandir(PROCESSED_FOLDER) as entries:
+                    for entry in entries:
+                        try:
+                            # Get modification time of folder
+                            age = now - entry.stat().st_mtime
+                            
+                            if age > max_age_seconds:
+                                if entry.is_dir():
+                                    # Calculate size before deleting
+                                    cleaned_size += _tree_size(entry.path)
+                                    shutil.rmtree(entry.path)
+                                else:
+                                    cleaned_size += entry.stat().st_size
+                                    os.unlink(entry.path)
+                                cleaned_count += 1
+                        except Exception:
+                            pass
             
             # Clean old htdemucs output
             htdemucs_folder = os.path.join(OUTPUT_FOLDER, 'htdemucs')
             if os.path.exists(htdemucs_folder):
-                for item in os.listdir(htdemucs_folder):
-                    item_path = os.path.join(htdemucs_folder, item)
-                    try:
-                        mtime = os.path.getmtime(item_path)
-                        age = now - mtime
-                        
-                        if age > max_age_seconds:
-                            if os.path.isdir(item_path):
-                                for dirpath, dirnames, filenames in os.walk(item_path):
-                                    for f in filenames:
-                                        try:
-                                            cleaned_size += os.path.getsize(os.path.join(dirpath, f))
-                                        except:
-                                            pass
-                                shutil.rmtree(item_path)
-                            else:
-                                cleaned_size += os.path.getsize(item_path)
-                                os.unlink(item_path)
-                            cleaned_count += 1
-                    except:
-                        pass
+                with os.scandir(htdemucs_folder) as entries:
+                    for entry in entries:
+                        try:
+                            # Get modification time of folder
+                            age = now - entry.stat().st_mtime
+                            
+                            if age > max_age_seconds:
+                                if entry.is_dir():
+                                    # Calculate size before deleting
+                                    cleaned_size += _tree_size(entry.path)
+                                    shutil.rmtree(entry.path)
+                                else:
+                                    cleaned_size += entry.stat().st_size
+                                    os.unlink(entry.path)
+                                cleaned_count += 1
+                        except Exception:
+                            pass
             
             # Clean old upload files
             if os.path.exists(UPLOAD_FOLDER):
-                for item in os.listdir(UPLOAD_FOLDER):
-                    item_path = os.path.join(UPLOAD_FOLDER, item)
-                    try:
-                        mtime = os.path.getmtime(item_path)
-                        age = now - mtime
-                        
-                        if age > max_age_seconds:
-                            if os.path.isdir(item_path):
-                                for dirpath, dirnames, filenames in os.walk(item_path):
-                                    for f in filenames:
-                                        try:
-                                            cleaned_size += os.path.getsize(os.path.join(dirpath, f))
-                                        except:
-                                            pass
-                                shutil.rmtree(item_path)
-                            else:
-                                cleaned_size += os.path.getsize(item_path)
-                                os.unlink(item_path)
-                            cleaned_count += 1
-                    except:
-                        pass
+                with os.scandir(UPLOAD_FOLDER) as entries:
+                    for entry in entries:
+                        try:
+                            # Get modification time of folder
+                            age = now - entry.stat().st_mtime
+                            
+                            if age > max_age_seconds:
+                                if entry.is_dir():
+                                    # Calculate size before deleting
+                                    cleaned_size += _tree_size(entry.path)
+                                    shutil.rmtree(entry.path)
+                                    forget_dirs(entry.path)
+                                else:
+                                    cleaned_size += entry.stat().st_size
+                                    os.unlink(entry.path)
+                                cleaned_count += 1
+                        except Exception:
+                            pass
             
             if cleaned_count > 0:
                 size_mb = cleaned_size / (1024 * 1024)
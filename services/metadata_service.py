@@ -6,6 +6,11 @@ Title cleaning, Deezer API lookups, ID3 tag management, and API export.
 import os
 import re
 import json
+import time
+import queue
+import atexit
+import functools
+import threading
 import requests
 from datetime import datetime
 
@@ -17,10 +22,14 @@ from mutagen.id3 import (
 
 from config import (
     BASE_DIR,
+    COVERS_FOLDER,
     USE_DATABASE_MODE,
     API_ENDPOINT,
     API_KEY,
     CURRENT_HOST_URL,
+    API_BATCH_MAX_ITEMS,
+    API_BATCH_WINDOW_MS,
+    API_BATCH_DRAIN_TIMEOUT_SECONDS,
     bulk_import_state,
 )
 from utils.file_utils import format_artists, get_parent_label, clean_filename
@@ -38,6 +47,10 @@ def _log_message(message, session_id=None):
         print(message)
 
 
+# Track ID normalisation: dashes and underscores become spaces in one pass
+_DASH_UNDERSCORE_TO_SPACE = str.maketrans('-_', '  ')
+
+
 # =============================================================================
 # TITLE DETECTION / CLEANING CONSTANTS
 # =============================================================================
@@ -1077,7 +1090,7 @@ def update_metadata(filepath, artist, title, original_path, bpm):
         # Extract clean filename (without path and extension)
         filename_base = os.path.splitext(os.path.basename(filepath))[0]
         # Replace dashes with spaces, then normalize spaces, then convert to underscores
-        filename_clean = filename_base.replace('-', ' ').replace('_', ' ')
+        filename_clean = filename_base.translate(_DASH_UNDERSCORE_TO_SPACE)
         filename_clean = re.sub(r'\s+', ' ', filename_clean).strip()  # Multiple spaces -> single space
         filename_clean = filename_clean.replace(' ', '_')  # Spaces -> underscores
         filename_clean = re.sub(r'_+', '_', filename_clean)  # Multiple underscores -> single underscore
@@ -1206,7 +1219,7 @@ def update_metadata_wav(filepath, artist, title, original_path, bpm):
         
         # 10. Custom Track ID
         filename_base = os.path.splitext(os.path.basename(filepath))[0]
-        filename_clean = filename_base.replace('-', ' ').replace('_', ' ')
+        filename_clean = filename_base.translate(_DASH_UNDERSCORE_TO_SPACE)
         filename_clean = re.sub(r'\s+', ' ', filename_clean).strip()
         filename_clean = filename_clean.replace(' ', '_')
         filename_clean = re.sub(r'_+', '_', filename_clean)
@@ -1250,6 +1263,27 @@ def update_metadata_wav(filepath, artist, title, original_path, bpm):
 # API / DATABASE EXPORT
 # =============================================================================
 
+def _write_file_bytes(path, data):
+    """Write bytes with raw os.write on a memoryview (no BufferedWriter copy)."""
+    view = memoryview(data)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+    finally:
+        os.close(fd)
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_release_date(date_str):
+    """'YYYY-MM-DD' → Unix timestamp (0 if unparseable). Cached: MP3 and WAV exports share dates."""
+    try:
+        return int(datetime.fromisoformat(date_str).timestamp())
+    except (ValueError, TypeError, OverflowError, OSError):
+        return 0
+
+
 def prepare_track_metadata(edit_info, original_path, bpm, base_url="", allow_no_deezer=False):
     """
     Prepares track metadata for API export with absolute URLs.
@@ -1271,33 +1305,30 @@ def prepare_track_metadata(edit_info, original_path, bpm, base_url="", allow_no_
         original_audio = MP3(original_path, ID3=ID3)
         original_tags = original_audio.tags if original_audio.tags else {}
         
-        # Extract fields
-        artist_raw = str(original_tags.get('TPE1', 'Unknown')).strip() if 'TPE1' in original_tags else 'Unknown'
+        # Extract fields (single .get() per frame, None when absent)
+        tpe1 = original_tags.get('TPE1')
+        artist_raw = str(tpe1).strip() if tpe1 is not None else 'Unknown'
         artist = format_artists(artist_raw)  # Format multiple artists with , and &
-        album = str(original_tags.get('TALB', '')).strip() if 'TALB' in original_tags else ''
-        genre = str(original_tags.get('TCON', '')).strip() if 'TCON' in original_tags else ''
+        talb = original_tags.get('TALB')
+        album = str(talb).strip() if talb is not None else ''
+        tcon = original_tags.get('TCON')
+        genre = str(tcon).strip() if tcon is not None else ''
         
         # ISRC extraction
-        isrc = ''
-        if 'TSRC' in original_tags:
-            isrc = str(original_tags['TSRC'].text[0]).strip() if original_tags['TSRC'].text else ''
+        tsrc = original_tags.get('TSRC')
+        isrc = str(tsrc.text[0]).strip() if tsrc is not None and tsrc.text else ''
         
         # Date handling
-        date_str = str(original_tags.get('TDRC', '')).strip() if 'TDRC' in original_tags else ''
-        try:
-            if date_str:
-                date_obj = datetime.strptime(date_str[:10], '%Y-%m-%d')
-                date_sortie = int(date_obj.timestamp())
-            else:
-                date_sortie = 0
-        except:
-            date_sortie = 0
+        tdrc = original_tags.get('TDRC')
+        date_str = str(tdrc).strip() if tdrc is not None else ''
+        date_sortie = _parse_release_date(date_str[:10]) if date_str else 0
         
         # Publisher/Label: original goes to Sous-label, mapped goes to Label
         sous_label = ''  # Original publisher from file
         parent_label = ''  # Mapped parent label
-        if 'TPUB' in original_tags and original_tags['TPUB'].text:
-            sous_label = str(original_tags['TPUB'].text[0]).strip()
+        tpub = original_tags.get('TPUB')
+        if tpub is not None and tpub.text:
+            sous_label = str(tpub.text[0]).strip()
             # Map sub-label to parent label
             parent_label = get_parent_label(sous_label) if sous_label else ''
             # If mapping didn't change it (not in our list), parent_label = sous_label
@@ -1340,11 +1371,10 @@ def prepare_track_metadata(edit_info, original_path, bpm, base_url="", allow_no_
                         mime = getattr(original_apic, 'mime', 'image/jpeg')
                         ext = 'jpg' if 'jpeg' in mime.lower() else 'png'
                         cover_filename = f"cover_{track_name_clean}.{ext}"
-                        cover_save_path = os.path.join(BASE_DIR, 'static', 'covers', cover_filename)
+                        cover_save_path = os.path.join(COVERS_FOLDER, cover_filename)
                         
                         # Save the original cover
-                        with open(cover_save_path, 'wb') as f:
-                            f.write(original_apic.data)
+                        _write_file_bytes(cover_save_path, original_apic.data)
                         
                         # Use the original cover URL
                         cover_url = f"{base_url}/static/covers/{cover_filename}"
@@ -1362,7 +1392,8 @@ def prepare_track_metadata(edit_info, original_path, bpm, base_url="", allow_no_
         # edit_info['name'] is "BaseName - Variant" (e.g., "ParoVie (feat. Damso) - Main")
         # which clean_detected_type_from_title splits on " - " and reduces to just the
         # variant suffix ("Main", "Acapella", "Instrumental") instead of the real title.
-        original_title_tag = str(original_tags.get('TIT2', '')).strip() if 'TIT2' in original_tags else ''
+        tit2 = original_tags.get('TIT2')
+        original_title_tag = str(tit2).strip() if tit2 is not None else ''
         if original_title_tag:
             search_title = clean_detected_type_from_title(original_title_tag)
         else:
@@ -1396,12 +1427,9 @@ def prepare_track_metadata(edit_info, original_path, bpm, base_url="", allow_no_
                         parent_label = ''
                     print(f"   📝 Label from Deezer: {sous_label}")
                 if not date_sortie and deezer_meta.get('release_date'):
-                    try:
-                        date_obj = datetime.strptime(deezer_meta['release_date'][:10], '%Y-%m-%d')
-                        date_sortie = int(date_obj.timestamp())
+                    date_sortie = _parse_release_date(deezer_meta['release_date'][:10])
+                    if date_sortie:
                         print(f"   📝 Release date from Deezer: {deezer_meta['release_date']}")
-                    except:
-                        pass
                 
                 # Cover from Deezer
                 if deezer_meta.get('cover_url'):
@@ -1421,7 +1449,7 @@ def prepare_track_metadata(edit_info, original_path, bpm, base_url="", allow_no_
         
         # Generate Track ID (clean format: no dashes, single underscores only)
         filename_raw = edit_info.get('name', '')
-        filename_clean = filename_raw.replace('-', ' ').replace('_', ' ')
+        filename_clean = filename_raw.translate(_DASH_UNDERSCORE_TO_SPACE)
         filename_clean = re.sub(r'\s+', ' ', filename_clean).strip()
         filename_clean = filename_clean.replace(' ', '_')
         filename_clean = re.sub(r'_+', '_', filename_clean)
@@ -1503,15 +1531,41 @@ def send_track_info_to_api(track_data):
         print("⚠️  API_ENDPOINT not configured, skipping API call")
         return
     
+    if not _cfg.API_BATCH_ENABLED:
+        _post_single_track(track_data, _api_headers())
+        return
+    
+    # Hand off to the batch uploader (payloads are POSTed together)
+    _ensure_api_batch_thread()
+    _api_batch_queue.put(track_data)
+
+
+# =============================================================================
+# API BATCH UPLOADER
+# =============================================================================
+
+_api_session = requests.Session()
+_api_batch_queue = queue.Queue()
+_api_batch_thread = None
+_api_batch_thread_lock = threading.Lock()
+_api_batch_stop = threading.Event()
+
+
+def _api_headers():
+    import config as _cfg
+    return {
+        'Content-Type': 'application/json',
+        'Authorization': _cfg.AUTH_BEARER_HEADER
+    }
+
+
+def _post_single_track(track_data, headers):
+    """POST one track payload (default path, and fallback when the server rejects a batch)."""
+    import config as _cfg
     try:
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {_cfg.API_KEY}'
-        }
+        response = _api_session.post(_cfg.API_ENDPOINT, json=track_data, headers=headers, timeout=30)
         
-        response = requests.post(_cfg.API_ENDPOINT, json=track_data, headers=headers, timeout=30)
-        
-        if response.status_code in [200, 202]:
+        if 200 <= response.status_code < 300:
             print(f"✅ API SUCCESS: {track_data['Titre']} ({track_data['Format']})")
             _log_message(f"API OK: {track_data['Titre']} ({track_data['Format']}) → {track_data.get('Fichiers', '')}")
         else:
@@ -1521,3 +1575,76 @@ def send_track_info_to_api(track_data):
     except Exception as e:
         print(f"❌ API EXCEPTION: {e}")
         _log_message(f"API EXCEPTION: {e}")
+
+
+def _post_track_batch(batch):
+    """POST a list of track payloads as {"tracks": [...]}, per-track on rejection."""
+    import config as _cfg
+    headers = _api_headers()
+    try:
+        response = _api_session.post(_cfg.API_ENDPOINT, json={'tracks': batch}, headers=headers, timeout=30)
+        if 200 <= response.status_code < 300:
+            print(f"✅ API BATCH SUCCESS: {len(batch)} track(s)")
+            for track_data in batch:
+                _log_message(f"API OK: {track_data['Titre']} ({track_data['Format']}) → {track_data.get('Fichiers', '')}")
+            return
+        print(f"⚠️ API batch rejected ({response.status_code}) - falling back to per-track posts")
+    except Exception as e:
+        print(f"⚠️ API batch exception: {e} - falling back to per-track posts")
+    
+    for track_data in batch:
+        _post_single_track(track_data, headers)
+
+
+def _api_batch_loop():
+    """Drain the upload queue, coalescing up to API_BATCH_MAX_ITEMS payloads per window.
+    
+    Once _api_batch_stop is set, exits as soon as the queue is empty.
+    """
+    window = API_BATCH_WINDOW_MS / 1000.0
+    while True:
+        try:
+            batch = [_api_batch_queue.get(timeout=0.5)]
+        except queue.Empty:
+            if _api_batch_stop.is_set():
+                return
+            continue
+        deadline = time.monotonic() + window
+        while len(batch) < API_BATCH_MAX_ITEMS:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_api_batch_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        try:
+            _post_track_batch(batch)
+        except Exception as e:
+            print(f"⚠️ API batch uploader error: {e}")
+        finally:
+            for _ in batch:
+                _api_batch_queue.task_done()
+
+
+def _ensure_api_batch_thread():
+    global _api_batch_thread
+    if _api_batch_thread is not None:
+        return
+    with _api_batch_thread_lock:
+        if _api_batch_thread is None:
+            _api_batch_thread = threading.Thread(target=_api_batch_loop, daemon=True)
+            _api_batch_thread.start()
+
+
+@atexit.register
+def _flush_api_batch_queue():
+    """Let the uploader send its in-flight batch and anything still queued."""
+    thread = _api_batch_thread
+    if thread is None:
+        return
+    _api_batch_stop.set()
+    thread.join(API_BATCH_DRAIN_TIMEOUT_SECONDS)
+    if thread.is_alive():
+        print(f"⚠️ API batch uploader still busy after {API_BATCH_DRAIN_TIMEOUT_SECONDS}s at exit, "
+              f"{_api_batch_queue.qsize()} payload(s) not sent")
@@ -4,8 +4,12 @@ Queue service for IDByRivoli.
 Session management, job status tracking, logging, and queue item tracking.
 """
 import os
+import sys
 import time
 import uuid
+import queue
+import atexit
+import threading
 
 from flask import session as flask_session
 
@@ -19,6 +23,67 @@ from config import (
 )
 
 
+# =============================================================================
+# CONSOLE OUTPUT
+# =============================================================================
+# Worker and log_message output goes through a SimpleQueue drained by one
+# thread, so workers never wait on the stdout lock; bursts are written with
+# a single write() per ~10 ms.
+
+_console_queue = queue.SimpleQueue()
+_console_thread = None
+_console_thread_lock = threading.Lock()
+
+
+def _format_console_line(item):
+    if type(item) is tuple:
+        message, args = item
+        try:
+            return message % args
+        except Exception:
+            return f'{message} {args!r}'
+    return item
+
+
+def _drain_console(lines=None):
+    lines = lines or []
+    while True:
+        try:
+            lines.append(_console_queue.get_nowait())
+        except queue.Empty:
+            break
+    if lines:
+        sys.stdout.write('\n'.join(map(_format_console_line, lines)) + '\n')
+        sys.stdout.flush()
+
+
+def _console_loop():
+    while True:
+        first = _console_queue.get()  # Block until there is output
+        time.sleep(0.01)  # Let a burst accumulate
+        try:
+            _drain_console([first])
+        except Exception:
+            pass
+
+
+def console(message, *args):
+    """
+    print() replacement for worker hot paths (written by a background thread).
+    Extra args are %-formatted into message on that thread, not the caller's.
+    """
+    global _console_thread
+    if _console_thread is None:
+        with _console_thread_lock:
+            if _console_thread is None:
+                _console_thread = threading.Thread(target=_console_loop, daemon=True)
+                _console_thread.start()
+    _console_queue.put((message, args) if args else message)
+
+
+atexit.register(_drain_console)
+
+
 # =============================================================================
 # FILE DOWNLOAD LOGGING
 # =============================================================================
@@ -44,6 +109,29 @@ def get_session_id():
     return flask_session['session_id']
 
 
+# Scalar fields of a fresh job status (lists/dicts are created per reset)
+JOB_STATUS_DEFAULTS = {
+    'state': 'idle',
+    'progress': 0,
+    'total_files': 0,
+    'current_file_idx': 0,
+    'current_filename': '',
+    'current_step': '',
+    'error': None,
+}
+
+
+def reset_job_status(status, **overrides):
+    """
+    Reset a job status dict in place (job_status is shared by reference across
+    modules, so it must not be rebound). Results and logs get new lists.
+    """
+    status.update(JOB_STATUS_DEFAULTS)
+    status['results'] = []
+    status['logs'] = []
+    status.update(overrides)
+
+
 def get_job_status(session_id=None):
     """Get job status for a specific session."""
     if session_id is None:
@@ -51,20 +139,13 @@ def get_job_status(session_id=None):
     
     with sessions_lock:
         if session_id not in sessions_status:
-            sessions_status[session_id] = {
-                'state': 'idle', 
-                'progress': 0,
-                'total_files': 0,
-                'current_file_idx': 0,
-                'current_filename': '',
-                'current_step': '',
-                'results': [],
-                'error': None,
-                'logs': [],
+            status = {
                 'session_id': session_id,
                 'failed_files': [],  # Track files that failed processing
                 'retry_count': {}    # Track retry attempts per file
             }
+            reset_job_status(status)
+            sessions_status[session_id] = status
         # Ensure existing sessions have the new fields
         if 'failed_files' not in sessions_status[session_id]:
             sessions_status[session_id]['failed_files'] = []
@@ -79,7 +160,7 @@ job_status = get_job_status('global')
 
 def log_message(message, session_id=None):
     """Adds a message to the job logs and prints it."""
-    print(message)
+    console(message)
     timestamp = time.strftime("%H:%M:%S")
     
     # Log to specific session if provided
@@ -114,17 +195,24 @@ def add_to_queue_tracker(filename, session_id):
 
 
 def update_queue_item(filename, status=None, worker=None, progress=None, step=None):
-    """Update queue item status."""
-    with queue_items_lock:
-        if filename in queue_items:
-            if status:
-                queue_items[filename]['status'] = status
-                # Track when processing started
-                if status == 'processing':
-                    queue_items[filename]['processing_started_at'] = time.time()
-            if worker is not None: queue_items[filename]['worker'] = worker
-            if progress is not None: queue_items[filename]['progress'] = progress
-            if step: queue_items[filename]['step'] = step
+    """
+    Update queue item status.
+    
+    Workers call this on every progress tick, so it does not take queue_items_lock:
+    the entry is looked up with one dict.get() and its fields are set with single
+    assignments, both atomic under the GIL. The lock only guards adding/removing keys.
+    """
+    item = queue_items.get(filename)
+    if item is None:
+        return
+    if status:
+        item['status'] = status
+        # Track when processing started
+        if status == 'processing':
+            item['processing_started_at'] = time.time()
+    if worker is not None: item['worker'] = worker
+    if progress is not None: item['progress'] = progress
+    if step: item['step'] = step
 
 
 def remove_from_queue_tracker(filename):
@@ -143,21 +231,21 @@ def cleanup_stale_processing_items():
     stale_items = []
     
     with queue_items_lock:
-        for filename, info in queue_items.items():
-            if info['status'] == 'processing':
-                started_at = info.get('processing_started_at')
-                if started_at and (current_time - started_at) > MAX_PROCESSING_TIME:
-                    stale_items.append(filename)
+        snapshot = list(queue_items.items())
+    
+    for filename, info in snapshot:
+        if info['status'] == 'processing':
+            started_at = info.get('processing_started_at')
+            if started_at and (current_time - started_at) > MAX_PROCESSING_TIME:
+                stale_items.append((filename, info))
     
-    # Mark stale items as failed (outside lock to avoid deadlock)
-    for filename in stale_items:
+    # Mark stale items as failed
+    for filename, info in stale_items:
         print(f"⚠️ Cleaning up stale processing item: {filename}")
-        with queue_items_lock:
-            if filename in queue_items:
-                session_id = queue_items[filename].get('session_id', 'global')
-                queue_items[filename]['status'] = 'failed'
-                queue_items[filename]['step'] = '❌ Timeout: traitement trop long'
-                queue_items[filename]['worker'] = None
+        session_id = info.get('session_id', 'global')
+        info['status'] = 'failed'
+        info['step'] = '❌ Timeout: traitement trop long'
+        info['worker'] = None
         
         # Add to failed files
         try:
@@ -173,38 +261,99 @@ def get_queue_items_list():
     # First, cleanup any stale items
     cleanup_stale_processing_items()
     
+    # Hold the lock only to copy the key/entry pairs; building the list and
+    # sorting it happen outside so workers adding items are not held up
     with queue_items_lock:
-        items = []
-        processing_count = 0
+        snapshot = list(queue_items.items())
+    
+    # Failed first (for visibility), then processing, then waiting. Items are
+    # distributed into per-status buckets in one pass; each bucket keeps the
+    # dict's insertion order (= enqueue order), so no sort is needed.
+    buckets = {'failed': [], 'processing': [], 'waiting': []}
+    others = []
+    processing_count = 0
+    
+    for filename, info in snapshot:
+        item_data = {
+            'filename': filename,
+            'status': info['status'],
+            'worker': info['worker'],
+            'progress': info['progress'],
+            'step': info['step']
+        }
         
-        for filename, info in queue_items.items():
-            item_data = {
-                'filename': filename,
-                'status': info['status'],
-                'worker': info['worker'],
-                'progress': info['progress'],
-                'step': info['step']
-            }
-            
-            # Safety check: count processing items
-            if info['status'] == 'processing':
-                processing_count += 1
-                # If we have more processing items than workers, something is wrong
-                # Mark excess items as waiting (should not happen with the fixes)
-                if processing_count > config.NUM_WORKERS:
-                    print(f"⚠️ Too many processing items detected! Resetting {filename} to waiting")
-                    info['status'] = 'waiting'
-                    info['worker'] = None
-                    info['processing_started_at'] = None
-                    item_data['status'] = 'waiting'
-                    item_data['worker'] = None
-            
-            items.append(item_data)
+        # Safety check: count processing items
+        if info['status'] == 'processing':
+            processing_count += 1
+            # If we have more processing items than workers, something is wrong
+            # Mark excess items as waiting (should not happen with the fixes)
+            if processing_count > config.NUM_WORKERS:
+                print(f"⚠️ Too many processing items detected! Resetting {filename} to waiting")
+                info['status'] = 'waiting'
+                info['worker'] = None
+                info['processing_started_at'] = None
+                item_data['status'] = 'waiting'
+                item_data['worker'] = None
         
-        # Sort: failed first (for visibility), then processing, then waiting
-        status_order = {'failed': 0, 'processing': 1, 'waiting': 2}
-        items.sort(key=lambda x: (status_order.get(x['status'], 3), x['filename']))
-        return items
+        buckets.get(item_data['status'], others).append(item_data)
+    
+    return buckets['failed'] + buckets['processing'] + buckets['waiting'] + others
+
+
+# =============================================================================
+# UPLOAD ARRIVAL
+# =============================================================================
+
+# {filename: [Event, ...]} - one event per waiting worker, removed by the notifier
+_upload_events = {}
+_upload_events_lock = threading.Lock()
+
+
+def notify_upload_saved(filename):
+    """Wake anyone waiting in wait_for_upload() for this filename (call after the save completes)."""
+    with _upload_events_lock:
+        events = _upload_events.pop(filename, ())
+    for event in events:
+        event.set()
+
+
+def _register_upload_waiter(filename):
+    event = threading.Event()
+    with _upload_events_lock:
+        _upload_events.setdefault(filename, []).append(event)
+    return event
+
+
+def wait_for_upload(filename, candidate_paths, timeout):
+    """
+    Return the first of candidate_paths that exists, waiting up to `timeout`
+    seconds for notify_upload_saved(filename) if none does yet. Returns None on timeout.
+    """
+    for path in candidate_paths:
+        if os.path.exists(path):
+            return path
+    
+    event = _register_upload_waiter(filename)
+    try:
+        # Re-check after registering so a save that landed in between isn't missed
+        deadline = time.monotonic() + timeout
+        while True:
+            for path in candidate_paths:
+                if os.path.exists(path):
+                    return path
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            if event.wait(remaining):
+                # The notifier dropped this event; register again in case the file isn't there
+                event = _register_upload_waiter(filename)
+    finally:
+        with _upload_events_lock:
+            waiters = _upload_events.get(filename)
+            if waiters and event in waiters:
+                waiters.remove(event)
+                if not waiters:
+                    del _upload_events[filename]
 
 
 # =============================================================================
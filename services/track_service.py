@@ -4,18 +4,33 @@ Track processing service for IDByRivoli.
 Demucs device detection, audio separation, edit generation, worker threads.
 """
 import os
+import sys
 import subprocess
 import threading
 import time
 import re
 import gc
+import codecs
+import queue
 import fcntl
-import urllib.parse
+import functools
+import logging
+import logging.handlers
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError
 
+import psutil
 from pydub import AudioSegment
 from mutagen.mp3 import MP3
 from mutagen.id3 import ID3
 
+# Optional: PyTorch (GPU detection, in-process Demucs); the Demucs CLI path works without it
+TORCH_AVAILABLE = False
+try:
+    import torch
+    TORCH_AVAILABLE = True
+except ImportError:
+    torch = None
+
 import config
 from config import (
     BASE_DIR,
@@ -36,6 +51,7 @@ from config import (
     batch_lock,
     MAX_RETRY_ATTEMPTS,
     RETRY_DELAY_SECONDS,
+    UPLOAD_WAIT_TIMEOUT_SECONDS,
 )
 from services.memory_service import (
     get_memory_percent,
@@ -51,6 +67,8 @@ from services.queue_service import (
     remove_from_queue_tracker,
     add_failed_file,
     remove_failed_file,
+    wait_for_upload,
+    console,
 )
 from services.metadata_service import (
     detect_track_type_from_title,
@@ -63,7 +81,36 @@ from services.metadata_service import (
     send_track_info_to_api,
     search_deezer_metadata,
 )
-from utils.file_utils import clean_filename, format_artists, get_parent_label
+from utils.file_utils import clean_filename, format_artists, get_parent_label, quick_quote
+
+
+# Characters that are invalid in file/folder names (stripped from metadata titles)
+_FS_STRIP = str.maketrans('', '', '<>:"/\\|?*')
+
+# ffmpeg volumedetect output (has_vocals)
+_MEAN_VOLUME_RE = re.compile(r'mean_volume:\s*(-?[\d.]+|-inf) dB')
+_MAX_VOLUME_RE = re.compile(r'max_volume:\s*(-?[\d.]+|-inf) dB')
+
+# Raw Demucs subprocess output (run_demucs_with_device)
+_DEMUCS_PERCENT_RE = re.compile(rb'(\d+)%\|')
+_CUDA_OOM_RE = re.compile(rb'CUDA out of memory|OutOfMemoryError')
+_DEMUCS_DEVICE_LINE_RE = re.compile(rb'[^\r\n]*(?:cuda|gpu|cpu)[^\r\n]*', re.IGNORECASE)
+
+
+# =============================================================================
+# DEMUCS OUTPUT LOGGER
+# =============================================================================
+# Non-progress Demucs output goes through a buffered handler; tqdm progress-bar
+# lines ('%|') are parsed into job_status and never echoed to stdout.
+demucs_logger = logging.getLogger('demucs')
+if not demucs_logger.handlers:
+    _demucs_stream_handler = logging.StreamHandler(sys.stdout)
+    _demucs_stream_handler.setFormatter(logging.Formatter('%(message)s'))
+    demucs_logger.addHandler(logging.handlers.MemoryHandler(
+        capacity=64, flushLevel=logging.WARNING, target=_demucs_stream_handler,
+    ))
+    demucs_logger.setLevel(logging.INFO)
+    demucs_logger.propagate = False
 
 
 # =============================================================================
@@ -119,7 +166,8 @@ def get_demucs_device(force_check=False):
         return force_device
     
     try:
-        import torch
+        if not TORCH_AVAILABLE:
+            raise ImportError("torch")
         
         print(f"🔍 GPU Detection:")
         print(f"   PyTorch version: {torch.__version__}")
@@ -181,17 +229,375 @@ def get_demucs_device(force_check=False):
     return 'cpu'
 
 
+_cuda_rechecked = False
+_cuda_recheck_lock = threading.Lock()
+
+
 def ensure_cuda_device():
-    """Re-check CUDA availability (call before processing)."""
-    if config.DEMUCS_DEVICE == 'cpu' and not config.FORCE_DEVICE:
-        # Try again in case CUDA wasn't ready at import time
-        new_device = get_demucs_device(force_check=True)
-        if new_device == 'cuda':
-            config.DEMUCS_DEVICE = new_device
-            print(f"🚀 CUDA now available! Switching from CPU to GPU")
+    """
+    Re-check CUDA availability (call before processing).
+    The re-check (torch probe + nvidia-smi) runs once per process; later calls
+    just return the device chosen then.
+    """
+    global _cuda_rechecked
+    if _cuda_rechecked:
+        return config.DEMUCS_DEVICE
+    
+    with _cuda_recheck_lock:
+        if not _cuda_rechecked:
+            if config.DEMUCS_DEVICE == 'cpu' and not config.FORCE_DEVICE:
+                # Try again in case CUDA wasn't ready at import time
+                new_device = get_demucs_device(force_check=True)
+                if new_device == 'cuda':
+                    config.DEMUCS_DEVICE = new_device
+                    print(f"🚀 CUDA now available! Switching from CPU to GPU")
+            _cuda_rechecked = True
     return config.DEMUCS_DEVICE
 
 
+# =============================================================================
+# IN-PROCESS DEMUCS
+# =============================================================================
+
+DEMUCS_MODEL_NAME = 'htdemucs'
+DEMUCS_SEGMENT = 7      # Max segment size (integer)
+DEMUCS_OVERLAP = 0.1    # Minimal overlap for speed
+
+_demucs_separator = None
+_demucs_separator_device = None
+_demucs_api_unavailable = False
+_demucs_separator_lock = threading.Lock()
+
+
+def get_demucs_separator(jobs=0):
+    """
+    Return a resident demucs.api.Separator for the current device, building it once.
+    Returns None when it cannot be built so callers fall back to the CLI subprocess;
+    only a demucs without demucs.api (< 4.1, see requirements.txt) disables it for good.
+    """
+    global _demucs_separator, _demucs_separator_device, _demucs_api_unavailable
+    
+    device = config.DEMUCS_DEVICE
+    if _demucs_api_unavailable:
+        return None
+    if _demucs_separator is not None and _demucs_separator_device == device:
+        return _demucs_separator
+    
+    with _demucs_separator_lock:
+        if _demucs_separator is not None and _demucs_separator_device == device:
+            return _demucs_separator
+        try:
+            from demucs.api import Separator
+            
+            if device == 'cuda':
+                torch.backends.cudnn.benchmark = True
+            
+            _demucs_separator = Separator(
+                model=DEMUCS_MODEL_NAME,
+                device=device,
+                segment=DEMUCS_SEGMENT,
+                overlap=DEMUCS_OVERLAP,
+                jobs=jobs,
+                progress=False,
+            )
+            _demucs_separator_device = device
+            print(f"🧠 Demucs model '{DEMUCS_MODEL_NAME}' loaded in-process on {device} (jobs={jobs})")
+        except (ImportError, AttributeError) as e:
+            _demucs_api_unavailable = True
+            print(f"⚠️ demucs.api not available ({e}) - every track will use the demucs CLI subprocess. "
+                  f"Install demucs >= 4.1 (requirements.txt) for the resident model.")
+        except Exception as e:
+            # Possibly transient (e.g. CUDA OOM while loading): try again on the next track
+            print(f"⚠️ Could not load in-process Demucs model: {e} - using demucs CLI subprocess for now")
+    
+    return _demucs_separator
+
+
+# Per-device result of the autocast accuracy check (None = not checked yet)
+_demucs_autocast_ok = {}
+
+
+def _si_sdr(reference, estimate, eps=1e-8):
+    """Scale-invariant SDR (dB) of estimate against reference."""
+    ref = reference.reshape(-1).double()
+    est = estimate.reshape(-1).double()
+    ref = ref - ref.mean()
+    est = est - est.mean()
+    scale = (est @ ref) / (ref @ ref + eps)
+    target = scale * ref
+    noise = est - target
+    return float(10 * ((target @ target + eps) / (noise @ noise + eps)).log10())
+
+
+def _demucs_autocast_dtype():
+    """torch dtype for CUDA autocast, or None when mixed precision is disabled."""
+    if config.DEMUCS_DEVICE != 'cuda':
+        return None
+    if config.DEMUCS_AUTOCAST == 'bf16':
+        return torch.bfloat16
+    if config.DEMUCS_AUTOCAST == 'fp16':
+        return torch.float16
+    return None
+
+
+def _validate_demucs_autocast(separator, origin, dtype, clip_seconds=10):
+    """
+    Compare mixture-reconstruction SI-SDR of a short clip under autocast vs FP32.
+    Mixed precision is kept only if it loses at most DEMUCS_AUTOCAST_MAX_DRIFT_DB.
+    """
+    clip = origin[..., :int(clip_seconds * separator.samplerate)]
+    with torch.inference_mode():
+        _, stems_fp32 = separator.separate_tensor(clip, separator.samplerate)
+        with torch.autocast('cuda', dtype=dtype):
+            _, stems_amp = separator.separate_tensor(clip, separator.samplerate)
+    
+    sdr_fp32 = _si_sdr(clip, sum(w.float() for w in stems_fp32.values()))
+    sdr_amp = _si_sdr(clip, sum(w.float() for w in stems_amp.values()))
+    drift = sdr_fp32 - sdr_amp
+    ok = drift <= config.DEMUCS_AUTOCAST_MAX_DRIFT_DB
+    print(f"🎚️ Demucs autocast {config.DEMUCS_AUTOCAST}: SI-SDR fp32={sdr_fp32:.2f}dB, "
+          f"amp={sdr_amp:.2f}dB (drift {drift:.2f}dB) → {'ENABLED' if ok else 'DISABLED, using FP32'}")
+    return ok
+
+
+class DemucsAborted(Exception):
+    """In-process separation stopped by its timeout or memory guard."""
+    def __init__(self, message, returncode):
+        super().__init__(message)
+        self.returncode = returncode  # Same codes as the subprocess path: -1 timeout, -2 OOM
+
+
+class _DemucsGuard:
+    """
+    Timeout/OOM guard for one in-process separation, the counterpart of the
+    subprocess watchdog. The clock starts when the separation actually starts
+    (time spent queued for a batch doesn't count), and apply_model's per-segment
+    callback moves it forward. Aborts are raised from that callback, since a
+    running forward pass can't be killed.
+    """
+    def __init__(self):
+        self.last_progress = None  # None while queued
+        self.abort = None
+    
+    def progress(self):
+        self.last_progress = time.monotonic()
+    
+    def wait(self, future):
+        """Stems from the future; gives up after DEMUCS_TIMEOUT_SECONDS without a finished segment."""
+        while True:
+            try:
+                return future.result(timeout=0.5)
+            except FuturesTimeoutError:
+                pass
+            last_progress = self.last_progress
+            if (self.abort is None and last_progress is not None
+                    and time.monotonic() - last_progress > DEMUCS_TIMEOUT_SECONDS):
+                self.abort = DemucsAborted(f"TIMEOUT: no progress for {DEMUCS_TIMEOUT_SECONDS}s", -1)
+            if self.abort is not None:
+                raise self.abort
+
+
+# Batched inference: worker threads hand their loaded waveform to one batcher
+# thread, which stacks whatever arrived within DEMUCS_BATCH_WINDOW_MS into a
+# [B, channels, samples] tensor and runs the model once for all of them.
+_demucs_batch_queue = queue.Queue()
+_demucs_batch_thread = None
+_demucs_batch_thread_lock = threading.Lock()
+
+
+def _separate_batch(separator, staged, guards):
+    """
+    Separate several staged waveforms (see _stage_waveform) in one apply_model call.
+    On CUDA the whole batch stays on the GPU; stems are returned on the CPU.
+    A guard whose caller gave up is skipped; the pass only stops once every
+    guard has aborted, or for everyone when RAM is critical.
+    """
+    from demucs.apply import apply_model
+    
+    for guard in guards:
+        guard.progress()
+    
+    def on_segment(_info):
+        mem = get_memory_percent()
+        if mem >= MEMORY_CRITICAL_THRESHOLD:
+            abort = DemucsAborted(f"OOM: separation stopped, RAM at {mem:.1f}%", -2)
+            for guard in guards:
+                if guard.abort is None:
+                    guard.abort = abort
+            raise abort
+        live = [guard for guard in guards if guard.abort is None]
+        if not live:
+            raise guards[0].abort
+        for guard in live:
+            guard.progress()
+    
+    device = config.DEMUCS_DEVICE
+    wavs = []
+    if device == 'cuda':
+        compute_stream = torch.cuda.current_stream()
+        for wav, copied, _ in staged:
+            # Wait for the worker's async copy; tell the allocator this stream now uses the block
+            compute_stream.wait_event(copied)
+            wav.record_stream(compute_stream)
+            wavs.append(wav)
+    else:
+        wavs = [wav for wav, _, _ in staged]
+    
+    dtype = _demucs_autocast_dtype()
+    if dtype is not None and device not in _demucs_autocast_ok:
+        _demucs_autocast_ok[device] = _validate_demucs_autocast(separator, wavs[0], dtype)
+    use_autocast = dtype is not None and _demucs_autocast_ok.get(device)
+    
+    # Same per-track normalization as Separator.separate_tensor, then zero-pad to a common length
+    lengths = [wav.shape[-1] for wav in wavs]
+    stats = []
+    batch = torch.zeros(len(wavs), wavs[0].shape[0], max(lengths), device=wavs[0].device)
+    for i, wav in enumerate(wavs):
+        ref = wav.mean(0)
+        mean, std = ref.mean(), ref.std() + 1e-8
+        stats.append((mean, std))
+        batch[i, :, :lengths[i]] = (wav - mean) / std
+    
+    with torch.inference_mode(), torch.autocast('cuda', dtype=dtype or torch.bfloat16, enabled=bool(use_autocast)):
+        out = apply_model(
+            separator.model,
+            batch,
+            segment=DEMUCS_SEGMENT,
+            overlap=DEMUCS_OVERLAP,
+            device=device,
+            progress=False,
+            callback=on_segment,
+        )
+    
+    results = []
+    for i, (mean, std) in enumerate(stats):
+        track_out = (out[i, ..., :lengths[i]].float() * std + mean).cpu()
+        results.append(dict(zip(separator.model.sources, track_out)))
+    return results
+
+
+def _demucs_batch_loop(separator):
+    """Collect pending separations up to DEMUCS_MAX_BATCH per window and run them together."""
+    window = config.DEMUCS_BATCH_WINDOW_MS / 1000.0
+    while True:
+        batch = [_demucs_batch_queue.get()]
+        deadline = time.monotonic() + window
+        while len(batch) < config.DEMUCS_MAX_BATCH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_demucs_batch_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        
+        # Callers that timed out while queued are no longer waiting
+        batch = [item for item in batch if item[1].abort is None]
+        if not batch:
+            continue
+        
+        try:
+            if len(batch) > 1:
+                print(f"🧠 Demucs batch: {len(batch)} tracks in one forward pass")
+            results = _separate_batch(separator, [staged for staged, _, _ in batch], [guard for _, guard, _ in batch])
+            for (_, _, future), stems in zip(batch, results):
+                future.set_result(stems)
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+
+
+def _submit_demucs_batch(separator, staged, guard):
+    """Queue one staged waveform for the batcher thread; returns a Future for its stems."""
+    global _demucs_batch_thread
+    
+    if _demucs_batch_thread is None:
+        with _demucs_batch_thread_lock:
+            if _demucs_batch_thread is None:
+                _demucs_batch_thread = threading.Thread(target=_demucs_batch_loop, args=(separator,), daemon=True)
+                _demucs_batch_thread.start()
+    
+    future = Future()
+    _demucs_batch_queue.put((staged, guard, future))
+    return future
+
+
+def _separate_in_thread(separator, staged, guard):
+    """Separate one staged waveform on its own thread so the caller can watch the guard."""
+    future = Future()
+    
+    def run():
+        try:
+            future.set_result(_separate_batch(separator, [staged], [guard])[0])
+        except BaseException as e:
+            future.set_exception(e)
+    
+    threading.Thread(target=run, daemon=True, name='demucs-separate').start()
+    return future
+
+
+_copy_streams = threading.local()
+
+
+def _stage_waveform(wav):
+    """
+    Start the host-to-device copy of a decoded waveform from the worker thread.
+    The copy runs from pinned memory on the worker's own CUDA stream, so it
+    overlaps with the batch the model is currently computing. Returns
+    (tensor, copy-done event, pinned source); the source is kept alive until
+    the batcher has waited on the event.
+    """
+    if config.DEMUCS_DEVICE != 'cuda':
+        return wav, None, None
+    
+    stream = getattr(_copy_streams, 'stream', None)
+    if stream is None:
+        stream = _copy_streams.stream = torch.cuda.Stream()
+    
+    pinned = wav.pin_memory()
+    with torch.cuda.stream(stream):
+        on_device = pinned.to('cuda', non_blocking=True)
+        copied = torch.cuda.Event()
+        copied.record(stream)
+    return on_device, copied, pinned
+
+
+def _load_audio_for_model(separator, filepath):
+    """Decode a file to a [channels, samples] float tensor at the model's rate (ffmpeg)."""
+    from demucs.audio import AudioFile
+    return AudioFile(filepath).read(streams=0, samplerate=separator.samplerate, channels=separator.audio_channels)
+
+
+def separate_track_in_process(separator, filepath):
+    """
+    Separate one file with the resident model. Writes the same files as
+    `demucs --two-stems=vocals`:
+    OUTPUT_FOLDER/htdemucs/<track>/vocals.wav and no_vocals.wav.
+    Raises DemucsAborted on timeout or critical RAM.
+    """
+    from demucs.api import save_audio
+    
+    track_name = os.path.splitext(os.path.basename(filepath))[0]
+    out_dir = os.path.join(OUTPUT_FOLDER, DEMUCS_MODEL_NAME, track_name)
+    os.makedirs(out_dir, exist_ok=True)
+    
+    # Load in this worker (parallel ffmpeg decode)
+    staged = _stage_waveform(_load_audio_for_model(separator, filepath))
+    guard = _DemucsGuard()
+    if config.DEMUCS_DEVICE == 'cuda' and config.DEMUCS_MAX_BATCH > 1:
+        # Share the GPU pass with other workers
+        stems = guard.wait(_submit_demucs_batch(separator, staged, guard))
+    else:
+        stems = guard.wait(_separate_in_thread(separator, staged, guard))
+    vocals = stems['vocals']
+    no_vocals = sum(wav for name, wav in stems.items() if name != 'vocals')
+    
+    # Stems are intermediates (create_edits re-exports them), so PCM: no LAME encode here, no MP3 decode later
+    save_audio(vocals, os.path.join(out_dir, 'vocals.wav'), samplerate=separator.samplerate)
+    save_audio(no_vocals, os.path.join(out_dir, 'no_vocals.wav'), samplerate=separator.samplerate)
+    return out_dir
+
+
 # =============================================================================
 # EDIT GENERATION
 # =============================================================================
@@ -240,8 +646,7 @@ def create_edits(vocals_path, inst_path, original_path, base_output_path, base_f
     if original_title:
         # Clean the metadata title for use in filename (remove invalid chars)
         metadata_base_name = original_title
-        metadata_base_name = re.sub(r'[<>:"/\\|?*]', '', metadata_base_name)
-        metadata_base_name = metadata_base_name.strip()
+        metadata_base_name = metadata_base_name.translate(_FS_STRIP).strip()
     else:
         metadata_base_name = fallback_name
     
@@ -285,8 +690,8 @@ def create_edits(vocals_path, inst_path, original_path, base_output_path, base_f
         rel_path_wav = f"{subdir}/{out_name_wav}"
         
         # IMPORTANT: safe='/' to NOT encode the slash!
-        mp3_url = f"/download_file?path={urllib.parse.quote(rel_path_mp3, safe='/')}"
-        wav_url = f"/download_file?path={urllib.parse.quote(rel_path_wav, safe='/')}"
+        mp3_url = f"/download_file?path={quick_quote(rel_path_mp3)}"
+        wav_url = f"/download_file?path={quick_quote(rel_path_wav)}"
         
         # VERIFICATION: Check if files actually exist where we expect them
         expected_mp3_path = os.path.join(PROCESSED_FOLDER, rel_path_mp3)
@@ -352,12 +757,27 @@ def create_edits(vocals_path, inst_path, original_path, base_output_path, base_f
         Returns True if vocals detected, False if mostly silence (instrumental track).
         """
         try:
-            vocals_audio = AudioSegment.from_mp3(vocals_file_path)
-            # Calculate RMS (Root Mean Square) level in dBFS
-            rms_db = vocals_audio.dBFS
-            # Calculate peak level
-            peak_db = vocals_audio.max_dBFS
-            del vocals_audio  # Free memory immediately after analysis
+            try:
+                # ffmpeg volumedetect reports mean/peak dB without decoding into Python
+                result = subprocess.run(
+                    ['ffmpeg', '-hide_banner', '-nostats', '-i', vocals_file_path,
+                     '-af', 'volumedetect', '-f', 'null', '-'],
+                    capture_output=True, text=True, timeout=120,
+                )
+                mean_match = _MEAN_VOLUME_RE.search(result.stderr)
+                max_match = _MAX_VOLUME_RE.search(result.stderr)
+                if not mean_match:
+                    raise ValueError(f"volumedetect output not found (code {result.returncode})")
+                rms_db = float(mean_match.group(1))
+                peak_db = float(max_match.group(1)) if max_match else rms_db
+            except Exception as e:
+                print(f"   ⚠️ ffmpeg volumedetect failed ({e}) - falling back to pydub")
+                vocals_audio = AudioSegment.from_wav(vocals_file_path)
+                # Calculate RMS (Root Mean Square) level in dBFS
+                rms_db = vocals_audio.dBFS
+                # Calculate peak level
+                peak_db = vocals_audio.max_dBFS
+                del vocals_audio  # Free memory immediately after analysis
             
             print(f"   🎤 Analyse vocale: RMS={rms_db:.1f}dB, Peak={peak_db:.1f}dB (seuil={threshold_db}dB)")
             
@@ -388,7 +808,7 @@ def create_edits(vocals_path, inst_path, original_path, base_output_path, base_f
     
     # 2. Acapella (Vocals only) - Only if vocals detected
     if vocals_path and os.path.exists(vocals_path) and vocals_detected:
-        vocals = AudioSegment.from_mp3(vocals_path)
+        vocals = AudioSegment.from_wav(vocals_path)
         edits.append(export_edit(vocals, "Acapella"))
         del vocals  # Free memory immediately
         log_message(f"✓ Version Acapella créée")
@@ -399,7 +819,7 @@ def create_edits(vocals_path, inst_path, original_path, base_output_path, base_f
     
     # 3. Instrumental (No vocals) - Always if available
     if inst_path and os.path.exists(inst_path):
-        instrumental = AudioSegment.from_mp3(inst_path)
+        instrumental = AudioSegment.from_wav(inst_path)
         edits.append(export_edit(instrumental, "Instrumental"))
         del instrumental  # Free memory immediately
         log_message(f"✓ Version Instrumentale créée")
@@ -428,6 +848,47 @@ def create_edits(vocals_path, inst_path, original_path, base_output_path, base_f
     return edits
 
 
+@functools.lru_cache(maxsize=None)
+def _compute_batch_jobs(device):
+    """Demucs -j for batch mode; depends only on device and CPU count, so computed once."""
+    # CRITICAL: -j controls CPU threads PER Demucs process
+    # Batch mode runs chunks sequentially (1 Demucs process at a time)
+    # so we can use more jobs here than in parallel worker mode
+    if device == 'cuda':
+        return max(2, CPU_COUNT // 2)
+    return max(1, CPU_COUNT // 2)
+
+
+@functools.lru_cache(maxsize=None)
+def _compute_edit_workers(num_workers):
+    """Edit-generation pool size (each edit loads ~3 audio files, so keep it bounded)."""
+    return max(2, min(num_workers // 2, CPU_COUNT // 2, 8))
+
+
+@functools.lru_cache(maxsize=None)
+def _compute_worker_jobs(device, num_workers):
+    """Demucs -j per worker: CPUs split across the parallel workers (halved again on CPU)."""
+    if device == 'cuda':
+        return max(1, CPU_COUNT // max(num_workers, 1))
+    return max(1, CPU_COUNT // max(num_workers * 2, 1))
+
+
+@functools.lru_cache(maxsize=None)
+def _demucs_cmd_prefix(device, jobs):
+    """demucs_runner.py argv up to the output folder; callers append the input files."""
+    # Use demucs_runner.py wrapper to fix torchaudio/torchcodec compatibility
+    return (
+        'python3', os.path.join(BASE_DIR, 'demucs_runner.py'),
+        '--two-stems=vocals',
+        '-n', DEMUCS_MODEL_NAME,
+        '-j', str(jobs),
+        '--segment', str(DEMUCS_SEGMENT),
+        '--overlap', str(DEMUCS_OVERLAP),
+        '--device', device,
+        '-o', OUTPUT_FOLDER,
+    )
+
+
 def run_demucs_thread(filepaths, original_filenames):
     try:
         job_status['state'] = 'processing'
@@ -437,6 +898,12 @@ def run_demucs_thread(filepaths, original_filenames):
 
         current_file_index = 0
 
+        # Re-check CUDA once per batch (may have become available after startup)
+        ensure_cuda_device()
+        batch_jobs = _compute_batch_jobs(config.DEMUCS_DEVICE)
+        if config.DEMUCS_DEVICE != 'cuda':
+            log_message(f"⚠️ Batch Demucs on CPU with {batch_jobs} job(s) - GPU recommended!")
+
         # Dynamic chunk size: reduce if memory is high
         BATCH_CHUNK_SIZE = 50
         for i in range(0, len(filepaths), BATCH_CHUNK_SIZE):
@@ -449,40 +916,35 @@ def run_demucs_thread(filepaths, original_filenames):
             
             chunk = filepaths[i:i + BATCH_CHUNK_SIZE]
             
-            # Optimized Demucs settings for batch processing (H100 + 240GB RAM)
-            # Re-check CUDA before batch (may have become available after startup)
-            ensure_cuda_device()
-            
-            # CRITICAL: -j controls CPU threads PER Demucs process
-            # Batch mode runs chunks sequentially (1 Demucs process at a time)
-            # so we can use more jobs here than in parallel worker mode
-            if config.DEMUCS_DEVICE == 'cuda':
-                # In batch mode, only 1 Demucs process runs at a time
-                # So we can safely use more CPU threads
-                batch_jobs = max(2, CPU_COUNT // 2)
-            else:
-                batch_jobs = max(1, CPU_COUNT // 2)
-                log_message(f"⚠️ Batch Demucs on CPU with {batch_jobs} job(s) - GPU recommended!")
-            
-            # Use demucs_runner.py wrapper to fix torchaudio/torchcodec compatibility
-            DEMUCS_RUNNER = os.path.join(BASE_DIR, 'demucs_runner.py')
-            command = [
-                'python3', DEMUCS_RUNNER,
-                '--two-stems=vocals',
-                '-n', 'htdemucs',
-                '--mp3',
-                '--mp3-bitrate', '320',
-                '-j', str(batch_jobs),        # Maximum parallelism
-                '--segment', '7',             # Max segment size (integer)
-                '--overlap', '0.1',           # Minimal for speed
-                '--device', config.DEMUCS_DEVICE,    # GPU/CPU auto-detection
-                '-o', OUTPUT_FOLDER
-            ] + chunk
-
             chunk_num = i // 50 + 1
             total_chunks = (len(filepaths) - 1) // 50 + 1
             log_message(f"Démarrage de la séparation IA (Lot {chunk_num}/{total_chunks})...")
             
+            # Preferred path: resident in-process model (no per-chunk Python/torch/CUDA cold start)
+            separator = get_demucs_separator(batch_jobs)
+            if separator is not None:
+                chunk_start_index = current_file_index
+                chunk_started_at = time.perf_counter()
+                try:
+                    for fp in chunk:
+                        filename_found = os.path.basename(fp)
+                        job_status['current_filename'] = filename_found
+                        log_message(f"Séparation en cours : {filename_found}")
+                        current_file_index += 1
+                        job_status['current_file_idx'] = current_file_index
+                        job_status['progress'] = int((current_file_index - 1) * 50 / len(filepaths))
+                        job_status['current_step'] = f"Séparation IA (Lot {chunk_num}/{total_chunks})"
+                        separate_track_in_process(separator, fp)
+                    print(f"⏱️ Séparation IA lot {chunk_num}/{total_chunks}: {time.perf_counter() - chunk_started_at:.1f}s")
+                    force_garbage_collect(f"Batch chunk {chunk_num}/{total_chunks}")
+                    continue
+                except Exception as e:
+                    # Fall back to the CLI for this chunk
+                    print(f"⚠️ In-process Demucs failed ({e}) - falling back to subprocess for lot {chunk_num}")
+                    current_file_index = chunk_start_index
+            
+            command = [*_demucs_cmd_prefix(config.DEMUCS_DEVICE, batch_jobs), *chunk]
+
             process = subprocess.Popen(
                 command, 
                 stdout=subprocess.PIPE, 
@@ -494,10 +956,12 @@ def run_demucs_thread(filepaths, original_filenames):
 
             current_chunk_base = i
             last_output_time = time.time()
+            chunk_started_at = time.perf_counter()
 
             for line in process.stdout:
                 last_output_time = time.time()
-                print(line, end='')
+                if "%|" not in line:
+                    demucs_logger.info(line.rstrip())
                 
                 if "Separating track" in line:
                     try:
@@ -534,6 +998,9 @@ def run_demucs_thread(filepaths, original_filenames):
                         pass
             
             process.wait()
+            for handler in demucs_logger.handlers:
+                handler.flush()
+            print(f"⏱️ Séparation IA lot {chunk_num}/{total_chunks}: {time.perf_counter() - chunk_started_at:.1f}s")
             
             # Force GC between chunks to free memory
             force_garbage_collect(f"Batch chunk {chunk_num}/{total_chunks}")
@@ -560,13 +1027,13 @@ def run_demucs_thread(filepaths, original_filenames):
             log_message(f"🔄 Création des edits pour : {filename}")
             
             source_dir = os.path.join(OUTPUT_FOLDER, 'htdemucs', track_name)
-            inst_path = os.path.join(source_dir, 'no_vocals.mp3')
-            vocals_path = os.path.join(source_dir, 'vocals.mp3')
+            inst_path = os.path.join(source_dir, 'no_vocals.wav')
+            vocals_path = os.path.join(source_dir, 'vocals.wav')
             
             if os.path.exists(inst_path) and os.path.exists(vocals_path):
                 clean_name, _ = clean_filename(filename)
+                # create_edits creates the (metadata-title based) output folder itself
                 track_output_dir = os.path.join(PROCESSED_FOLDER, clean_name)
-                os.makedirs(track_output_dir, exist_ok=True)
                 
                 edits = create_edits(vocals_path, inst_path, filepath, track_output_dir, filename)
                 
@@ -583,7 +1050,7 @@ def run_demucs_thread(filepaths, original_filenames):
         
         # Process edits in parallel using ThreadPoolExecutor
         # Limit workers to avoid memory overload (each edit loads ~3 audio files)
-        edit_workers = max(2, min(config.NUM_WORKERS // 2, CPU_COUNT // 2, 8))
+        edit_workers = _compute_edit_workers(config.NUM_WORKERS)
         print(f"🚀 Génération des edits avec {edit_workers} workers parallèles [RAM: {get_memory_percent():.1f}%]")
         
         from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -642,8 +1109,7 @@ def process_track_without_separation(filepath, filename, track_type, session_id=
         fallback_name, _ = clean_filename(filename)
         if original_title:
             metadata_base_name = original_title
-            metadata_base_name = re.sub(r'[<>:"/\\|?*]', '', metadata_base_name)
-            metadata_base_name = metadata_base_name.strip()
+            metadata_base_name = metadata_base_name.translate(_FS_STRIP).strip()
         else:
             metadata_base_name = fallback_name
         
@@ -717,8 +1183,8 @@ def process_track_without_separation(filepath, filename, track_type, session_id=
         rel_path_mp3 = f"{metadata_base_name}/{out_name_mp3}"
         rel_path_wav = f"{metadata_base_name}/{out_name_wav}"
         
-        mp3_url = f"/download_file?path={urllib.parse.quote(rel_path_mp3, safe='/')}"
-        wav_url = f"/download_file?path={urllib.parse.quote(rel_path_wav, safe='/')}"
+        mp3_url = f"/download_file?path={quick_quote(rel_path_mp3)}"
+        wav_url = f"/download_file?path={quick_quote(rel_path_wav)}"
         
         # Log URLs
         base_url = config.CURRENT_HOST_URL if config.CURRENT_HOST_URL else "http://localhost:8888"
@@ -876,44 +1342,37 @@ def process_single_track(filepath, filename, session_id='global', worker_id=None
                 device_emoji = "🚀 GPU" if device == 'cuda' else "💻 CPU"
                 log_message(f"🎵 Séparation vocale/instrumentale ({device_emoji})...")
                 
+                # NUM_WORKERS can change at runtime (GPU autoscaler), so it is part of the key
+                jobs = _compute_worker_jobs(device, config.NUM_WORKERS)
                 if device == 'cuda':
-                    jobs = max(1, CPU_COUNT // max(config.NUM_WORKERS, 1))
                     log_message(f"🚀 GPU mode: {jobs} job(s) per worker × {config.NUM_WORKERS} workers = {jobs * config.NUM_WORKERS} total CPU threads (CPUs: {CPU_COUNT})")
                 else:
-                    jobs = max(1, CPU_COUNT // max(config.NUM_WORKERS * 2, 1))
                     log_message(f"⚠️ CPU mode: {jobs} job(s) per worker × {config.NUM_WORKERS} workers")
                 
-                # Use demucs_runner.py wrapper to fix torchaudio/torchcodec compatibility
-                DEMUCS_RUNNER = os.path.join(BASE_DIR, 'demucs_runner.py')
-                cmd = [
-                    'python3', DEMUCS_RUNNER,
-                    '--two-stems=vocals',
-                    '-n', 'htdemucs',
-                    '--mp3',
-                    '--mp3-bitrate', '320',
-                    '-j', str(jobs),
-                    '--segment', '7',              # Max segment size (integer)
-                    '--overlap', '0.1',            # Minimal overlap for speed
-                    '--device', device,
-                    '-o', OUTPUT_FOLDER,
-                    filepath
-                ]
+                cmd = [*_demucs_cmd_prefix(device, jobs), filepath]
                 
                 # Log the exact command for debugging
                 cmd_str = ' '.join(cmd)
                 print(f"🔧 DEMUCS COMMAND: {cmd_str}")
                 log_message(f"🔧 Device: {device}, Jobs: {jobs}")
                 
+                # Reuse the in-process autocast decision (validated against FP32 there)
+                env = None
+                if device == 'cuda' and _demucs_autocast_ok.get('cuda') and _demucs_autocast_dtype() is not None:
+                    env = dict(os.environ, DEMUCS_RUNNER_AUTOCAST=config.DEMUCS_AUTOCAST)
+                
                 proc = subprocess.Popen(
                     cmd,
                     stdout=subprocess.PIPE,
                     stderr=subprocess.STDOUT,
-                    text=True,
-                    bufsize=1,
-                    universal_newlines=True
+                    bufsize=0,
+                    env=env
                 )
                 
-                output_lines = []
+                # Output is read as raw chunks: tqdm redraws with '\r', so one read can
+                # hold several progress updates and only the last percentage matters
+                output_chunks = []
+                decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
                 last_output_time = time.time()
                 
                 # Make stdout non-blocking for timeout support
@@ -921,6 +1380,15 @@ def process_single_track(filepath, filename, session_id='global', worker_id=None
                 fl = fcntl.fcntl(fd, fcntl.F_GETFL)
                 fcntl.fcntl(fd, fcntl.F_SETFL, fl | os.O_NONBLOCK)
                 
+                def echo_output(chunk):
+                    # Through the console writer thread, not a blocking print on this worker
+                    text = decoder.decode(chunk).rstrip('\n')
+                    if text:
+                        console(text)
+                
+                def collected_lines():
+                    return b''.join(output_chunks).decode('utf-8', errors='replace').splitlines(True)
+                
                 while proc.poll() is None:
                     # Check for timeout (no output for DEMUCS_TIMEOUT_SECONDS)
                     elapsed_since_output = time.time() - last_output_time
@@ -928,6 +1396,7 @@ def process_single_track(filepath, filename, session_id='global', worker_id=None
                         print(f"🔴 DEMUCS TIMEOUT: No output for {DEMUCS_TIMEOUT_SECONDS}s - killing process {proc.pid}")
                         proc.kill()
                         proc.wait()
+                        output_lines = collected_lines()
                         output_lines.append(f"TIMEOUT: Process killed after {DEMUCS_TIMEOUT_SECONDS}s of no output\n")
                         return -1, output_lines
                     
@@ -938,58 +1407,77 @@ def process_single_track(filepath, filename, session_id='global', worker_id=None
                         proc.kill()
                         proc.wait()
                         force_garbage_collect("Demucs killed due to memory")
+                        output_lines = collected_lines()
                         output_lines.append(f"OOM: Process killed, RAM at {mem:.1f}%\n")
                         return -2, output_lines
                     
                     # Try to read available output
                     try:
-                        line = proc.stdout.readline()
-                        if line:
-                            last_output_time = time.time()
-                            print(line, end='')
-                            output_lines.append(line)
-                            
-                            # Check for CUDA/GPU related messages
-                            line_lower = line.lower()
-                            if 'cuda' in line_lower or 'gpu' in line_lower or 'cpu' in line_lower:
-                                log_message(f"🔍 Demucs: {line.strip()}")
-                            
-                            if "%|" in line:
-                                try:
-                                    parts = line.split('%|')
-                                    if len(parts) > 0:
-                                        percent_part = parts[0].strip()
-                                        p_match = re.search(r'(\d+)$', percent_part)
-                                        if p_match:
-                                            track_percent = int(p_match.group(1))
-                                            current_status['progress'] = int(track_percent * 0.7)
-                                            update_queue_item(filename, progress=int(track_percent * 0.7), step=f'Séparation IA {track_percent}%{retry_label}')
-                                except:
-                                    pass
-                        else:
-                            time.sleep(0.5)  # Brief sleep when no output available
-                    except (IOError, OSError):
-                        time.sleep(0.5)  # No data available yet
+                        chunk = os.read(fd, 65536)
+                    except OSError:
+                        time.sleep(0.5)  # No data available yet (EAGAIN)
+                        continue
+                    
+                    if not chunk:
+                        time.sleep(0.5)  # Brief sleep when no output available
+                        continue
+                    
+                    last_output_time = time.time()
+                    output_chunks.append(chunk)
+                    echo_output(chunk)
+                    
+                    # Check for CUDA/GPU related messages
+                    for device_line in _DEMUCS_DEVICE_LINE_RE.findall(chunk):
+                        log_message(f"🔍 Demucs: {device_line.decode('utf-8', errors='replace').strip()}")
+                    
+                    percents = _DEMUCS_PERCENT_RE.findall(chunk)
+                    if percents:
+                        track_percent = int(percents[-1])
+                        current_status['progress'] = int(track_percent * 0.7)
+                        update_queue_item(filename, progress=int(track_percent * 0.7), step=f'Séparation IA {track_percent}%{retry_label}')
                 
                 # Read any remaining output after process ends
                 try:
-                    remaining = proc.stdout.read()
-                    if remaining:
-                        for line in remaining.splitlines(True):
-                            print(line, end='')
-                            output_lines.append(line)
-                except:
+                    while True:
+                        chunk = os.read(fd, 65536)
+                        if not chunk:
+                            break
+                        output_chunks.append(chunk)
+                        echo_output(chunk)
+                except OSError:
                     pass
                 
+                if device == 'cuda' and _CUDA_OOM_RE.search(b''.join(output_chunks)):
+                    _note_subprocess_gpu_oom()
+                
+                output_lines = collected_lines()
                 return proc.returncode, output_lines
             
-            # Try with detected device first
-            returncode, demucs_output = run_demucs_with_device(config.DEMUCS_DEVICE)
+            # Preferred path: shared resident model (no per-track Python/torch/CUDA cold start)
+            returncode, demucs_output = None, []
+            separator = get_demucs_separator(max(1, CPU_COUNT // max(config.NUM_WORKERS, 1)))
+            if separator is not None:
+                update_queue_item(filename, progress=10, step=f'Séparation IA ({config.DEMUCS_DEVICE})...{retry_label}')
+                try:
+                    separate_track_in_process(separator, filepath)
+                    returncode = 0
+                except DemucsAborted as e:
+                    # Same outcome as a killed subprocess: retry later, no CLI run under the same pressure
+                    log_message(f"🔴 Demucs in-process interrompu: {e}")
+                    force_garbage_collect("Demucs in-process aborted")
+                    returncode, demucs_output = e.returncode, [f"{e}\n"]
+                except Exception as e:
+                    log_message(f"⚠️ Demucs in-process échoué ({e}) - fallback subprocess...")
+                    force_garbage_collect("Demucs in-process failure")
             
-            # If GPU failed, fallback to CPU
-            if returncode != 0 and config.DEMUCS_DEVICE == 'cuda':
-                log_message(f"⚠️ GPU échoué, fallback vers CPU...")
-                returncode, demucs_output = run_demucs_with_device('cpu')
+            if returncode is None:
+                # Try with detected device first
+                returncode, demucs_output = run_demucs_with_device(config.DEMUCS_DEVICE)
+                
+                # If GPU failed, fallback to CPU
+                if returncode != 0 and config.DEMUCS_DEVICE == 'cuda':
+                    log_message(f"⚠️ GPU échoué, fallback vers CPU...")
+                    returncode, demucs_output = run_demucs_with_device('cpu')
             
             if returncode != 0:
                 error_lines = ''.join(demucs_output[-20:])
@@ -1011,13 +1499,13 @@ def process_single_track(filepath, filename, session_id='global', worker_id=None
             update_queue_item(filename, progress=70, step=f'Export MP3/WAV...{retry_label}')
             
             clean_name, _ = clean_filename(filename)
+            # create_edits creates the (metadata-title based) output folder itself
             track_output_dir = os.path.join(PROCESSED_FOLDER, clean_name)
-            os.makedirs(track_output_dir, exist_ok=True)
             
             # Get separated files
             source_dir = os.path.join(OUTPUT_FOLDER, 'htdemucs', track_name)
-            inst_path = os.path.join(source_dir, 'no_vocals.mp3')
-            vocals_path = os.path.join(source_dir, 'vocals.mp3')
+            inst_path = os.path.join(source_dir, 'no_vocals.wav')
+            vocals_path = os.path.join(source_dir, 'vocals.wav')
             
             # Check if separated files exist with retry
             files_found = False
@@ -1108,17 +1596,32 @@ def process_single_track(filepath, filename, session_id='global', worker_id=None
 # GIT INFO
 # =============================================================================
 
+GIT_DIR = os.path.join(BASE_DIR, '.git')
+GIT_TIMEOUT_SECONDS = 2
+
+
+@functools.lru_cache(maxsize=1)
 def get_git_info():
+    """Version string from git; commit info is fixed for the process lifetime, so cached."""
+    # Baked in at image build time (the Docker context has no .git)
+    app_version = os.environ.get('APP_VERSION')
+    if app_version:
+        return app_version
+    # No repository (e.g. Docker image without .git): don't spawn git just to fail
+    if not os.path.exists(GIT_DIR):
+        return "Dev Version"
     try:
-        # Get hash
-        hash_output = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD']).strip().decode('utf-8')
-        # Get date
-        date_output = subprocess.check_output(['git', 'log', '-1', '--format=%cd', '--date=format:%a %b %d %H:%M']).strip().decode('utf-8')
-        
-        count = subprocess.check_output(['git', 'rev-list', '--count', 'HEAD']).strip().decode('utf-8')
+        def run_git(*args):
+            return subprocess.check_output(
+                ['git', *args], cwd=BASE_DIR, timeout=GIT_TIMEOUT_SECONDS, stderr=subprocess.DEVNULL,
+            ).strip().decode('utf-8')
         
+        # Short hash + date in one call (NUL-separated)
+        hash_output, date_output = run_git('log', '-1', '--format=%h%x00%cd', '--date=format:%a %b %d %H:%M').split('\x00', 1)
+        count = run_git('rev-list', '--count', '--first-parent', 'HEAD')
         return f"v0.{count} ({hash_output}) - {date_output}"
-    except:
+    except (subprocess.SubprocessError, OSError, ValueError) as e:
+        print(f"⚠️ git version lookup failed: {e}")
         return "Dev Version"
 
 
@@ -1128,15 +1631,12 @@ def get_git_info():
 
 def get_optimal_workers():
     """Calculate optimal workers based on available resources."""
-    import psutil
-    
     # Get system RAM
     ram_gb = psutil.virtual_memory().total / (1024**3)
     print(f"💾 System RAM: {ram_gb:.0f}GB")
     
     try:
-        import torch
-        if torch.cuda.is_available():
+        if TORCH_AVAILABLE and torch.cuda.is_available():
             gpu_mem_gb = torch.cuda.get_device_properties(0).total_memory / (1024**3)
             gpu_name = torch.cuda.get_device_name(0)
             
@@ -1156,6 +1656,16 @@ def get_optimal_workers():
                 num_workers = 2
                 print(f"🚀 GPU ({gpu_mem_gb:.0f}GB): {num_workers} parallel workers")
             
+            # Worker threads share one resident model, so what limits them is the
+            # activation memory each concurrent stream needs in the VRAM that is
+            # actually free (other processes may hold part of the card)
+            free_bytes, _ = torch.cuda.mem_get_info(0)
+            free_gb = free_bytes / (1024**3)
+            headroom_workers = max(1, int(free_gb // config.DEMUCS_VRAM_PER_WORKER_GB))
+            if headroom_workers < num_workers:
+                print(f"⚠️ Only {free_gb:.0f}GB VRAM free: limiting to {headroom_workers} workers")
+                num_workers = headroom_workers
+            
             return num_workers
     except Exception as e:
         print(f"⚠️ GPU detection error: {e}")
@@ -1168,6 +1678,122 @@ def get_optimal_workers():
     return cpu_workers
 
 
+# =============================================================================
+# GPU WORKER AUTOSCALING
+# =============================================================================
+
+def _gpu_utilization_percent():
+    """Current GPU utilization (%) via NVML, or nvidia-smi when pynvml is missing."""
+    try:
+        return torch.cuda.utilization(0)
+    except Exception:
+        result = subprocess.run(
+            ['nvidia-smi', '--query-gpu=utilization.gpu', '--format=csv,noheader,nounits', '-i', '0'],
+            capture_output=True, text=True, timeout=5
+        )
+        return int(result.stdout.strip().splitlines()[0])
+
+
+def load_tuned_worker_count():
+    """Worker count the autoscaler converged to on a previous run, or None."""
+    import json
+    try:
+        with open(config.WORKER_TUNING_FILE) as f:
+            return int(json.load(f)['num_workers'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _save_tuned_worker_count(num_workers):
+    import json
+    try:
+        with open(config.WORKER_TUNING_FILE, 'w') as f:
+            json.dump({'num_workers': num_workers, 'updated_at': time.time()}, f)
+    except OSError as e:
+        print(f"⚠️ Could not save worker tuning: {e}")
+
+
+# CUDA OOMs reported by Demucs subprocesses (torch's num_ooms only sees this process)
+_subprocess_gpu_ooms = 0
+
+# Autoscaler shrink requests: this many workers exit after their current track
+_workers_to_stop = 0
+_workers_to_stop_lock = threading.Lock()
+
+
+def _note_subprocess_gpu_oom():
+    global _subprocess_gpu_ooms
+    with _workers_to_stop_lock:
+        _subprocess_gpu_ooms += 1
+
+
+def _gpu_oom_count():
+    return _subprocess_gpu_ooms + torch.cuda.memory_stats(0).get('num_ooms', 0)
+
+
+def _claim_worker_stop():
+    """True if the calling worker should exit (consumes one shrink request)."""
+    global _workers_to_stop
+    if not _workers_to_stop:
+        return False
+    with _workers_to_stop_lock:
+        if _workers_to_stop:
+            _workers_to_stop -= 1
+            return True
+    return False
+
+
+def gpu_worker_autoscaler(start_worker, max_workers):
+    """
+    Adjust the worker pool from measured GPU load, one step per window:
+    - add a worker while there is a backlog, mean utilization is below
+      GPU_AUTOSCALE_TARGET_UTIL and more than GPU_AUTOSCALE_MIN_FREE_GB of VRAM is free
+    - remove one when a CUDA OOM happened during the window (in-process or in
+      a Demucs subprocess); the next worker to finish its track exits
+    The converged count is saved and used as the starting point on next start.
+    """
+    global _workers_to_stop
+    window = config.GPU_AUTOSCALE_WINDOW_SECONDS
+    last_ooms = _gpu_oom_count()
+    
+    while True:
+        samples = []
+        for _ in range(window):
+            time.sleep(1)
+            try:
+                samples.append(_gpu_utilization_percent())
+            except Exception:
+                pass
+        if not samples:
+            print("⚠️ GPU autoscaler: utilization unavailable - stopping")
+            return
+        
+        util = sum(samples) / len(samples)
+        free_gb = torch.cuda.mem_get_info(0)[0] / (1024**3)
+        ooms = _gpu_oom_count()
+        num_workers = config.NUM_WORKERS
+        
+        if ooms > last_ooms and num_workers > 1:
+            config.NUM_WORKERS = num_workers - 1
+            with _workers_to_stop_lock:
+                _workers_to_stop += 1
+            print(f"📉 GPU autoscaler: CUDA OOM → {config.NUM_WORKERS} workers")
+            _save_tuned_worker_count(config.NUM_WORKERS)
+        elif (num_workers < max_workers and not track_queue.empty()
+              and util < config.GPU_AUTOSCALE_TARGET_UTIL
+              and free_gb > config.GPU_AUTOSCALE_MIN_FREE_GB):
+            config.NUM_WORKERS = num_workers + 1
+            with _workers_to_stop_lock:
+                cancelled_stop = _workers_to_stop > 0
+                if cancelled_stop:
+                    _workers_to_stop -= 1  # That worker hasn't exited yet: keep it instead
+            if not cancelled_stop:
+                start_worker()
+            print(f"📈 GPU autoscaler: util {util:.0f}%, {free_gb:.0f}GB free → {config.NUM_WORKERS} workers")
+            _save_tuned_worker_count(config.NUM_WORKERS)
+        last_ooms = ooms
+
+
 # =============================================================================
 # BATCH TRACKING
 # =============================================================================
@@ -1196,6 +1822,40 @@ def wait_for_batch_resume():
 # WORKER THREAD
 # =============================================================================
 
+_sessions_since_drain = set()
+_task_finished = threading.Event()
+
+
+def _note_task_finished(session_id):
+    """Record that a session's task completed so queue_reaper() can idle it once the queue drains."""
+    _sessions_since_drain.add(session_id)
+    _task_finished.set()
+
+
+def queue_reaper():
+    """
+    Single thread that moves sessions to idle once every queued task is done.
+    Workers only report completions; the idle transition happens here after
+    track_queue.join(), so it fires once per drain instead of racing per task.
+    """
+    while True:
+        _task_finished.wait()
+        _task_finished.clear()
+        track_queue.join()
+        
+        while _sessions_since_drain:
+            session_id = _sessions_since_drain.pop()
+            current_status = get_job_status(session_id)
+            current_status['state'] = 'idle'
+            failed_count = len(current_status.get('failed_files', []))
+            if failed_count > 0:
+                current_status['current_step'] = f'⚠️ {failed_count} fichier(s) en échec - Cliquer "Réessayer" pour relancer'
+            else:
+                current_status['current_step'] = 'Prêt pour de nouveaux fichiers'
+            current_status['current_filename'] = ''
+            log_message(f"✅ File d'attente terminée" + (f" - {failed_count} échec(s)" if failed_count > 0 else " - Tous les fichiers traités avec succès"), session_id)
+
+
 def worker(worker_id):
     while True:
         current_filename = None  # Track current file for cleanup on exception
@@ -1204,10 +1864,13 @@ def worker(worker_id):
             # Wait if batch is paused
             wait_for_batch_resume()
             
-            queue_item = track_queue.get()
-            if queue_item is None:
+            # Autoscaler shrink: exit between tracks, not behind the backlog
+            if _claim_worker_stop():
+                console(f"📉 Worker {worker_id} stopped (GPU autoscaler)")
                 break
             
+            queue_item = track_queue.get(worker_id - 1)
+            
             # Handle both old format (string) and new format (dict with session_id)
             if isinstance(queue_item, dict):
                 filename = queue_item['filename']
@@ -1229,31 +1892,15 @@ def worker(worker_id):
             session_upload_folder = os.path.join(UPLOAD_FOLDER, session_id)
             filepath = os.path.join(session_upload_folder, filename)
             
-            # Fallback to global folder if not found in session folder
-            if not os.path.exists(filepath):
-                filepath = os.path.join(UPLOAD_FOLDER, filename)
-            
-            # Check if file exists with retries (handles race condition with upload)
-            file_found = os.path.exists(filepath)
-            if not file_found:
-                # Retry up to 5 times with 1 second delay (file might still be uploading)
-                for retry in range(5):
-                    time.sleep(1)
-                    # Re-check both locations
-                    filepath = os.path.join(session_upload_folder, filename)
-                    if os.path.exists(filepath):
-                        file_found = True
-                        print(f"   ✅ File found after {retry + 1} retry(ies): {filename}")
-                        break
-                    filepath = os.path.join(UPLOAD_FOLDER, filename)
-                    if os.path.exists(filepath):
-                        file_found = True
-                        print(f"   ✅ File found in global folder after {retry + 1} retry(ies): {filename}")
-                        break
-                    print(f"   ⏳ Waiting for file ({retry + 1}/5): {filename}")
+            # Session folder first, then the global folder; if neither has it yet the
+            # upload may still be completing, so wait for its save notification
+            candidate_paths = (filepath, os.path.join(UPLOAD_FOLDER, filename))
+            found_path = wait_for_upload(filename, candidate_paths, UPLOAD_WAIT_TIMEOUT_SECONDS)
+            file_found = found_path is not None
+            filepath = found_path or candidate_paths[1]
             
             if not file_found:
-                error_msg = f"Fichier introuvable après 5 tentatives: {filename}"
+                error_msg = f"Fichier introuvable après {UPLOAD_WAIT_TIMEOUT_SECONDS}s d'attente: {filename}"
                 log_message(f"⚠️ {error_msg}", session_id)
                 log_message(f"   Chemins vérifiés: {session_upload_folder}/{filename} et {UPLOAD_FOLDER}/{filename}", session_id)
                 
@@ -1263,11 +1910,8 @@ def worker(worker_id):
                 
                 # Don't remove from tracker - keep showing as failed
                 track_queue.task_done()
+                _note_task_finished(session_id)
                 current_filename = None  # Clear so exception handler doesn't double-process
-                if track_queue.empty():
-                    current_status['state'] = 'idle'
-                    current_status['current_step'] = ''
-                    current_status['current_filename'] = ''
                 continue
 
             # Update tracker: now processing
@@ -1276,7 +1920,7 @@ def worker(worker_id):
             # MEMORY SAFETY: Wait if RAM is too high before starting new track
             wait_for_memory_available(worker_id)
             
-            print(f"🔄 Worker {worker_id} traite: {filename}" + (" (RETRY)" if is_retry else "") + f" [RAM: {get_memory_percent():.1f}%]")
+            console(f"🔄 Worker {worker_id} traite: {filename}" + (" (RETRY)" if is_retry else "") + f" [RAM: {get_memory_percent():.1f}%]")
             success, error_msg = process_single_track(filepath, filename, session_id, worker_id, is_retry)
             
             # Handle result
@@ -1293,30 +1937,19 @@ def worker(worker_id):
                 log_message(f"❌ [{session_id}] Worker {worker_id}: Échec pour {filename}: {error_msg}", session_id)
             
             track_queue.task_done()
+            _note_task_finished(session_id)
             current_filename = None  # Clear so exception handler doesn't double-process
             
             # MEMORY SAFETY: Force garbage collection + clear GPU cache after each track
             force_garbage_collect(f"Worker {worker_id} after {filename}")
             try:
-                import torch
-                if torch.cuda.is_available():
+                if TORCH_AVAILABLE and torch.cuda.is_available():
                     torch.cuda.empty_cache()
             except Exception:
                 pass
             
-            # Reset state to idle if queue is empty
-            if track_queue.empty():
-                current_status['state'] = 'idle'
-                failed_count = len(current_status.get('failed_files', []))
-                if failed_count > 0:
-                    current_status['current_step'] = f'⚠️ {failed_count} fichier(s) en échec - Cliquer "Réessayer" pour relancer'
-                else:
-                    current_status['current_step'] = 'Prêt pour de nouveaux fichiers'
-                current_status['current_filename'] = ''
-                log_message(f"✅ File d'attente terminée" + (f" - {failed_count} échec(s)" if failed_count > 0 else " - Tous les fichiers traités avec succès"), session_id)
-                
         except Exception as e:
-            print(f"Worker {worker_id} Error: {e}")
+            console(f"Worker {worker_id} Error: {e}")
             import traceback
             traceback.print_exc()
             log_message(f"Erreur Worker {worker_id}: {e}")
@@ -1330,10 +1963,11 @@ def worker(worker_id):
                     update_queue_item(current_filename, status='failed', progress=0, step=f'❌ Crash: {crash_msg}')
                     log_message(f"🔧 [{current_session_id}] Cleaned up crashed item: {current_filename}", current_session_id)
                 except Exception as cleanup_error:
-                    print(f"Worker {worker_id} cleanup error: {cleanup_error}")
+                    console(f"Worker {worker_id} cleanup error: {cleanup_error}")
                 
             # Try to mark task as done to prevent queue deadlock
             try:
                 track_queue.task_done()
+                _note_task_finished(current_session_id)
             except ValueError:
                 pass  # task_done called more times than tasks
@@ -16,6 +16,7 @@ Usage:
     python3 test_parsing.py "/ID 2026/DJ CITY/2022"      # Scan specific folder
     python3 test_parsing.py --local file1.mp3 file2.mp3   # Test filenames only (no Dropbox/DB)
     python3 test_parsing.py --no-deezer "/ID 2026/..."    # Skip Deezer API calls
+    python3 test_parsing.py --self-test                   # Check artist/style parsing (no network)
 """
 
 import re
@@ -505,6 +506,57 @@ def build_track_id(clean_title, artist):
     return tid
 
 
+# (artist string, expected names) for database_service.split_artist_names
+ARTIST_SPLIT_CASES = [
+    ('Akon Ft. John Mamann & Dawty Music', ['Akon', 'John Mamann', 'Dawty Music']),
+    ('A Boogie Wit Da Hoodie & Pnb Rock', ['A Boogie Wit Da Hoodie', 'Pnb Rock']),
+    ('Drake featuring Rihanna', ['Drake', 'Rihanna']),
+    ('Dua Lipa, Angèle', ['Dua Lipa', 'Angèle']),
+    ('Tiësto x Karol G', ['Tiësto', 'Karol G']),
+    ('Gims, feat. Dadju', ['Gims', 'Dadju']),
+    ('Gims & feat. Dadju', ['Gims', 'Dadju']),
+    ('Lil Nas X & Jack Harlow', ['Lil Nas X', 'Jack Harlow']),
+    ('Lil Nas X feat. Billy Ray Cyrus', ['Lil Nas X', 'Billy Ray Cyrus']),
+    ('A x & B', ['A x', 'B']),
+    ('R&B Allstars', ['R&B Allstars']),
+]
+
+# (style string, expected styles) for database_service.parse_styles; expectations
+# are the output of the original remove-longest-first loop, overlapping tokens included
+STYLE_CASES = [
+    ('Hip Hop / R&B', ['hip_hop', 'r&b']),
+    ('hiphop', ['hip_hop']),
+    ('r & b', ['r&b']),
+    ('Reggaeton, Dancehall', ['reggaeton', 'dancehall']),
+    ('trap rap', ['trap', 'rap']),
+    ('pop rock', ['rock', 'pop']),
+    ('punk rock|pop punk', ['rock', 'punk', 'pop']),
+    ('funky house', ['house', 'funk']),
+    ('popunk', ['punk']),
+    ('trapunk', ['punk']),
+    ('rapop', ['rap']),
+    ('hip electronic hop', ['electronic', 'hip_hop']),
+    ('UK Drill / Grime', ['drill']),
+]
+
+
+def run_self_test():
+    from database_service import split_artist_names, parse_styles
+
+    cases = [(split_artist_names, value, expected) for value, expected in ARTIST_SPLIT_CASES]
+    cases += [(parse_styles, value, expected) for value, expected in STYLE_CASES]
+    failures = 0
+    for func, value, expected in cases:
+        got = func(value)
+        if got == expected:
+            print(f"  {C.GREEN}OK{C.END}   {func.__name__}({value!r}) → {got}")
+        else:
+            failures += 1
+            print(f"  {C.RED}FAIL{C.END} {func.__name__}({value!r}) → {got} (expected {expected})")
+    print(f"\n{len(cases) - failures}/{len(cases)} passed")
+    return failures == 0
+
+
 def format_size(size_bytes):
     if size_bytes < 1024 * 1024:
         return f"{size_bytes / 1024:.0f}KB"
@@ -783,6 +835,8 @@ def main():
         elif arg in ('--help', '-h'):
             print(__doc__)
             sys.exit(0)
+        elif arg == '--self-test':
+            sys.exit(0 if run_self_test() else 1)
         else:
             filtered_args.append(arg)
 
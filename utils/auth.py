@@ -0,0 +1,45 @@
+"""
+API key checks for IDByRivoli.
+
+The key can arrive as an `Authorization: Bearer` header, an `api_key` query
+parameter, or an `api_key` field in a JSON body; it is read from the first
+source present and compared in constant time.
+"""
+import hmac
+
+from flask import request
+
+from config import API_KEY_BYTES, AUTH_BEARER_PREFIX, AUTH_BEARER_HEADER
+
+_AUTH_BEARER_HEADER_BYTES = AUTH_BEARER_HEADER.encode('utf-8')
+_AUTH_BEARER_PREFIX_LEN = len(AUTH_BEARER_PREFIX)
+
+
+def extract_api_key():
+    """API key sent with the current request, or None."""
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith(AUTH_BEARER_PREFIX):
+        return auth_header[_AUTH_BEARER_PREFIX_LEN:]
+
+    key = request.args.get('api_key')
+    if key is None and request.is_json:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            key = data.get('api_key')
+    return key
+
+
+def is_valid_api_key(key):
+    """Constant-time comparison against API_KEY."""
+    if not isinstance(key, str) or not key:
+        return False
+    return hmac.compare_digest(key.encode('utf-8'), API_KEY_BYTES)
+
+
+def is_authenticated_request():
+    """True if the current request carries the API key."""
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith(AUTH_BEARER_PREFIX):
+        # Compare the whole header against the precomputed one (no slice)
+        return hmac.compare_digest(auth_header.encode('utf-8'), _AUTH_BEARER_HEADER_BYTES)
+    return is_valid_api_key(extract_api_key())
@@ -4,12 +4,34 @@ File utility functions for IDByRivoli.
 Filename cleaning, artist formatting, label mappings,
 and track-processed detection.
 """
+import io
 import os
 import re
+import threading
+import unicodedata
+import urllib.parse
 
 from config import PROCESSED_FOLDER, pending_downloads, pending_downloads_lock
 
 
+# Characters urllib.parse.quote(..., safe='/') leaves untouched
+_URL_SAFE_PATH_RE = re.compile(r'[A-Za-z0-9_.\-~/]*')
+
+
+def quick_quote(path):
+    """quote(path, safe='/'), skipping the encoder when nothing needs escaping."""
+    if _URL_SAFE_PATH_RE.fullmatch(path):
+        return path
+    return urllib.parse.quote(path, safe='/')
+
+
+def quick_unquote(value):
+    """unquote(value), skipping the decoder when there is no %-escape."""
+    if '%' not in value:
+        return value
+    return urllib.parse.unquote(value)
+
+
 def clean_filename(filename):
     """
     Cleans filename: removes underscores, specific patterns, and unnecessary IDs.
@@ -180,6 +202,81 @@ def get_parent_label(sub_label):
     return sub_label_clean
 
 
+# Directories this process has already created (skips the makedirs syscalls)
+_created_dirs = set()
+_created_dirs_lock = threading.Lock()
+
+
+def ensure_dir(path):
+    """
+    os.makedirs(path, exist_ok=True), done once per path.
+    Code that deletes cached directories must call forget_dirs() afterwards.
+    """
+    if path not in _created_dirs:
+        os.makedirs(path, exist_ok=True)
+        with _created_dirs_lock:
+            _created_dirs.add(path)
+    return path
+
+
+# _remove_tree renames a folder to '<name>.deleting.<id>' before deleting it;
+# a failed delete leaves that folder behind until the janitor sweeps it
+DELETING_MARKER = '.deleting.'
+
+
+def is_being_deleted(name):
+    """True for folder names left by an in-progress or failed _remove_tree."""
+    return DELETING_MARKER in name
+
+
+def forget_dirs(root):
+    """Drop root and everything under it from the ensure_dir() cache."""
+    prefix = os.path.join(root, '')
+    with _created_dirs_lock:
+        _created_dirs.difference_update(
+            [p for p in _created_dirs if p == root or p.startswith(prefix)]
+        )
+
+
+_SENDFILE_CHUNK = 8 * 1024 * 1024
+
+
+def save_upload(file_storage, dst_path):
+    """
+    Save a werkzeug FileStorage to dst_path.
+    Large uploads are already spooled to a temp file by werkzeug, so they are
+    copied in the kernel with os.sendfile instead of 16 KiB read/write pairs;
+    small in-memory uploads go through file.save with a bigger buffer.
+    """
+    stream = file_storage.stream
+    try:
+        src_fd = stream.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        src_fd = None
+
+    if src_fd is None or not hasattr(os, 'sendfile'):
+        file_storage.save(dst_path, buffer_size=1024 * 1024)
+        return
+
+    stream.flush()
+    offset = stream.tell()
+    with open(dst_path, 'wb') as dst:
+        while True:
+            sent = os.sendfile(dst.fileno(), src_fd, offset, _SENDFILE_CHUNK)
+            if sent == 0:
+                break
+            offset += sent
+
+
+def _has_audio_files(folder):
+    """True if folder directly contains an .mp3/.wav (stops at the first one)."""
+    try:
+        with os.scandir(folder) as entries:
+            return any(e.name.endswith(('.mp3', '.wav')) for e in entries)
+    except OSError:
+        return False
+
+
 def is_track_already_processed(filename):
     """
     Check if a track has already been processed.
@@ -193,11 +290,9 @@ def is_track_already_processed(filename):
     
     # Check if track folder exists in PROCESSED_FOLDER
     track_folder = os.path.join(PROCESSED_FOLDER, clean_name)
-    if os.path.exists(track_folder) and os.path.isdir(track_folder):
-        # Check if it has actual files inside (not empty folder)
-        files = [f for f in os.listdir(track_folder) if f.endswith(('.mp3', '.wav'))]
-        if files:
-            return True, track_folder
+    # Check if it has actual files inside (not empty folder)
+    if _has_audio_files(track_folder):
+        return True, track_folder
     
     # Check if track is in pending_downloads
     with pending_downloads_lock:
@@ -207,19 +302,58 @@ def is_track_already_processed(filename):
     return False, None
 
 
+_processed_index = {}
+_processed_index_mtime = None
+_processed_index_lock = threading.Lock()
+
+
+def name_key(name):
+    """Lookup key for on-disk names: NFC-normalized and lowercased (clients may send NFD or other casing)."""
+    return unicodedata.normalize('NFC', name).lower()
+
+
+def get_processed_dir_index():
+    """
+    {name_key(name): actual name} for the track folders in PROCESSED_FOLDER.
+    Rebuilt only when the folder's mtime changes (a subfolder was added or removed),
+    so lookups cost one stat instead of a directory listing.
+    """
+    global _processed_index, _processed_index_mtime
+    try:
+        mtime = os.stat(PROCESSED_FOLDER).st_mtime_ns
+    except OSError:
+        return {}
+    if mtime == _processed_index_mtime:
+        return _processed_index
+    
+    with _processed_index_lock:
+        if mtime != _processed_index_mtime:
+            index = {}
+            with os.scandir(PROCESSED_FOLDER) as entries:
+                for entry in entries:
+                    if entry.is_dir() and not is_being_deleted(entry.name):
+                        index[name_key(entry.name)] = entry.name
+            _processed_index = index
+            _processed_index_mtime = mtime
+    return _processed_index
+
+
+def find_processed_dir(name):
+    """Actual name of the PROCESSED_FOLDER subfolder matching `name` (case/normalization-insensitive), or None."""
+    return get_processed_dir_index().get(name_key(name))
+
+
 def get_already_processed_tracks():
     """Get list of all track names that have already been processed."""
     processed_tracks = set()
     
     # From PROCESSED_FOLDER
     if os.path.exists(PROCESSED_FOLDER):
-        for item in os.listdir(PROCESSED_FOLDER):
-            item_path = os.path.join(PROCESSED_FOLDER, item)
-            if os.path.isdir(item_path):
+        with os.scandir(PROCESSED_FOLDER) as entries:
+            for entry in entries:
                 # Check if it has actual files
-                files = [f for f in os.listdir(item_path) if f.endswith(('.mp3', '.wav'))]
-                if files:
-                    processed_tracks.add(item)
+                if entry.is_dir() and not is_being_deleted(entry.name) and _has_audio_files(entry.path):
+                    processed_tracks.add(entry.name)
     
     # From pending_downloads
     with pending_downloads_lock:
@@ -7,6 +7,7 @@ per-file download status for sequential mode.
 import os
 import time
 import shutil
+import uuid
 
 from config import (
     track_download_status, track_download_status_lock,
@@ -15,6 +16,7 @@ from config import (
     DELETION_DELAY_MINUTES, MAX_PENDING_TRACKS, PENDING_WARNING_THRESHOLD,
     OUTPUT_FOLDER, PROCESSED_FOLDER, SEQUENTIAL_MODE,
 )
+from utils.file_utils import DELETING_MARKER
 
 
 def _log_message(msg):
@@ -26,6 +28,18 @@ def _log_message(msg):
         print(msg)
 
 
+def _remove_tree(path):
+    """
+    Rename the folder aside, then delete it. The rename is atomic, so new requests
+    404 at once instead of seeing a half-deleted track; downloads that already
+    opened a file keep reading it until they finish. If the delete fails, the
+    renamed folder is left for sweep_deleting_leftovers (janitor startup).
+    """
+    doomed = f"{path}{DELETING_MARKER}{uuid.uuid4().hex[:8]}"
+    os.rename(path, doomed)
+    shutil.rmtree(doomed)
+
+
 def register_track_files(track_name, file_list):
     """Register all files for a track that need to be downloaded."""
     with track_download_status_lock:
@@ -111,8 +125,8 @@ def cleanup_track_after_downloads(track_name):
 
 def get_pending_tracks_count():
     """Get the number of tracks pending download confirmation."""
-    with pending_downloads_lock:
-        return len(pending_downloads)
+    # len() of a dict is atomic; no need to queue behind writers for a count
+    return len(pending_downloads)
 
 
 def check_pending_tracks_warning():
@@ -153,19 +167,20 @@ def track_file_for_pending_download(track_name, original_path, num_files=6, file
             'htdemucs_dir': htdemucs_dir,
             'created_at': time.time()
         }
-        
         pending_count = len(pending_downloads)
-        print(f"")
-        print(f"📝 ════════════════════════════════════════════════")
-        print(f"📝 PENDING: Registered '{track_name}'")
-        print(f"📝 Files available: {num_files}")
-        print(f"📝 Original: {original_path}")
-        print(f"📝 Processed dir: {PROCESSED_FOLDER}/{track_name}")
-        print(f"📝 Status: AWAITING download")
-        print(f"📝 Total pending tracks: {pending_count}")
-        if pending_count >= PENDING_WARNING_THRESHOLD:
-            print(f"📝 ⚠️ WARNING: {pending_count} tracks pending (threshold: {PENDING_WARNING_THRESHOLD})")
-        print(f"📝 ════════════════════════════════════════════════")
+    
+    # Logged after releasing the lock so confirm/count readers don't wait on stdout
+    print(f"")
+    print(f"📝 ════════════════════════════════════════════════")
+    print(f"📝 PENDING: Registered '{track_name}'")
+    print(f"📝 Files available: {num_files}")
+    print(f"📝 Original: {original_path}")
+    print(f"📝 Processed dir: {PROCESSED_FOLDER}/{track_name}")
+    print(f"📝 Status: AWAITING download")
+    print(f"📝 Total pending tracks: {pending_count}")
+    if pending_count >= PENDING_WARNING_THRESHOLD:
+        print(f"📝 ⚠️ WARNING: {pending_count} tracks pending (threshold: {PENDING_WARNING_THRESHOLD})")
+    print(f"📝 ════════════════════════════════════════════════")
     
     # SEQUENTIAL MODE: Also register for individual file download tracking
     if SEQUENTIAL_MODE and file_list:
@@ -237,7 +252,7 @@ def confirm_track_download(track_name, add_to_logs=True):
     # Delete processed folder
     if track_info.get('processed_dir') and os.path.exists(track_info['processed_dir']):
         try:
-            shutil.rmtree(track_info['processed_dir'])
+            _remove_tree(track_info['processed_dir'])
             print(f"   🗑️ Deleted processed folder: {track_info['processed_dir']}")
         except Exception as e:
             print(f"   ⚠️ Could not delete processed folder: {e}")
@@ -253,7 +268,7 @@ def confirm_track_download(track_name, add_to_logs=True):
     # Delete htdemucs intermediate folder
     if track_info.get('htdemucs_dir') and os.path.exists(track_info['htdemucs_dir']):
         try:
-            shutil.rmtree(track_info['htdemucs_dir'])
+            _remove_tree(track_info['htdemucs_dir'])
             print(f"   🗑️ Deleted htdemucs folder: {track_info['htdemucs_dir']}")
         except Exception as e:
             print(f"   ⚠️ Could not delete htdemucs folder: {e}")
@@ -308,18 +323,21 @@ def process_scheduled_deletions():
 
 def get_pending_tracks_list():
     """Get list of all pending tracks with their info."""
+    # Hold the lock only for the copy; formatting happens without blocking writers
     with pending_downloads_lock:
-        tracks = []
-        now = time.time()
-        for track_name, info in pending_downloads.items():
-            age_hours = (now - info.get('created_at', now)) / 3600
-            tracks.append({
-                'track_name': track_name,
-                'files_total': info.get('files_total', 0),
-                'created_at': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(info.get('created_at', now))),
-                'age_hours': round(age_hours, 2),
-                'processed_dir': info.get('processed_dir', ''),
-            })
-        # Sort by creation time (oldest first)
-        tracks.sort(key=lambda x: x['age_hours'], reverse=True)
-        return tracks
+        snapshot = list(pending_downloads.items())
+    
+    tracks = []
+    now = time.time()
+    for track_name, info in snapshot:
+        age_hours = (now - info.get('created_at', now)) / 3600
+        tracks.append({
+            'track_name': track_name,
+            'files_total': info.get('files_total', 0),
+            'created_at': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(info.get('created_at', now))),
+            'age_hours': round(age_hours, 2),
+            'processed_dir': info.get('processed_dir', ''),
+        })
+    # Sort by creation time (oldest first)
+    tracks.sort(key=lambda x: x['age_hours'], reverse=True)
+    return tracks
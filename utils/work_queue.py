@@ -0,0 +1,123 @@
+"""
+Work-stealing track queue for IDByRivoli.
+
+Each worker owns a deque and takes its oldest item; when its own deque is
+empty it steals the oldest item from another worker's. Stealing oldest-first
+keeps the queue close to FIFO when there are more deques than live workers
+(autoscaling starts below max_workers). Puts are spread
+round-robin, so workers mostly touch their own deque lock instead of all
+contending on one queue lock. Keeps the queue.Queue surface the app uses
+(put/get/task_done/join/qsize/empty/unfinished_tasks).
+"""
+import itertools
+import threading
+from collections import deque
+
+
+class WorkStealingQueue:
+    def __init__(self, num_shards=1):
+        self._shards = [deque() for _ in range(num_shards)]
+        self._locks = [threading.Lock() for _ in range(num_shards)]
+        self._next_shard = itertools.count()
+
+        # Idle workers sleep here; puts only signal it when someone is waiting
+        self._not_empty = threading.Condition(threading.Lock())
+        self._waiters = 0
+
+        # Same task accounting as queue.Queue (task_done/join)
+        self.all_tasks_done = threading.Condition(threading.Lock())
+        self.unfinished_tasks = 0
+
+    def set_shards(self, num_shards):
+        """Resize to one deque per worker (call before the workers start)."""
+        num_shards = max(1, num_shards)
+        pending = self._take_all()
+        self._shards = [deque() for _ in range(num_shards)]
+        self._locks = [threading.Lock() for _ in range(num_shards)]
+        for i, item in enumerate(pending):
+            self._shards[i % num_shards].append(item)
+
+    def put(self, item):
+        with self.all_tasks_done:
+            self.unfinished_tasks += 1
+
+        shard = next(self._next_shard) % len(self._shards)
+        with self._locks[shard]:
+            self._shards[shard].append(item)
+
+        if self._waiters:
+            with self._not_empty:
+                self._not_empty.notify()
+
+    def _try_get(self, home):
+        """Own deque first, then steal from the others; oldest item either way."""
+        n = len(self._shards)
+        with self._locks[home]:
+            if self._shards[home]:
+                return True, self._shards[home].popleft()
+        for offset in range(1, n):
+            victim = (home + offset) % n
+            with self._locks[victim]:
+                if self._shards[victim]:
+                    return True, self._shards[victim].popleft()
+        return False, None
+
+    def get(self, worker_id=0):
+        """Block until an item is available for this worker."""
+        home = worker_id % len(self._shards)
+        found, item = self._try_get(home)
+        if found:
+            return item
+
+        with self._not_empty:
+            self._waiters += 1
+            try:
+                while True:
+                    found, item = self._try_get(home)
+                    if found:
+                        return item
+                    # Timed wait as a safety net; puts notify as soon as they land
+                    self._not_empty.wait(1.0)
+            finally:
+                self._waiters -= 1
+
+    def task_done(self):
+        with self.all_tasks_done:
+            if self.unfinished_tasks <= 0:
+                raise ValueError('task_done() called too many times')
+            self.unfinished_tasks -= 1
+            if self.unfinished_tasks == 0:
+                self.all_tasks_done.notify_all()
+
+    def join(self):
+        with self.all_tasks_done:
+            while self.unfinished_tasks:
+                self.all_tasks_done.wait()
+
+    def _take_all(self):
+        items = []
+        for lock, shard in zip(self._locks, self._shards):
+            with lock:
+                items.extend(shard)
+                shard.clear()
+        return items
+
+    def clear(self):
+        """Drop every queued item; returns how many were removed."""
+        # Swap in empty deques under each lock; the old ones are freed after release
+        removed = 0
+        for i, lock in enumerate(self._locks):
+            with lock:
+                dropped, self._shards[i] = self._shards[i], deque()
+            removed += len(dropped)
+        with self.all_tasks_done:
+            self.unfinished_tasks = max(0, self.unfinished_tasks - removed)
+            if self.unfinished_tasks == 0:
+                self.all_tasks_done.notify_all()
+        return removed
+
+    def qsize(self):
+        return sum(len(shard) for shard in self._shards)
+
+    def empty(self):
+        return not any(self._shards)